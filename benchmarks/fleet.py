@@ -0,0 +1,37 @@
+"""
+Synthetic fleet of Skytap style hostnames, for benchmarking at scale
+"""
+import random
+
+DATACENTERS = ["tuk", "sea", "ash", "dls", "lon", "daa", "slg", "jng", "wdb"]
+ENVS = {"1": "prod", "5": "integ", "6": "test", "8": "qa", "9": "corp"}
+REGIONS = ["r1", "r2", "m1", "x1"]
+FUNCTIONS = [
+    "sn", "ss", "cephosd", "cephmon", "hn", "vcsa", "nsxmgr", "nsxctrl", "nhn", "ossec", "jira", "fs", "as", "cs", "dlbr", "fw",
+    "zabbix", "zabbixproxy", "ntop", "radius", "cm", "gb", "qi", "wfe", "ftp", "webnfs", "memcache", "netgauge", "knode",
+    "kmaster", "etcd", "mysql", "mysqlvip", "bmetricsdb", "elasticdata", "influx", "logger", "bi", "jenkins", "ldap",
+    "linjump", "puppet", "repo", "packages", "ntp", "lb", "vault", "mn", "sshost", "esxi", "foo", "apache", "webapp",
+]
+
+
+def synthetic_fleet(count, seed=0):
+    """
+    Realistic mix of stack, regionless, chassis/blade and dev hostnames
+    :param count: number of hostnames
+    :param seed: random seed, the same seed always gives the same fleet
+    :return: generator of hostnames
+    """
+    rand = random.Random(seed)
+    for _ in range(count):
+        datacenter = rand.choice(DATACENTERS)
+        env, platform = rand.choice(list(ENVS.items()))
+        instance = rand.randint(1, 40)
+        shape = rand.random()
+        if shape < 0.55:
+            yield "{}{}{}{}{}.mgt.{}.skytap.com".format(datacenter, env, rand.choice(REGIONS), rand.choice(FUNCTIONS), instance, platform)
+        elif shape < 0.85:
+            yield "{}{}{}{}.{}.skytap.com".format(datacenter, env, rand.choice(FUNCTIONS), instance, platform)
+        elif shape < 0.95:
+            yield "{}{}c{}b{}.mgt.{}.skytap.com".format(datacenter, env, rand.randint(1, 16), instance, platform)
+        else:
+            yield "{}{}.dev.test.skytap.com".format(rand.choice(FUNCTIONS), instance)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+"""
+Throughput and latency of each HostDetails classification stage, over HOSTNAMEMAP and a synthetic fleet.
+
+Device42 is replaced by an in-memory stand-in. Results are compared against a stored baseline and the run fails when
+a stage's throughput drops by more than the threshold:
+
+    python -m benchmarks.run --save          # record a baseline on this machine
+    python -m benchmarks.run                 # compare against it
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from host_details.excp import HostDetailException
+from host_details.hostdetails import HostDetails, SERVICE_CACHE
+from host_details.roles import ROLE_REGISTRY
+from host_details.rules import DEFAULT_RULE_FILE, default_rules
+from tests.hostnamemap import HOSTNAMEMAP
+from benchmarks.fleet import synthetic_fleet
+
+STAGES = ["init", "which_owner", "which_security", "which_service", "zabbix_details", "map_zabbix_rules", "getroletemplate"]
+DEFAULT_BASELINE = os.path.join(".benchmarks", "baseline.json")
+
+
+class FakeD42Connector():
+    """ In-memory stand-in for D42Connector, every chassis and blade is a hosting node """
+    @staticmethod
+    def get_by_hostname(host):  # pylint: disable=unused-argument
+        return {"Role": "hn", "err": []}
+
+
+def _timed(stage, timings, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    timings[stage].append(time.perf_counter() - start)
+    return result
+
+
+def run_stages(hostnames):
+    """
+    Classify every host, timing each stage separately
+    :param hostnames: iterable of hostnames
+    :return: dict of stage to list of per host latencies in seconds
+    """
+    timings = dict((stage, []) for stage in STAGES)
+    connector = FakeD42Connector()
+    for hostname in hostnames:
+        try:
+            hostdetails = _timed("init", timings, HostDetails, hostname, d42_connector=connector)
+            _timed("which_owner", timings, hostdetails.which_owner)
+            _timed("which_security", timings, hostdetails.which_security)
+            start = time.perf_counter()
+            for service, value in hostdetails.service_discovery.items():
+                hostdetails.details["services"][service] = hostdetails.which_service(service, **value)
+            timings["which_service"].append(time.perf_counter() - start)
+        except HostDetailException:
+            # same hosts resolve_many reports as errors
+            continue
+        _timed("zabbix_details", timings, hostdetails.zabbix_details)
+        if hostdetails.details["env"] is not None:
+            # hosts without a location have no zabbix location rules
+            _timed("map_zabbix_rules", timings, hostdetails.map_zabbix_rules)
+        _timed("getroletemplate", timings, hostdetails.getroletemplate)
+    return timings
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(timings):
+    """
+    :param timings: run_stages result
+    :return: dict of stage to hosts/sec and p50/p90/p99 latency in microseconds
+    """
+    summary = {}
+    for stage, latencies in timings.items():
+        if not latencies:
+            continue
+        ordered = sorted(latencies)
+        summary[stage] = {
+            "hosts": len(ordered),
+            "hosts_per_sec": round(len(ordered) / sum(ordered), 1),
+            "p50_us": round(_percentile(ordered, 0.50) * 1e6, 2),
+            "p90_us": round(_percentile(ordered, 0.90) * 1e6, 2),
+            "p99_us": round(_percentile(ordered, 0.99) * 1e6, 2),
+        }
+    return summary
+
+
+def regressions(results, baseline, threshold):
+    """
+    :param results: {source: summary} for this run
+    :param baseline: {source: summary} stored from an earlier run
+    :param threshold: fraction of throughput a stage may lose before it counts as a regression
+    :return: list of (source, stage, baseline hosts/sec, hosts/sec) that regressed
+    """
+    regressed = []
+    for source, summary in results.items():
+        for stage, stats in summary.items():
+            expected = baseline.get(source, {}).get(stage)
+            if expected and stats["hosts_per_sec"] < expected["hosts_per_sec"] * (1 - threshold):
+                regressed.append((source, stage, expected["hosts_per_sec"], stats["hosts_per_sec"]))
+    return regressed
+
+
+def benchmark(sources):
+    """
+    :param sources: dict of source name to list of hostnames
+    :return: {source: summary}
+    """
+    results = {}
+    for source, hostnames in sources.items():
+        # every source starts with cold caches so runs are comparable, but the rules are loaded before timing so
+        # the first host's init stage doesn't pay for parsing the rule file
+        SERVICE_CACHE.clear()
+        ROLE_REGISTRY.clear()
+        DEFAULT_RULE_FILE.clear()
+        default_rules()
+        results[source] = summarize(run_stages(hostnames))
+    return results
+
+
+def _print(results):
+    for source, summary in results.items():
+        print(source)
+        print("  {:<18}{:>8}{:>14}{:>10}{:>10}{:>10}".format("stage", "hosts", "hosts/sec", "p50 us", "p90 us", "p99 us"))
+        for stage in STAGES:
+            if stage in summary:
+                stats = summary[stage]
+                print("  {:<18}{:>8}{:>14}{:>10}{:>10}{:>10}".format(stage, stats["hosts"], stats["hosts_per_sec"], stats["p50_us"],
+                                                                    stats["p90_us"], stats["p99_us"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=100000, help="synthetic fleet size (default 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="synthetic fleet seed (default 0)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline results file (default {})".format(DEFAULT_BASELINE))
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed throughput loss per stage (default 0.2)")
+    parser.add_argument("--save", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = benchmark({
+        "hostnamemap": list(HOSTNAMEMAP),
+        "synthetic": list(synthetic_fleet(args.hosts, seed=args.seed)),
+    })
+    _print(results)
+
+    if args.save:
+        directory = os.path.dirname(args.baseline)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+        print("saved baseline: {}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline at {}, run with --save to record one".format(args.baseline))
+        return 0
+    with open(args.baseline, "r") as baseline_file:
+        regressed = regressions(results, json.load(baseline_file), args.threshold)
+    for source, stage, expected, actual in regressed:
+        print("REGRESSION {} {}: {} hosts/sec, baseline {}".format(source, stage, actual, expected))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,21 +2,76 @@
 """
 Used to regenerate the HostDetails fixtures to check the details of hosts specifically for unit testing
 """
+import os
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
 import yaml
 
+from host_details.cli import _positive_int
 from host_details.hostdetails import HostDetails
 from tests.hostnamemap import HOSTNAMEMAP
-from host_details.compat import pkg_resources
+from host_details.compat import resource_filename
+
+# the C dumper writes the same documents, just much faster
+DUMPER = getattr(yaml, "CDumper", yaml.Dumper)
+
+
+def render(hosts):
+    """
+    Classify hosts and render each one's fixture
+    :param hosts: list of hostnames
+    :return: list of (hostname, fixture text or None, error or None)
+    """
+    rendered = []
+    for details in HostDetails.resolve_many(hosts):
+        if "error" in details:
+            rendered.append((details["hostname"], None, details["error"]))
+        else:
+            rendered.append((details["hostname"], yaml.dump(details, Dumper=DUMPER), None))
+    return rendered
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_if_changed(host, text):
+    """
+    Only rewrite a fixture when its content hash changed
+    :return: True if the fixture was written
+    """
+    path = resource_filename("tests", "fixtures/hostdetails/{}.yaml".format(host))
+    data = text.encode("utf-8")
+    if os.path.exists(path):
+        with open(path, "rb") as hostfile:
+            if _digest(hostfile.read()) == _digest(data):
+                return False
+    with open(path, "wb") as hostfile:
+        hostfile.write(data)
+    return True
 
 
 def main():
-    for host in HOSTNAMEMAP:
-        print("processing host: {}".format(host))
-        hdetails = HostDetails(host)
-        hdetails.all_details()
-        path = pkg_resources.resource_filename("tests", "fixtures/hostdetails/{}.yaml".format(host))
-        with open(path, "w") as hostfile:
-            yaml.dump(hdetails.details, hostfile)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-w", "--workers", type=_positive_int, default=os.cpu_count(), help="worker processes (default cpu count)")
+    parser.add_argument("--chunk-size", type=_positive_int, default=50, help="hosts rendered per task (default 50)")
+    args = parser.parse_args()
+
+    chunks = [HOSTNAMEMAP[start:start + args.chunk_size] for start in range(0, len(HOSTNAMEMAP), args.chunk_size)]
+    changed = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for rendered in executor.map(render, chunks):
+            for host, text, error in rendered:
+                if error:
+                    print("skipping host: {} ({})".format(host, error))
+                elif write_if_changed(host, text):
+                    changed.append(host)
+
+    for host in changed:
+        print("changed: {}".format(host))
+    print("{} of {} fixtures changed".format(len(changed), len(HOSTNAMEMAP)))
 
 
 if __name__ == "__main__":
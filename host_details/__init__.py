@@ -1 +1,3 @@
 """Copyright Placeholder"""
+
+__version__ = "0.1.0"
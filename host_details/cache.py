@@ -0,0 +1,65 @@
+"""
+Small in-memory caches shared across HostDetails instances
+"""
+import threading
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache():
+    """ Bounded, thread safe least recently used cache with hit/miss counters """
+    def __init__(self, maxsize=4096):
+        """
+        :param maxsize: most entries to hold before evicting the least recently used
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        """
+        Look up a key, counting the hit or miss
+        :param key: cache key
+        :param default: returned on a miss
+        :return: cached value or default
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entry when full
+        :param key: cache key
+        :param value: value to cache
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """ Drop every entry and reset the counters """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :return: dict of hits, misses, size and maxsize
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,238 @@
+"""
+host-details command line tool, streams hostnames in and details out
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+import itertools
+import multiprocessing.util
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from host_details.excp import InvalidRuleFile
+from host_details.hostdetails import HostDetails
+from host_details.metrics import PROFILE_ENV
+from host_details.rules import DEFAULT_RULE_FILE, RULES_ENV, RuleEngine
+
+LOGGER = logging.getLogger(__name__)
+
+# the Profiler of a worker process, when profiling
+_WORKER_PROFILER = None
+
+
+def _positive_int(value):
+    try:
+        number = int(value)
+    except ValueError:
+        number = 0
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be a positive integer: {}".format(value))
+    return number
+
+
+def parse_args(argv=None):
+    """
+    :param argv: command line arguments, defaults to sys.argv
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="host-details", description="Classify hostnames, one per line, into host details")
+    parser.add_argument("input", nargs="?", default="-", help="file of hostnames, - for stdin (default)")
+    parser.add_argument("-m", "--method", choices=["all_details", "hostsplit_service"], default="all_details",
+                        help="which details to fill out (default all_details)")
+    parser.add_argument("-f", "--format", choices=["json", "yaml"], default="json",
+                        help="json lines, or a stream of yaml documents (default json)")
+    parser.add_argument("-w", "--workers", type=_positive_int, default=1, help="worker processes (default 1, in process)")
+    parser.add_argument("--chunk-size", type=_positive_int, default=500,
+                        help="hostnames handed to a worker at a time (default 500)")
+    parser.add_argument("--prefetch", action="store_true", help="bulk load Device42 devices up front")
+    parser.add_argument("--rules", metavar="RULES",
+                        help="rule file to classify with instead of the bundled one (same as setting {})".format(RULES_ENV))
+    parser.add_argument("--diff", metavar="RESULTS",
+                        help="only reclassify new and changed hosts against the results file from the last run, write "
+                             "the per host changes instead of details and update the results file")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="profile the run and append the report to REPORT, - for stderr, with --workers each worker "
+                             "process appends one report when it exits (same as setting {})".format(PROFILE_ENV))
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+    return parser.parse_args(argv)
+
+
+def read_hostnames(stream):
+    """
+    :param stream: file object with one hostname per line, blank lines and # comments are skipped
+    :return: generator of hostnames
+    """
+    for line in stream:
+        hostname = line.strip()
+        if hostname and not hostname.startswith("#"):
+            yield hostname
+
+
+def _chunks(iterable, size):
+    if size < 1:
+        raise ValueError("chunk size must be positive: {}".format(size))
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(prefetch, rules_path):
+    global _WORKER_PROFILER  # pylint: disable=global-statement
+    if os.environ.get(PROFILE_ENV):
+        from host_details import profiling  # pylint: disable=import-outside-toplevel
+        _WORKER_PROFILER = profiling.Profiler()
+        _WORKER_PROFILER.start()
+        # one report for all the chunks of the worker, pool workers skip atexit but run multiprocessing finalizers
+        multiprocessing.util.Finalize(None, _write_worker_profile, exitpriority=10)
+    if rules_path:
+        DEFAULT_RULE_FILE.set_path(rules_path)
+    if prefetch:
+        from host_details.d42_connector import get_connector  # pylint: disable=import-outside-toplevel
+        get_connector().prefetch()
+
+
+def _write_worker_profile():
+    from host_details import profiling  # pylint: disable=import-outside-toplevel
+    _WORKER_PROFILER.stop()
+    if _WORKER_PROFILER.hosts:
+        profiling.write_report(_WORKER_PROFILER)
+
+
+def _resolve_chunk(hostnames, method):
+    return list(HostDetails.resolve_many(hostnames, method=method, profile=_WORKER_PROFILER))
+
+
+def resolve_stream(hostnames, method="all_details", workers=1, chunk_size=500, prefetch=False, rules_path=None, *,  # pylint: disable=too-many-arguments
+                   rules=None):
+    """
+    Classify a stream of hostnames, holding at most a couple of chunks per worker in memory at once
+    :param hostnames: iterable of hostnames
+    :param method: which details to fill out, all_details or hostsplit_service
+    :param workers: worker processes, 1 or less classifies in this process, in order
+    :param chunk_size: hostnames handed to a worker at a time
+    :param prefetch: bulk load Device42 devices up front, once per worker
+    :param rules_path: rule file to classify with, defaults to the process wide rules
+    :param rules: RuleEngine already loaded from rules_path, classifying in this process uses it instead of loading it again
+    :return: generator of details dicts, in completion order when using workers
+    """
+    if workers <= 1:
+        if rules is None and rules_path:
+            rules = RuleEngine.from_file(rules_path)
+        yield from HostDetails.resolve_many(hostnames, method=method, rules=rules, prefetch=prefetch)
+        return
+
+    chunks = _chunks(hostnames, chunk_size)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(prefetch, rules_path)) as executor:
+        pending = set()
+        for chunk in itertools.islice(chunks, workers * 2):
+            pending.add(executor.submit(_resolve_chunk, chunk, method))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    pending.add(executor.submit(_resolve_chunk, chunk, method))
+
+
+def _yaml_writer(output):
+    import yaml  # pylint: disable=import-outside-toplevel
+    dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+    def write(details):
+        yaml.dump(details, output, Dumper=dumper, explicit_start=True, default_flow_style=False)
+    return write
+
+
+def _json_writer(output):
+    def write(details):
+        output.write(json.dumps(details, sort_keys=True))
+        output.write("\n")
+    return write
+
+
+def _open_input(args, stdin):
+    return (stdin if stdin is not None else sys.stdin) if args.input == "-" else open(args.input, "r", encoding="utf-8")
+
+
+def _diff(args, stdin, write, rules):
+    from host_details import diff  # pylint: disable=import-outside-toplevel
+
+    def resolve(stale):
+        return resolve_stream(stale, workers=args.workers, chunk_size=args.chunk_size, prefetch=args.prefetch,
+                              rules_path=args.rules, rules=rules)
+
+    source = _open_input(args, stdin)
+    try:
+        hostnames = list(read_hostnames(source))
+    finally:
+        if source is not stdin and source is not sys.stdin:
+            source.close()
+    results, changed = diff.incremental(diff.load_results(args.diff), hostnames, rules=rules, resolve=resolve)
+    for change in changed:
+        write(change)
+    diff.save_results(args.diff, results)
+    return 0
+
+
+def main(argv=None, stdin=None, stdout=None):
+    """
+    host-details entry point
+    :param argv: command line arguments, defaults to sys.argv
+    :param stdin: stream to read hostnames from when input is -, defaults to sys.stdin
+    :param stdout: stream to write details to, defaults to sys.stdout
+    :return: exit code
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    stdout = stdout if stdout is not None else sys.stdout
+    write = _yaml_writer(stdout) if args.format == "yaml" else _json_writer(stdout)
+    previous_profile = os.environ.get(PROFILE_ENV)
+    if args.profile:
+        # through the environment so worker processes profile their chunks too
+        os.environ[PROFILE_ENV] = args.profile
+    try:
+        return _run(args, stdin, stdout, write)
+    finally:
+        if previous_profile is None:
+            os.environ.pop(PROFILE_ENV, None)
+        else:
+            os.environ[PROFILE_ENV] = previous_profile
+
+
+def _run(args, stdin, stdout, write):
+    rules = None
+    if args.rules:
+        # fail before reading any hostnames, rather than in every worker
+        try:
+            rules = RuleEngine.from_file(args.rules)
+        except InvalidRuleFile as error:
+            LOGGER.error("%s", error)
+            return 2
+
+    if args.diff:
+        status = _diff(args, stdin, write, rules)
+        stdout.flush()
+        return status
+
+    source = _open_input(args, stdin)
+    try:
+        for details in resolve_stream(read_hostnames(source), method=args.method, workers=args.workers,
+                                      chunk_size=args.chunk_size, prefetch=args.prefetch, rules_path=args.rules,
+                                      rules=rules):
+            if "error" in details:
+                LOGGER.warning("%s: %s", details["hostname"], details["error"])
+            write(details)
+    finally:
+        if source is not stdin and source is not sys.stdin:
+            source.close()
+    stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
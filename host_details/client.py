@@ -0,0 +1,168 @@
+"""
+Thin client for the resident resolver in host_details.server, only needs the standard library so hooks start fast
+
+    python -m host_details.client --socket /run/host-details.sock tuk1mysql1.prod.skytap.com
+"""
+import sys
+import json
+import socket
+import argparse
+import http.client
+from urllib.parse import quote
+
+from host_details.excp import ResolverError
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """ HTTPConnection over a Unix socket """
+    def __init__(self, path, timeout=10):
+        """
+        :param path: Unix socket path
+        :param timeout: seconds to wait on the socket
+        """
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ResolverClient():
+    """
+    Keep-alive connection to a ResolverServer, reconnecting once if the server closed it between requests
+    """
+    def __init__(self, socket_path=None, host="127.0.0.1", port=8042, timeout=10):
+        """
+        :param socket_path: server's Unix socket, instead of host and port
+        :param host: server address
+        :param port: server port
+        :param timeout: seconds to wait on each request
+        """
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, verb, path, payload=None):
+        """
+        :param verb: GET or POST
+        :param path: request path
+        :param payload: json serializable request body
+        :return: (status, decoded json response, or text for text responses)
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(verb, path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            except OSError:
+                self.close()
+                raise
+            if response.getheader("Connection", "").lower() == "close":
+                self.close()
+            if response.getheader("Content-Type", "").startswith("text/plain"):
+                return response.status, data.decode("utf-8")
+            return response.status, json.loads(data.decode("utf-8"))
+        return None
+
+    def _checked(self, verb, path, payload=None, allowed=(200,)):
+        status, result = self.request(verb, path, payload)
+        if status not in allowed:
+            # text responses, and json ones other than an {"error": ...} object, are reported whole
+            raise ResolverError(status, result.get("error", "") if isinstance(result, dict) else result)
+        return result
+
+    def resolve(self, hostname, method="all_details"):
+        """
+        :param hostname: hostname to classify
+        :param method: which details to fill out, all_details or hostsplit_service
+        :return: details dict, or {"hostname": ..., "error": ...} when the host can't be classified
+        """
+        return self._checked("GET", "/hosts/{}?method={}".format(quote(hostname, safe=""), quote(method)), allowed=(200, 422))
+
+    def resolve_many(self, hostnames, method="all_details"):
+        """
+        :param hostnames: iterable of hostnames
+        :param method: which details to fill out, all_details or hostsplit_service
+        :return: list of details dicts in the same order, with {"hostname": ..., "error": ...} for failures
+        """
+        return self._checked("POST", "/hosts", {"hostnames": list(hostnames), "method": method})["results"]
+
+    def health(self):
+        """
+        :return: {"status": "ok", "rules_version": ..., "rules_fingerprint": ...}
+        """
+        return self._checked("GET", "/health")
+
+    def metrics(self):
+        """
+        :return: the server's metrics in Prometheus text
+        """
+        return self._checked("GET", "/metrics")
+
+    def stats(self):
+        """
+        :return: the server's metrics, see host_details.metrics.Metrics.stats
+        """
+        return self._checked("GET", "/stats")
+
+    def close(self):
+        """ Close the connection, the next request opens a new one """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None, stdout=None):
+    """
+    Look hosts up in a running resolver and print their details as json lines
+    :param argv: command line arguments, defaults to sys.argv
+    :param stdout: stream to write details to, defaults to sys.stdout
+    :return: exit code, 1 if any host couldn't be classified
+    """
+    parser = argparse.ArgumentParser(description="Look hosts up in a running host-details-server")
+    parser.add_argument("hostnames", nargs="+", help="hostnames to classify")
+    parser.add_argument("--socket", help="server's Unix socket, instead of --host and --port")
+    parser.add_argument("--host", default="127.0.0.1", help="server address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8042, help="server port (default 8042)")
+    parser.add_argument("-m", "--method", choices=["all_details", "hostsplit_service"], default="all_details",
+                        help="which details to fill out (default all_details)")
+    args = parser.parse_args(argv)
+    stdout = stdout if stdout is not None else sys.stdout
+
+    with ResolverClient(socket_path=args.socket, host=args.host, port=args.port) as client:
+        if len(args.hostnames) == 1:
+            results = [client.resolve(args.hostnames[0], method=args.method)]
+        else:
+            results = client.resolve_many(args.hostnames, method=args.method)
+    for details in results:
+        stdout.write(json.dumps(details, sort_keys=True))
+        stdout.write("\n")
+    return 1 if any("error" in details for details in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
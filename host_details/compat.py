@@ -1,11 +1,21 @@
 """Copyright Placeholder"""
 # pylint: skip-file
 
-import sys
-
-import pkg_resources
-
 try:
     import ConfigParser
 except ImportError:
     import configparser as ConfigParser
+
+
+def resource_filename(package, resource):
+    """
+    Filesystem path of a resource inside a package, importlib.resources is only imported when first needed
+    :param package: dotted package name, like host_details.static
+    :param resource: path inside the package, like roles
+    :return: path to the resource
+    """
+    try:
+        from importlib.resources import files
+    except ImportError:
+        from importlib_resources import files
+    return str(files(package).joinpath(resource))
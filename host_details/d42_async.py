@@ -0,0 +1,62 @@
+"""
+Asyncio interface to device42, for batches and asyncio services that can't block on each lookup
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from host_details.d42_connector import get_connector
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AsyncD42Connector():
+    """
+    Awaitable get_by_hostname on top of a D42Connector.
+
+    Lookups run on a thread pool so the event loop never blocks, at most max_concurrency are in flight at once, and
+    each one gives up after timeout seconds. Results keep the D42Connector shape, Role normalized and errors in err.
+
+    A timeout only stops waiting: the blocking SDK call can't be interrupted and keeps its thread until it returns.
+    It also keeps its concurrency slot until then, so under a slow Device42 new lookups queue for a free thread rather
+    than piling more blocked calls onto the pool.
+    """
+    def __init__(self, connector=None, max_concurrency=20, timeout=30):
+        """
+        :param connector: D42Connector to do the lookups with, defaults to the shared process wide connector
+        :param max_concurrency: most lookups in flight at once
+        :param timeout: seconds to wait on each lookup
+        """
+        self.connector = connector
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="d42")
+        self._semaphore = None
+
+    async def get_by_hostname(self, host):
+        """ Queries device42 for info about a single host """
+        if self._semaphore is None:
+            # created on first use so it belongs to the running loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if self.connector is None:
+            self.connector = get_connector()
+
+        await self._semaphore.acquire()
+        lookup = asyncio.get_running_loop().run_in_executor(self._executor, self.connector.get_by_hostname, host)
+        # the slot is freed when the thread is, not when we stop waiting for it
+        lookup.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(lookup), self.timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Timed out looking up %s in Device42", host)
+            return {'err': 'Timed out after {}s looking up {} in Device42'.format(self.timeout, host)}
+
+    def _release(self, lookup):
+        if not lookup.cancelled():
+            # retrieved so abandoned lookups that fail don't log "exception was never retrieved"
+            lookup.exception()
+        self._semaphore.release()
+
+    def close(self):
+        """ Shut down the lookup threads """
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,135 @@
+"""
+Persistent on-disk cache of Device42 lookups, so repeated runs don't query d42 for every blade
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+from host_details.compat import ConfigParser
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_TTL = 86400
+DEFAULT_NEGATIVE_TTL = 3600
+DEFAULT_MAX_STALE = 7 * 86400
+
+
+class D42Cache():  # pylint: disable=too-many-instance-attributes
+    """
+    SQLite backed cache of D42Connector.get_by_hostname results keyed by hostname.
+
+    Entries younger than ttl (negative_ttl for hosts d42 has no Role for, or couldn't be looked up) are fresh. Older entries are still served
+    for up to max_stale more seconds, but are reported as stale so the caller can refresh them.
+    """
+    def __init__(self, path, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL, max_stale=DEFAULT_MAX_STALE):
+        """
+        :param path: sqlite database file, created if missing
+        :param ttl: seconds a result stays fresh
+        :param negative_ttl: seconds a result without a Role stays fresh
+        :param max_stale: seconds past expiry a result may still be served while it is refreshed
+        """
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS devices (hostname TEXT PRIMARY KEY, value TEXT NOT NULL, fetched REAL NOT NULL)")
+
+    def get(self, host):
+        """
+        Look up a cached result
+        :param host: hostname
+        :return: (result, fresh) or None when there is no usable entry
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, fetched FROM devices WHERE hostname = ?", (host,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        value = json.loads(row[0])
+        age = time.time() - row[1]
+        ttl = self.ttl if value.get('Role') else self.negative_ttl
+        if age > ttl + self.max_stale:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if age > ttl:
+            self.stale += 1
+        return value, age <= ttl
+
+    def set(self, host, value):
+        """
+        Store a result
+        :param host: hostname
+        :param value: get_by_hostname result
+        """
+        self.set_many({host: value})
+
+    def set_many(self, values):
+        """
+        Store many results in one transaction
+        :param values: dict of hostname to get_by_hostname result
+        """
+        fetched = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO devices (hostname, value, fetched) VALUES (?, ?, ?)",
+                                   ((host, json.dumps(value), fetched) for host, value in values.items()))
+
+    def invalidate(self, host=None):
+        """
+        Drop cached results
+        :param host: hostname to drop, everything when None
+        """
+        with self._lock, self._conn:
+            if host is None:
+                self._conn.execute("DELETE FROM devices")
+            else:
+                self._conn.execute("DELETE FROM devices WHERE hostname = ?", (host,))
+
+    def stats(self):
+        """
+        :return: dict of hits (stale ones included), misses and stale
+        """
+        return {"hits": self.hits, "misses": self.misses, "stale": self.stale}
+
+    def close(self):
+        """ Close the database """
+        with self._lock:
+            self._conn.close()
+
+
+def cache_from_config(config):
+    """
+    Build the cache configured in the [d42] section of d42.ini, if any:
+      cache_path = ~/.cache/host_details/d42.sqlite
+      cache_ttl = 86400
+      cache_negative_ttl = 3600
+      cache_max_stale = 604800
+    :param config: parsed d42.ini, see load_config_files
+    :return: D42Cache, or None when cache_path isn't set
+    """
+    def option(key, default):
+        try:
+            return config.get('d42', key)
+        except (ConfigParser.Error, AttributeError):
+            return default
+
+    path = option('cache_path', None)
+    if not path:
+        return None
+    LOGGER.debug("Using Device42 cache: %s", path)
+    return D42Cache(path,
+                    ttl=float(option('cache_ttl', DEFAULT_TTL)),
+                    negative_ttl=float(option('cache_negative_ttl', DEFAULT_NEGATIVE_TTL)),
+                    max_stale=float(option('cache_max_stale', DEFAULT_MAX_STALE)))
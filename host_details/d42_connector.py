@@ -2,11 +2,17 @@
 Connector to import things from device42 into hostinfo
 """
 import os
+import logging
+import threading
 from Device42.config import ConfigData
 from Device42.dev42.devices import Devices
 import requests
 
 from host_details.compat import ConfigParser
+from host_details.d42_cache import cache_from_config
+from host_details.metrics import METRICS
+
+LOGGER = logging.getLogger(__name__)
 
 ROLE_NORMALIZE = {
     'hostingnode': 'hn',
@@ -16,44 +22,166 @@ ROLE_NORMALIZE = {
 }
 
 
-# pylint: disable=too-few-public-methods
-class D42Connector():
+class D42Connector():  # pylint: disable=too-many-instance-attributes
     """ Provides object interface to d42 """
-    def __init__(self, config):
+    # Things we want to take from d42
+    import_custom_fields = ['Role']
+    import_values = []
+
+    def __init__(self, config, timeout=30, cache=None):
+        """
+        :param config: parsed d42.ini, see load_config_files
+        :param timeout: seconds to wait on each bulk request
+        :param cache: D42Cache to keep results in, defaults to the one configured in d42.ini if any
+        """
+        self.server = config.get('d42', 'server')
+        self.timeout = timeout
 
-        # setup interface to dev42
-        self.d42_settings = ConfigData(dev42=config.get('d42', 'server'),
+        # setup interface to dev42, kept for the life of the connector. Per host lookups go through the Device42
+        # client, which manages its own http connections; only prefetch's bulk requests share self.session
+        self.d42_settings = ConfigData(dev42=self.server,
                                        duser=config.get('d42', 'user'),
                                        dpassword=config.get('d42', 'password')
                                        )
+        self.devices = Devices(self.d42_settings)
+        self.session = requests.Session()
+        self.session.auth = (config.get('d42', 'user'), config.get('d42', 'password'))
+        self.prefetched = None
+        self.cache = cache if cache is not None else cache_from_config(config)
+        if self.cache is not None:
+            METRICS.register_cache("d42", self.cache.stats)
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
 
     def get_by_hostname(self, host):
-        """ Queries device42 for info about a single host """
-        # Things we want to take from d42
-        import_custom_fields = ['Role']
-        import_values = []
+        """
+        Queries device42 for info about a single host. Without a prefetch or cache hit this is one Device42 client
+        request, which does not use the pooled session; prefetch first when resolving many hosts.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(host)
+            if cached is not None:
+                rtrn, fresh = cached
+                if not fresh:
+                    self._refresh_in_background(host)
+                return rtrn
 
-        devices = Devices(self.d42_settings)
-        rtrn = {}
-        rtrn['err'] = []
+        rtrn = self._fetch(host)
+        if self.cache is not None:
+            # not found and failed lookups have no Role, so they are only kept for the cache's negative_ttl
+            self.cache.set(host, rtrn)
+        return rtrn
+
+    def _refresh_in_background(self, host):
+        """ Serve the stale entry now, and fetch a new one for next time """
+        with self._refreshing_lock:
+            if host in self._refreshing:
+                return
+            self._refreshing.add(host)
+
+        def refresh():
+            try:
+                rtrn = self._fetch(host)
+                # a failed refresh keeps serving the stale entry rather than replacing it with the error
+                if not rtrn['err']:
+                    self.cache.set(host, rtrn)
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(host)
+
+        threading.Thread(target=refresh, name="d42-refresh-{}".format(host), daemon=True).start()
+
+    def _fetch(self, host):
+        """ Look up a single host from the prefetched devices or device42 itself """
+        if self.prefetched is not None:
+            if host in self.prefetched:
+                return dict(self.prefetched[host])
+            return {'err': 'Device not found in prefetched Device42 devices: {}'.format(host)}
+
+        METRICS.count("d42_requests")
         try:
-            dev = devices.get_device_byname(host)
-            if import_custom_fields:
-                for val in dev['custom_fields']:
-                    if val.get('key') in import_custom_fields:
-                        rtrn[val.get('key')] = val.get('value')
-            if import_values:
-                for key in import_values:
-                    rtrn[key] = dev.get(key)
+            dev = self.devices.get_device_byname(host)
         except requests.exceptions.RequestException as exception:
+            METRICS.count("d42_errors")
+            rtrn = self._extract({})
             rtrn['err'] = str(exception)
+            return rtrn
+        return self._extract(dev)
+
+    def prefetch(self, page_size=1000):
+        """
+        Pull every device with its custom fields in paged bulk requests, and index them by hostname so get_by_hostname
+        no longer makes a request per host
+        :param page_size: devices to request per page
+        :return: number of devices indexed, None if the devices couldn't be fetched
+        """
+        url = '{}/api/1.0/devices/all/'.format(self.server.rstrip('/'))
+        include_cols = ','.join(['name', 'custom_fields'] + self.import_values)
+        prefetched = {}
+        offset = 0
+        try:
+            while True:
+                METRICS.count("d42_requests")
+                response = self.session.get(url, params={'include_cols': include_cols, 'limit': page_size, 'offset': offset},
+                                            timeout=self.timeout)
+                response.raise_for_status()
+                page = response.json()
+                devices = page.get('Devices', [])
+                for dev in devices:
+                    prefetched[dev['name']] = self._extract(dev)
+                offset += len(devices)
+                if not devices or offset >= page.get('total_count', 0):
+                    break
+        except requests.exceptions.RequestException as exception:
+            METRICS.count("d42_errors")
+            LOGGER.warning("Unable to prefetch Device42 devices, falling back to per host lookups: %s", exception)
+            return None
+
+        LOGGER.debug("Prefetched %d Device42 devices", len(prefetched))
+        self.prefetched = prefetched
+        if self.cache is not None:
+            self.cache.set_many(prefetched)
+        return len(prefetched)
+
+    def clear_prefetch(self):
+        """ Drop prefetched devices, get_by_hostname goes back to querying device42 """
+        self.prefetched = None
+
+    def _extract(self, dev):
+        """ Pull the fields we care about out of a device42 device """
+        rtrn = {}
+        rtrn['err'] = []
+        if self.import_custom_fields:
+            for val in dev.get('custom_fields', []):
+                if val.get('key') in self.import_custom_fields:
+                    rtrn[val.get('key')] = val.get('value')
+        if self.import_values:
+            for key in self.import_values:
+                rtrn[key] = dev.get(key)
 
         # Normalize Role values ENG-45130
-        if 'Role' in import_custom_fields and ROLE_NORMALIZE.get(rtrn.get('Role')):
+        if 'Role' in self.import_custom_fields and ROLE_NORMALIZE.get(rtrn.get('Role')):
             rtrn['Role'] = ROLE_NORMALIZE.get(rtrn.get('Role'))
 
         return rtrn
 
+
+_CONNECTOR = None
+_CONNECTOR_LOCK = threading.Lock()
+
+
+def get_connector():
+    """
+    Long lived D42Connector shared by the whole process, configured from load_config_files on first use
+    :return: the shared D42Connector
+    """
+    global _CONNECTOR  # pylint: disable=global-statement
+    with _CONNECTOR_LOCK:
+        if _CONNECTOR is None:
+            _CONNECTOR = D42Connector(load_config_files())
+        return _CONNECTOR
+
+
 def load_config_files():
     """
      parse configuration files to get session information.
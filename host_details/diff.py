@@ -0,0 +1,166 @@
+"""
+Incremental classification between runs, only reclassifying new hosts and hosts whose classification inputs changed
+"""
+import os
+import json
+import hashlib
+import logging
+
+from host_details import __version__
+from host_details.excp import HostDetailException
+from host_details.hostdetails import HostDetails
+from host_details.rules import default_rules
+
+LOGGER = logging.getLogger(__name__)
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+
+def load_results(path):
+    """
+    :param path: results file written by save_results, json lines of {"fingerprint": ..., "details": ...}
+    :return: dict of hostname to result, empty if the file doesn't exist yet
+    """
+    if not os.path.exists(path):
+        return {}
+    results = {}
+    with open(path, "r", encoding="utf-8") as results_file:
+        for line in results_file:
+            if line.strip():
+                result = json.loads(line)
+                results[result["details"]["hostname"]] = result
+    return results
+
+
+def save_results(path, results):
+    """
+    Atomically replace the results file
+    :param path: results file
+    :param results: dict of hostname to result, as returned by incremental
+    """
+    partial = "{}.tmp".format(path)
+    with open(partial, "w", encoding="utf-8") as results_file:
+        for hostname in sorted(results):
+            results_file.write(json.dumps(results[hostname], sort_keys=True))
+            results_file.write("\n")
+    os.replace(partial, path)
+
+
+def _tracked(details):
+    """
+    :param details: HostDetails.details, a resolve_many error record or None
+    :return: dict of tracked field to value, missing fields left out
+    """
+    if details is None:
+        return {}
+    if "error" in details:
+        return {"error": details["error"]}
+    fields = {"owner": details.get("owner")}
+    for role, value in details.get("security", {}).items():
+        fields["security.{}".format(role)] = value
+    for service, endpoint in details.get("services", {}).items():
+        fields["services.{}".format(service)] = endpoint
+    if "zabbix" in details:
+        fields["zabbix.groups"] = details["zabbix"]["groups"]
+    return fields
+
+
+def host_changes(old, new):
+    """
+    :param old: previous HostDetails.details, error record, or None for an added host
+    :param new: current HostDetails.details, error record, or None for a removed host
+    :return: list of {"field": ..., "old": ..., "new": ...} for the owner, security roles, service endpoints, zabbix
+             groups and classification error, in a stable order
+    """
+    old_fields = _tracked(old)
+    new_fields = _tracked(new)
+    changes = []
+    for field in sorted(set(old_fields) | set(new_fields)):
+        if old_fields.get(field) != new_fields.get(field):
+            changes.append({"field": field, "old": old_fields.get(field), "new": new_fields.get(field)})
+    return changes
+
+
+def host_fingerprint(rules, hostname, details):
+    """
+    Digest of what classifying the host reads, so a rule edit only marks the hosts it can change as stale: the
+    host_details version, the hostname grammar and service discovery tables whole, and only the entries of the owner
+    override, ownership regex, tools and services and env tables that apply to this host.
+    :param rules: RuleEngine
+    :param hostname: host
+    :param details: the host's HostDetails.details or resolve_many error record, its owner covers Device42 owners
+    :return: hex digest
+    """
+    inputs = [__version__, rules.table_fingerprints["component_regexes"], rules.table_fingerprints["service_discovery"]]
+    try:
+        fields = rules.hostname_parser.parse(hostname)
+    except HostDetailException:
+        fields = None
+    if fields is not None:
+        fields["hostname"] = hostname
+        env = fields.get("env")
+        inputs += [
+            [[field, key, owner] for field, overrides in rules.team_owner_overrides.items()
+             for key, owner in overrides.items() if key in (fields.get(field) or "")],
+            rules.owner_matcher.match(fields["function"]),
+            details.get("owner") in rules.tas_override,
+            rules.env_map.get(int(env)) if env and env.isdigit() else None,
+        ]
+    return hashlib.sha256(json.dumps(inputs, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def _stale(result, rules, refresh_device42):
+    if result is None or result["fingerprint"] != host_fingerprint(rules, result["details"]["hostname"], result["details"]):
+        return True
+    # chassis and blades also depend on their Device42 Role, which changes outside of the rules
+    return refresh_device42 and "d42" in result["details"]
+
+
+def incremental(previous, hostnames, rules=None, resolve=None, refresh_device42=True):
+    """
+    Classify hostnames, reusing previous results for hosts whose classification inputs didn't change: the hostname
+    and the parts of the rules it reads, see host_fingerprint, plus the Device42 Role for chassis and blades when
+    refresh_device42 is set.
+    :param previous: dict of hostname to result, see load_results
+    :param hostnames: iterable of the current hostnames
+    :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+    :param resolve: callable taking a list of hostnames and returning all_details dicts for them in any order,
+                    defaults to HostDetails.resolve_many with rules
+    :param refresh_device42: reclassify hosts that were looked up in Device42 even if nothing else changed
+    :return: (dict of hostname to result to save, list of {"hostname", "status", "changes"} for hosts that changed)
+    """
+    rules = rules if rules is not None else default_rules()
+    if resolve is None:
+        def resolve(stale):
+            return HostDetails.resolve_many(stale, rules=rules)
+
+    results = {}
+    stale = []
+    seen = set()
+    for hostname in hostnames:
+        if hostname in seen:
+            continue
+        seen.add(hostname)
+        result = previous.get(hostname)
+        if _stale(result, rules, refresh_device42):
+            stale.append(hostname)
+        else:
+            results[hostname] = result
+    LOGGER.debug("Reclassifying %s of %s hosts", len(stale), len(stale) + len(results))
+
+    changed = []
+    for details in resolve(stale):
+        hostname = details["hostname"]
+        results[hostname] = {"fingerprint": host_fingerprint(rules, hostname, details), "details": details}
+        old = previous.get(hostname)
+        changes = host_changes(old["details"] if old else None, details)
+        if old is None:
+            changed.append({"hostname": hostname, "status": ADDED, "changes": changes})
+        elif changes:
+            changed.append({"hostname": hostname, "status": CHANGED, "changes": changes})
+
+    for hostname in sorted(set(previous) - seen):
+        changed.append({"hostname": hostname, "status": REMOVED, "changes": host_changes(previous[hostname]["details"], None)})
+    return results, changed
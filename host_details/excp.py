@@ -22,3 +22,20 @@ class InvalidServiceBadInstance(HostDetailException):
 class InvalidHostname(HostDetailException):
     "Generic Exception"
     msg = "Invalid Hostname"
+
+class InvalidRuleFile(HostDetailException):
+    "Rule file that can't be loaded"
+    msg = "Invalid rule file"
+
+    def __init__(self, path, reason):
+        super().__init__(path, reason)
+        self.msg = "Invalid rule file {}: {}".format(path, reason)
+
+class ResolverError(HostDetailException):
+    "Error response from the resident resolver"
+    msg = "Resolver error"
+
+    def __init__(self, status, reason):
+        super().__init__(status, reason)
+        self.status = status
+        self.msg = "Resolver error {}: {}".format(status, reason)
@@ -0,0 +1,229 @@
+"""
+Columnar, dictionary encoded export of classified hosts, for grouping and aggregating a whole fleet
+"""
+import csv
+from array import array
+
+from host_details.rules import default_rules
+
+SCALAR_COLUMNS = ["hostname", "shortname", "datacenter", "env", "region", "platform", "subplatform", "function", "instance", "owner"]
+SECURITY_COLUMNS = ["role.service_owner", "role.authorized_operator", "role.authorized"]
+
+# security roles that hold a list of roles
+LIST_SECURITY_COLUMNS = ["role.authorized_operator", "role.authorized"]
+
+# joins list values (ntp/ldap pairs, security roles, zabbix groups) into one CSV cell, other exports keep them as lists
+LIST_SEPARATOR = ";"
+
+# code for a missing value, never an index into a column's dictionary
+NULL = -1
+
+
+def default_columns(rules=None):
+    """
+    Flattened column names: the scalar details, security.<role>, services.<service>, zabbix.groups, d42.Role and error
+    :param rules: RuleEngine whose services get a column each, defaults to the shared process wide engine
+    :return: list of column names
+    """
+    rules = rules if rules is not None else default_rules()
+    return (SCALAR_COLUMNS +
+            ["security.{}".format(role) for role in SECURITY_COLUMNS] +
+            ["services.{}".format(service) for service in rules.service_discovery] +
+            ["zabbix.groups", "d42.Role", "error"])
+
+
+def default_list_columns(rules=None):
+    """
+    Columns of default_columns whose values are lists: the authorized roles, services with more than one instance,
+    like ntp and ldap, and zabbix.groups
+    :param rules: RuleEngine to take the services from, defaults to the shared process wide engine
+    :return: list of column names
+    """
+    rules = rules if rules is not None else default_rules()
+    return (["security.{}".format(role) for role in LIST_SECURITY_COLUMNS] +
+            ["services.{}".format(service) for service, spec in rules.service_discovery.items()
+             if isinstance(spec.get("instance"), (list, tuple))] +
+            ["zabbix.groups"])
+
+
+def flatten(details, columns):
+    """
+    :param details: HostDetails.details, or a resolve_many error record
+    :param columns: column names, see default_columns
+    :return: list of cell values, None where the host has no value, lists as tuples
+    """
+    row = []
+    for column in columns:
+        section, _, key = column.partition(".")
+        if key:
+            value = details.get(section)
+            value = value.get(key) if isinstance(value, dict) else None
+        else:
+            value = details.get(column)
+        if isinstance(value, list):
+            value = tuple(value)
+        row.append(value)
+    return row
+
+
+class ColumnarTable():
+    """
+    Classified hosts stored column by column, each column as an array of codes into its own dictionary of distinct
+    values, so repeated owners, datacenters and groups are stored once.
+
+    List columns, like zabbix.groups or services.ntp, keep each distinct list as a tuple in their dictionary, and
+    export as list columns, except to CSV where they are joined with LIST_SEPARATOR.
+    """
+    def __init__(self, columns=None, list_columns=None):
+        """
+        :param columns: column names, defaults to default_columns()
+        :param list_columns: names of the columns holding lists, defaults to default_list_columns(), any other column
+                             a list is appended to becomes one too
+        """
+        self.columns = list(columns) if columns is not None else default_columns()
+        list_columns = list_columns if list_columns is not None else default_list_columns()
+        self.list_columns = set(list_columns) & set(self.columns)
+        self.dictionaries = dict((column, []) for column in self.columns)
+        self.codes = dict((column, array("i")) for column in self.columns)
+        self._lookup = dict((column, {}) for column in self.columns)
+
+    @classmethod
+    def from_details(cls, details_iter, columns=None):
+        """
+        :param details_iter: iterable of HostDetails.details, like HostDetails.resolve_many
+        :param columns: column names, defaults to default_columns()
+        :return: ColumnarTable
+        """
+        table = cls(columns)
+        for details in details_iter:
+            table.append(details)
+        return table
+
+    def append(self, details):
+        """
+        :param details: HostDetails.details, or a resolve_many error record
+        """
+        for column, value in zip(self.columns, flatten(details, self.columns)):
+            if value is None:
+                self.codes[column].append(NULL)
+                continue
+            if isinstance(value, tuple):
+                self.list_columns.add(column)
+            lookup = self._lookup[column]
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(self.dictionaries[column])
+                self.dictionaries[column].append(value)
+            self.codes[column].append(code)
+
+    def __len__(self):
+        return len(self.codes[self.columns[0]]) if self.columns else 0
+
+    def column(self, name):
+        """
+        :param name: column name
+        :return: decoded list of values, None where missing
+        """
+        dictionary = self.dictionaries[name]
+        if name in self.list_columns:
+            dictionary = [_as_list(value) for value in dictionary]
+        return [None if code == NULL else dictionary[code] for code in self.codes[name]]
+
+    def _csv_dictionary(self, name):
+        dictionary = self.dictionaries[name]
+        if name in self.list_columns:
+            return [LIST_SEPARATOR.join(_as_list(value)) for value in dictionary]
+        return dictionary
+
+    def write_csv(self, output, dictionary_output=None):
+        """
+        Write the table as CSV. With dictionary_output, output holds the integer codes (blank for missing) and
+        dictionary_output the column,code,value rows to decode them, otherwise output holds the decoded values. Lists
+        are joined with LIST_SEPARATOR.
+        :param output: text file object for the rows
+        :param dictionary_output: text file object for the dictionaries
+        """
+        writer = csv.writer(output)
+        writer.writerow(self.columns)
+        if dictionary_output is None:
+            dictionaries = [self._csv_dictionary(name) for name in self.columns]
+            columns = [[None if code == NULL else dictionary[code] for code in self.codes[name]]
+                       for name, dictionary in zip(self.columns, dictionaries)]
+            for row in zip(*columns):
+                writer.writerow(["" if value is None else value for value in row])
+            return
+
+        columns = [self.codes[name] for name in self.columns]
+        for row in zip(*columns):
+            writer.writerow(["" if code == NULL else code for code in row])
+        dictionary_writer = csv.writer(dictionary_output)
+        dictionary_writer.writerow(["column", "code", "value"])
+        for name in self.columns:
+            for code, value in enumerate(self._csv_dictionary(name)):
+                dictionary_writer.writerow([name, code, value])
+
+    def to_arrow(self):
+        """
+        Requires pyarrow
+        :return: pyarrow.Table with a dictionary encoded string column per column, and a list of dictionary encoded
+                 strings per list column
+        """
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        arrays = []
+        for name in self.columns:
+            codes = self.codes[name]
+            indices = pyarrow.array(list(codes), type=pyarrow.int32(), mask=[code == NULL for code in codes])
+            if name in self.list_columns:
+                arrays.append(_arrow_lists(pyarrow, self.dictionaries[name]).take(indices))
+            else:
+                arrays.append(pyarrow.DictionaryArray.from_arrays(indices, pyarrow.array(self.dictionaries[name], type=pyarrow.string())))
+        return pyarrow.Table.from_arrays(arrays, names=self.columns)
+
+    def write_parquet(self, path):
+        """
+        Requires pyarrow
+        :param path: parquet file to write
+        """
+        import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+        pyarrow.parquet.write_table(self.to_arrow(), path)
+
+    def to_numpy(self):
+        """
+        Requires numpy
+        :return: (structured array of int32 codes with a field per column, {column: object array of dictionary values,
+                 lists for the list columns})
+        """
+        import numpy  # pylint: disable=import-outside-toplevel
+        codes = numpy.empty(len(self), dtype=[(name, numpy.int32) for name in self.columns])
+        dictionaries = {}
+        for name in self.columns:
+            codes[name] = numpy.frombuffer(self.codes[name], dtype=numpy.int32) if len(self) else []
+            dictionary = self.dictionaries[name]
+            # filled in item by item, numpy.array would turn equal length lists into a 2d array
+            dictionaries[name] = numpy.empty(len(dictionary), dtype=object)
+            for code, value in enumerate(dictionary):
+                dictionaries[name][code] = _as_list(value) if name in self.list_columns else value
+        return codes, dictionaries
+
+
+def _as_list(value):
+    return list(value) if isinstance(value, tuple) else [value]
+
+
+def _arrow_lists(pyarrow, dictionary):
+    """
+    :param pyarrow: the pyarrow module
+    :param dictionary: a list column's distinct values
+    :return: pyarrow list array of dictionary encoded strings, one list per dictionary value
+    """
+    strings, lookup, offsets, indices = [], {}, [0], []
+    for value in dictionary:
+        for item in _as_list(value):
+            code = lookup.get(item)
+            if code is None:
+                code = lookup[item] = len(strings)
+                strings.append(item)
+            indices.append(code)
+        offsets.append(len(indices))
+    items = pyarrow.DictionaryArray.from_arrays(pyarrow.array(indices, type=pyarrow.int32()), pyarrow.array(strings, type=pyarrow.string()))
+    return pyarrow.ListArray.from_arrays(pyarrow.array(offsets, type=pyarrow.int32()), items)
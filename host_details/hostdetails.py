@@ -2,26 +2,47 @@
 Hostname Details breakdown (all the host information)
 """
 
-import re
+import os
+import copy
+import time
 import logging
-from collections import OrderedDict
-import yaml
 
-from host_details.compat import pkg_resources
-from host_details.excp import InvalidHostname, InvalidService, InvalidServiceSpec, InvalidServiceBadInstance
-from host_details.d42_connector import D42Connector, load_config_files
+from host_details.excp import HostDetailException, InvalidService, InvalidServiceSpec, InvalidServiceBadInstance
+from host_details.cache import LRUCache, MISSING
+from host_details.metrics import METRICS, PROFILE_ENV
+from host_details.roles import ROLE_REGISTRY
+from host_details.rules import default_rules
 
 LOGGER = logging.getLogger(__name__)
 
-
-class HostDetails():
+# which_service endpoints keyed on service spec and host location, shared by every HostDetails instance
+SERVICE_CACHE = LRUCache(maxsize=16384)
+METRICS.register_cache("service", SERVICE_CACHE.stats)
+METRICS.register_cache("role_template", ROLE_REGISTRY.stats)
+PARSE_HISTOGRAM = METRICS.histogram("parse")
+
+# details fields computed on first use: the method filling each in, and the fields that method reads besides the
+# parsed hostname components
+LAZY_FIELDS = {
+    "owner": ("which_owner", ()),
+    "security": ("which_security", ("owner",)),
+    "zabbix": ("zabbix_details", ("owner",)),
+    "services": ("which_services", ()),
+}
+# parsed fields that which_owner replaces with Device42 data for chassis and blades
+DEVICE42_FIELDS = ("function", "d42")
+
+
+class HostDetails():  # pylint: disable=too-many-instance-attributes
     """
     All the information/services based from Hostname
     """
-    def __init__(self, hostname):
+    def __init__(self, hostname, rules=None, d42_connector=None):
         """
         Takes a hostname, and breaks it down into the environment (tuk, daa), if it is production/qa/test, the server function.
         :param hostname: Hostname to get the details from.
+        :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+        :param d42_connector: D42Connector to look up chassis and blades with, defaults to the shared process wide connector
         """
         self.details = {
             "platform": None,
@@ -41,141 +62,220 @@ class HostDetails():
         }
 
         self.hostname = hostname
+        self.d42_connector = d42_connector
+        self._computed = set()
         self.details["hostname"] = hostname
         LOGGER.debug("Hostname: %s", hostname)
-        self.env_map = {
-            1: "prod",
-            5: "integ",
-            6: "test",
-            8: "qa",
-            9: "corp"
-        }
-
-        self.team_ownership_regexes = {
-            "team-dataplane-storage": "^ss$|^vsn$|^cephexit$|^cephcontrol$|^sntest$|^cephui$|^ssvip$|^sn$|^cephosd$|^cephmon$|^bs$|^bs5sp",
-            "team-dataplane-compute": "^vshs$|^vcsa$|^vcusage$|^java$|^hn$|^phn$",
-            "team-dataplane-networking": "^nsvc$|^sambahn$|^sambasvc$|^nsxmgr$|^nsxsvc$|^nsxctrl$|^nsxold.*|^nsxgw$|^nhn$",
-            "team-frontend": "^npmregistry$",
-            "team-infosec": "^ossec$|^nessus$|^secscanconsole$",
-            "team-infra-corpit":
-                "^fisheye$|^confluence$|^jira$|^okta$|^oktaprov$|^servicedesk$|^polycom$|^ups$|^fs$|^password$|^informatica$|^mitel$|^engrmetrics$|^usrmgmt.*|"
-                "^printdca$",
-            "team-infra-networking":
-                "^kentik$|^ise$|^sr$|^er$|^dltr$|^vr$|^f5lb$|^apm$|^kprobe$|^as$|^cs$|^ar$|^nms$|^acs$|^ds$|^cisco$|^fw$|^wlc$|^dlcr$|^dlbr$",
-            "team-infra-systems":
-                "^zabbix.*|^hmc$|^hpsim$|^hpsum$|^threeparsr$|^ntop$|^radius$|^ssmc$|^pdu$|^obs.*|^fc$|c[0-9]*oa|^rstricklin.*$|^oob.*|^c[0-9]*b[0-9]*|"
-                "^skyvreports$|^infrapypi$",
-            "team-middle-tier-core": "^charon|^cm$|^gb$|^qi$|^cmvip$|^nsvip$|^vmhmvip$",
-            "team-middle-tier-web-backend": "^guac$|^ftp$|^webnfs$|^mux.*|^memcache$|^wfe$|^trun$|^smartclient$|^cron$|^elastic(data|tribe|master)wfe$",
-            "team-reliability": "^netgauge.*$",
-            "team-tools-kubernetes": "^knode.*$|^kube.*|^etcd$|^kmaster$|^calico.*|^control$",
-            "team-tools-mysql": "^mysql$|^vimadb$|^bmetricsdb$",
-            "team-tools-observability":
-                "^mon$|^elastic(data|tribe|master)(?!wfe)$|^esvip$|^brokervip$|^influx.*$|^metric$|^bmetrics$|^bi$|^nlogsearch$|^nlog.*|^logger$|^gangliavip$|"
-                "^ingestervip$|^mq$",
-            "team-tools-runtime":
-                "^awx$|^backups$|^cmdb.*$|^dhcp$|^dockerreg$|^foreman$|^gerrit$|^grits$|^hostinfo$|^jenkins.*$|^ldap.*$|^legacyrepo$|.*jump.*|^log$|^nas$|"
-                "^skytapca.*|^nsmanage$|.*puppet.*|^oss$|^packages$|^repo$|^aptrepo$|^legacyrepo$|^smtp$|^tftp$|^zfsbackup$|^archive$|^ans$|^ns$|^ntp$|^lb.*|"
-                "^sdouglas.*$|^loga$|^stagingwp.*|^corpw.*|^vault$|^consulvault$",
-            "team-tools-virtualinfrastructure": "^sshost$|^mn$|^nsxhost$|^nsxctrlhost$|^nsxsvchost$|^vsnhn$|^esxi$|^dbesxi$|^eris$|^ris$|^dmyers.*$",
-        }
-
-        self.team_owner_overrides = {
-            "hostname": OrderedDict([("jenkins.mgt.test.skytap.com", "team-tools-build")]),
-            "shortname": OrderedDict((key, "team-tools-virtualinfrastructure") for key in ["tuk8vcsa1", "tuk5vcsa1", "tuk1vcsa1", "sea9vcsa1"]),
-            "function": OrderedDict([
-                ("zabbixmysql", "team-infra-systems"),
-                ("mysql", "team-tools-mysql")
-            ])
-        }
-
-        # tools team override
-        self.tas_override = [
-            "team-tools-runtime",
-            "team-tools-kubernetes",
-            "team-tools-build",
-            "team-tools-mysql",
-            "team-tools-observability",
-            "team-tools-virtualinfrastructure"
-        ]
-
-        # Mapping for the which service see method for details on variables
-        self.service_discovery = {
-            "logger": {"instance": "2", "resource": True, "management": True, "override": {"corp": None}},
-            "cmdb": {"override": {"qa": "cmdb.prod.skytap.com", "prod": "cmdb.prod.skytap.com"}},
-            "ntp": {"instance": ["1", "2"], "shared": True},
-            "zabbix": {"override": {"qa": "zabbix.qa.skytap.com", "prod": "zabbix.prod.skytap.com", "corp": "zabbix.prod.skytap.com"}},
-            "zabbixproxy": {"instance": "", "shared": True},
-            "zabbixjobs": {"instance": "1", "shared": True},
-            "foreman": {"override": {"qa": "foreman.qa.skytap.com", "prod": "foreman.prod.skytap.com"}},
-            "nsmanage": {"override": {"qa": "tuk8nsmanage1.qa.skytap.com", "prod": "tuk1nsmanage2.prod.skytap.com", "corp": "sea9nsmanage1.corp.skytap.com"}},
-            "opspuppetca": {
-                "override": {"qa": "tuk8opspuppetca3.qa.skytap.com", "prod": "tuk1opspuppetca1.prod.skytap.com", "corp": "tuk8opspuppetca3.qa.skytap.com"}
-            },
-            "ldap": {"instance": ["1", "2"], "shared": True},
-            "mnvcsa": {
-                "override": {"qa": "tuk8vcsa1.qa.skytap.com", "prod": "tuk1vcsa1.prod.skytap.com", "corp": "sea9vcsa1.corp.skytap.com",
-                             "integ": "tuk5vcsa1.mgt.integ.skytap.com"}
-            },
-            "vaultvip": {"instance": "1", "shared":True, "override": {"vault": True}}
-        }
-
-        component_regexes = [
-            # Stack
-            re.compile(r"^(?P<datacenterregion>(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<region>[r|m|x]\d))(?P<function>[a-z|0-9]+[a-z])(?P<instance>\d+)"),
-            # Stack regionless
-            re.compile(r"^(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<function>[a-z|0-9]+[a-z])(?P<instance>\d+)"),
-            # Infra
-            re.compile(r"^(?P<datacenterfunction>(?P<datacenter>[a-z]{3}\d)(?P<function>[0-9|a-z|-]+[a-z]))(?P<instance>\d+)"),
-            # Dev
-            re.compile(r"^(?P<datacenter>[a-z]{3}\d)(?P<function>[a-z|0-9|-]+[a-z])(?P<instance>\d+)"),
-            # Dev no location
-            re.compile(r"^(?P<function>[a-z|0-9|-]+[a-z])(?P<instance>\d+)")
-        ]
-
-        host_component = hostname.split(".")
-
-        # This just makes sure there are at least 4 items from a host name split which should be the minimum for any internal skytap hostname
-        if len(host_component) < 4:
-            raise InvalidHostname()
-
-        self.details["shortname"] = host_component[0]
-        if host_component[-3] in ['prod', 'qa', 'test', 'corp', 'ilo', 'integ']:
-            self.details["platform"] = host_component[-3]
-
-        if host_component[-4] in ['mgt', 'test', 'dev']:
-            self.details["subplatform"] = host_component[-4]
-
-        for regex in component_regexes:
-            result = regex.search(host_component[0])
-            if result:
-                self.details.update(result.groupdict())
-                break
-
-        if "function" not in self.details:
-            self.details["function"] = host_component[0]
+        self.rules = rules if rules is not None else default_rules()
+        # rule tables are shared by reference with every other instance using the same engine
+        self.env_map = self.rules.env_map
+        self.team_ownership_regexes = self.rules.team_ownership_regexes
+        self.team_owner_overrides = self.rules.team_owner_overrides
+        self.tas_override = self.rules.tas_override
+        self.service_discovery = self.rules.service_discovery
+
+        if METRICS.tracers:
+            with METRICS.timer("parse", hostname):
+                self.rules.hostname_parser.parse(hostname, self.details)
+        else:
+            start = time.perf_counter()
+            try:
+                self.rules.hostname_parser.parse(hostname, self.details)
+            finally:
+                if METRICS.enabled:
+                    PARSE_HISTOGRAM.observe(time.perf_counter() - start)
+
+    @classmethod
+    def resolve_many(cls, hostnames, method="all_details", rules=None, d42_connector=None, prefetch=False, profile=None):  # pylint: disable=too-many-arguments
+        """
+        Lazily classify many hosts, sharing the rule engine and D42 connection across the whole batch.
+
+        Setting HOST_DETAILS_PROFILE to a report path, or - for stderr, profiles every batch and writes the report once
+        the batch is exhausted, see host_details.profiling.
+        :param hostnames: any iterable or generator of hostnames
+        :param method: which details to fill out, all_details or hostsplit_service
+        :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+        :param d42_connector: D42Connector to look up chassis and blades with, defaults to the shared process wide connector
+        :param prefetch: bulk load every D42 device up front instead of one request per chassis or blade
+        :param profile: host_details.profiling.Profiler to record the batch into, the caller reads its report, one that is
+                        already running is left running
+        :return: generator of details dicts, hosts that can't be classified yield {"hostname": ..., "error": ...} instead
+        """
+        if method not in ("all_details", "hostsplit_service"):
+            raise ValueError("Unknown method: {}".format(method))
+        if rules is None:
+            rules = default_rules()
+        if prefetch:
+            if d42_connector is None:
+                from host_details.d42_connector import get_connector  # pylint: disable=import-outside-toplevel
+                d42_connector = get_connector()
+            d42_connector.prefetch()
+
+        profiling = None
+        if profile is None and os.environ.get(PROFILE_ENV):
+            from host_details import profiling  # pylint: disable=import-outside-toplevel
+            profile = profiling.Profiler()
+        if profile is None:
+            for hostname in hostnames:
+                yield cls._resolve_one(hostname, method, rules, d42_connector)
+            return
+
+        # a profiler that is already running belongs to the caller, which stops it, like a worker process's
+        owned = not profile.running
+        profile.start()
+        try:
+            for hostname in hostnames:
+                with profile.host(hostname):
+                    details = cls._resolve_one(hostname, method, rules, d42_connector)
+                yield details
+        finally:
+            if owned:
+                profile.stop()
+                if profiling is not None:
+                    profiling.write_report(profile)
+
+    @classmethod
+    def _resolve_one(cls, hostname, method, rules, d42_connector):
+        try:
+            hostdetails = cls(hostname, rules=rules, d42_connector=d42_connector)
+            getattr(hostdetails, method)()
+        except HostDetailException as error:
+            LOGGER.debug("Unable to classify %s: %s", hostname, error)
+            return {"hostname": hostname, "error": str(error)}
+        return hostdetails.details
+
+    @classmethod
+    async def resolve_many_async(cls, hostnames, method="all_details", rules=None, d42_connector=None):
+        """
+        resolve_many, overlapping the Device42 lookups of every chassis and blade in the batch
+        :param hostnames: any iterable of hostnames
+        :param method: which details to fill out, all_details or hostsplit_service
+        :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+        :param d42_connector: AsyncD42Connector to look up chassis and blades with, defaults to one around the shared connector
+        :return: list of details dicts in the same order as hostnames, with {"hostname": ..., "error": ...} for failures
+        """
+        if method not in ("all_details", "hostsplit_service"):
+            raise ValueError("Unknown method: {}".format(method))
+        if rules is None:
+            rules = default_rules()
+        if d42_connector is None:
+            from host_details.d42_async import AsyncD42Connector  # pylint: disable=import-outside-toplevel
+            d42_connector = AsyncD42Connector()
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        async def resolve(hostname):
+            try:
+                hostdetails = cls(hostname, rules=rules)
+                if hostdetails.needs_device42():
+                    await hostdetails.fetch_device42_async(d42_connector)
+                getattr(hostdetails, method)()
+            except HostDetailException as error:
+                LOGGER.debug("Unable to classify %s: %s", hostname, error)
+                return {"hostname": hostname, "error": str(error)}
+            return hostdetails.details
+
+        return await asyncio.gather(*(resolve(hostname) for hostname in hostnames))
+
+    @classmethod
+    def zabbix_host_groups(cls, hostnames, rules=None, d42_connector=None):
+        """
+        Zabbix host groups for many hosts at once, for bulk host group assignment
+        :param hostnames: any iterable or generator of hostnames
+        :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+        :param d42_connector: D42Connector to look up chassis and blades with, defaults to the shared process wide connector
+        :return: dict of zabbix group to list of hostnames in it, from each host's zabbix groups plus its location and
+                 role template rules (map_zabbix_rules), hosts that can't be classified are left out
+        """
+        if rules is None:
+            rules = default_rules()
+        groups = {}
+        for hostname in hostnames:
+            try:
+                hostdetails = cls(hostname, rules=rules, d42_connector=d42_connector)
+                hostdetails.zabbix_details()
+            except HostDetailException as error:
+                LOGGER.debug("Unable to classify %s: %s", hostname, error)
+                continue
+            host_groups = set(hostdetails.details["zabbix"]["groups"])
+            env = hostdetails.details["env"]
+            if env is not None and int(env) in rules.env_map:
+                host_groups.update(hostdetails.map_zabbix_rules())
+            else:
+                LOGGER.debug("No zabbix location rules for %s", hostname)
+            for group in host_groups:
+                groups.setdefault(group, []).append(hostname)
+        return groups
 
     def all_details(self):
         """
         Populates details with everything we are generating
         """
-        self.which_owner()
-        self.which_security()
-        self.zabbix_details()
-
-        for service, value in self.service_discovery.items():
-            self.details["services"][service] = self.which_service(service, **value)
+        self.compute("owner", "security", "zabbix", "services")
 
     def hostsplit_service(self):
         """
         Fills out details specific for hostsplit additional detail fields for hostname
         """
-        self.which_owner()
-        self.which_security()
+        self.compute("owner", "security", "services")
 
+    def compute(self, *fields):
+        """
+        Fill in lazily computed details fields and the fields they depend on, each at most once per host
+        :param fields: any of LAZY_FIELDS
+        """
+        for field in fields:
+            if field in self._computed:
+                continue
+            method, dependencies = LAZY_FIELDS[field]
+            self.compute(*dependencies)
+            getattr(self, method)()
+            self._computed.add(field)
+
+    def get(self, field):
+        """
+        One details field, computing only what it needs: owner never resolves services, and only chassis and blades
+        look themselves up in Device42
+        :param field: details key, like owner, security, zabbix or services
+        :return: the field's value, None for fields this host doesn't have
+        """
+        if field in LAZY_FIELDS:
+            self.compute(field)
+        elif field in DEVICE42_FIELDS and "owner" not in self._computed and self.needs_device42():
+            self.compute("owner")
+        return self.details.get(field)
+
+    def service(self, service):
+        """
+        One service endpoint, resolved on first use without resolving the other services
+        :param service: service in service_discovery, like ntp
+        :return: the full domain name of the target service, a list for services with several instances
+        """
+        services = self.details["services"]
+        if service not in services:
+            if service not in self.service_discovery:
+                raise InvalidService()
+            services[service] = self.which_service(service, **self.service_discovery[service])
+        return services[service]
+
+    @METRICS.timed("services")
+    def which_services(self):
+        """
+        Fills out the endpoint of every service in service_discovery, in service_discovery order
+        """
+        resolved = self.details["services"]
+        services = self.details["services"] = {}
         for service, value in self.service_discovery.items():
-            self.details["services"][service] = self.which_service(service, **value)
+            services[service] = resolved[service] if service in resolved else self.which_service(service, **value)
+
+    def record(self):
+        """
+        Compact copy of details for holding many hosts in memory, see HostRecord
+        :return: HostRecord
+        """
+        from host_details.record import HostRecord  # pylint: disable=import-outside-toplevel
+        return HostRecord(self.details)
 
+    @METRICS.timed("which_owner")
     def which_owner(self):
         """
         Determine host Group ownership
@@ -183,28 +283,50 @@ class HostDetails():
         """
         LOGGER.debug(self.details)
         for override_function, override_map in self.team_owner_overrides.items():
+            # fields the host's name doesn't have, like region on a regionless host, can't match
+            value = self.details.get(override_function)
+            if value is None:
+                continue
             for override_key, override_team in override_map.items():
-                if override_key in self.details[override_function]:  # pylint: disable=unsupported-membership-test
+                if override_key in value:
                     self.details["owner"] = override_team
                     break
 
         # for chassis and blades in d42, use their role to determine ownership
-        if re.match('^c[0-9]*b[0-9]*', self.details['function']) is not None:
+        if self.needs_device42():
             self.load_from_device42()
 
         if self.details["owner"] == "team-unclassified":
-            for owner, teamregex in self.team_ownership_regexes.items():
-                if re.search(teamregex, self.details["function"]):
-                    self.details["owner"] = owner
-                    break
+            owner = self.rules.owner_matcher.match(self.details["function"])
+            if owner is not None:
+                self.details["owner"] = owner
+
+    def needs_device42(self):
+        """
+        :return: True for chassis and blades, whose ownership comes from their Device42 role
+        """
+        return self.rules.chassis_blade_regex.match(self.details['function']) is not None
+
+    async def fetch_device42_async(self, d42_connector):
+        """
+        Fetch the Device42 record ahead of which_owner, which then uses it instead of making a blocking request
+        :param d42_connector: AsyncD42Connector to look up the host with
+        """
+        if 'd42' not in self.details:
+            self.details['d42'] = await d42_connector.get_by_hostname(self.hostname)
 
+    @METRICS.timed("load_from_device42")
     def load_from_device42(self):
         """
         Load details about the device from Device42
         :return:
         """
-        d42_connector = D42Connector(load_config_files())
-        self.details['d42'] = d42_connector.get_by_hostname(self.hostname)
+        if 'd42' not in self.details:
+            if self.d42_connector is None:
+                # the Device42 stack is only loaded once a chassis or blade needs it
+                from host_details.d42_connector import get_connector  # pylint: disable=import-outside-toplevel
+                self.d42_connector = get_connector()
+            self.details['d42'] = self.d42_connector.get_by_hostname(self.hostname)
         if self.details['d42'].get('Role'):
             self.details['function'] = self.details['d42']['Role']
             if self.details['d42']['Role'] in ['hn', 'hostingnode']:
@@ -218,6 +340,7 @@ class HostDetails():
             else:
                 self.details['owner'] = 'team-infra-systems'
 
+    @METRICS.timed("which_security")
     def which_security(self):
         """
         Determine which security groups apply to a host
@@ -262,7 +385,7 @@ class HostDetails():
                 self.details["security"]["role.service_owner"] = 'ops'
                 self.details["security"]["role.authorized"].append('engineering')
 
-    def which_service(self, service, instance=None, resource=False, management=False, shared=False, override=None):  # pylint:disable=r0911, r0912, r0913, r0915
+    def which_service(self, service, instance=None, resource=False, management=False, shared=False, override=None):  # pylint:disable=r0913
         """
         Identify Which service to use based on hostname information and sets in details
         :param service: Service to be determined
@@ -278,6 +401,31 @@ class HostDetails():
         if resource and management and shared:
             raise InvalidServiceSpec()
 
+        # the result only depends on the service spec and the host location, so it is shared across hosts
+        cache_key = (
+            service,
+            tuple(instance) if isinstance(instance, (list, tuple)) else instance,
+            resource,
+            management,
+            shared,
+            tuple(override.items()) if override else None,
+            self.details["datacenter"],
+            self.details["env"],
+            self.details["region"],
+            self.details["subplatform"],
+            self.details["platform"],
+        )
+        endpoint = SERVICE_CACHE.get(cache_key)
+        if endpoint is MISSING:
+            endpoint = self._which_service(service, instance, resource, management, shared, override)
+            SERVICE_CACHE.set(cache_key, tuple(endpoint) if isinstance(endpoint, list) else endpoint)
+        return list(endpoint) if isinstance(endpoint, tuple) else endpoint
+
+    def _which_service(self, service, instance, resource, management, shared, override):  # pylint:disable=r0911, r0912, r0913, r0915
+        """
+        Uncached which_service, see which_service for the parameters
+        :return: the full domain name of the target service
+        """
         if override:
             if "vault" in override:
                 if self.details["datacenter"] == "jng": #pylint: disable=no-else-return
@@ -364,7 +512,7 @@ class HostDetails():
             service_details["env"] = ""
 
         if instance is not None:
-            if isinstance(instance, list):
+            if isinstance(instance, (list, tuple)):
                 return ["{datacenter}{env}{region}{service}{service_instance}{subplatform}.{platform}.skytap.com".format(
                     service=service, service_instance=node, **service_details
                 ) for node in instance]
@@ -375,12 +523,13 @@ class HostDetails():
         raise InvalidServiceBadInstance()
 
 
+    @METRICS.timed("zabbix_details")
     def zabbix_details(self):
         """
         Map Zabbix rules/roles/groups from hostname and function.
         """
         if self.details["owner"] == "team-unclassified":
-            self.which_owner()
+            self.compute("owner")
 
         self.details["zabbix"] = {"groups": []}
 
@@ -398,42 +547,23 @@ class HostDetails():
             self.details["zabbix"]["groups"].append("team-storage")
 
 
+    @METRICS.timed("map_zabbix_rules")
     def map_zabbix_rules(self):
         """
         Map zabbix rules to hostname, based on location and role
         :return: sorted set of zabbix location rules
         """
-        # Mysql and mysqlvip are special function cases
-        function_override = [
-            'packages',
-            'zabbix',
-            'logger'
-        ]
         result = set()
 
         result.add(self.details["datacenter"] + self.details['env'])
         result.add(self.env_map[int(self.details['env'])])
 
-        if "mysql" in self.details["function"] and "vip" in self.details["function"]:
-            result.add("mysqlvip")
-        elif "mysql" in self.details["function"]:
-            result.add("mysql")
+        # mysql, hosting node, network and function override groups
+        result |= self.rules.zabbix_matcher.groups(self.details["function"])
 
         if "subplatform" in self.details and self.details["subplatform"] != "mgt" and any(key == self.details["platform"] for key in ["prod", "qa"]):
             result.add("sharedservices")
 
-        # Hosting Node
-        hnsearch = re.compile(".*c.*b")
-        if "hn" in self.details["function"] or hnsearch.search(self.details["function"]):
-            result.add("hn")
-
-        # Network
-        network_function_name = [
-            re.compile(x) for x in [".*as$", ".*cs$", ".*lb$", ".*vr$", ".*sr$", "^er$", ".*dltr$", ".*dlbr$", ".*ar$", ".*acs$", ".*ds$", ".*nsx.*"]
-        ]
-        if any(network.search(self.details["function"]) for network in network_function_name):
-            result.add("network")
-
         if "lb" in self.details['function'] and "network" in result and self.details["platform"] in ["ilo", "corp", "prod"]:
             result.add("f5ltm")
 
@@ -441,30 +571,20 @@ class HostDetails():
         if self.details['platform'] == "corp":
             result.add("corp-it")
 
-        for item in function_override:
-            if item in self.details["function"]:
-                result.add(item)
-
-        roletemplate = self.getroletemplate()
+        roletemplate = ROLE_REGISTRY.get(self.details["function"])
         if roletemplate:
             result |= set(roletemplate['zabbix']['host_groups'])
         return sorted(result)
 
+    @METRICS.timed("getroletemplate")
     def getroletemplate(self):
         """
         Zabbix role template based on role.yaml file like mysql
         :param role: the server role, like mysql
         :return: role template dictionary
         """
-        rolefile_path = pkg_resources.resource_filename('host_details.static', "roles/{}.yaml".format(self.details["function"]))
-        LOGGER.debug("Opening rolefile: %s", rolefile_path)
-        try:
-            with open(rolefile_path, "r") as rolefile:
-                roletemplate = yaml.safe_load(rolefile)
-        except IOError as error:
-            if error.errno == 2:
-                # File not found
-                return None
-            raise error
-
-        return roletemplate
+        roletemplate = ROLE_REGISTRY.get(self.details["function"])
+        if roletemplate is None:
+            return None
+        # the registry copy is shared by every host with this function
+        return copy.deepcopy(roletemplate)
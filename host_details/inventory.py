@@ -0,0 +1,144 @@
+"""
+In memory inventory of classified hosts with inverted indexes for fast multi attribute queries
+"""
+from host_details.record import HostRecord
+
+# single valued fields, indexed by their value
+SCALAR_FIELDS = ("owner", "datacenter", "env", "region", "platform", "function")
+# security roles, each kind in its own index, by its position in HostRecord.security
+SECURITY_FIELDS = ("service_owner", "authorized_operator", "authorized")
+# multi valued fields, a host is indexed under each of its values
+SET_FIELDS = ("authorized_operator", "authorized", "zabbix_groups", "services")
+
+
+def _endpoints(endpoint):
+    if isinstance(endpoint, tuple):
+        return endpoint
+    return (endpoint,) if endpoint else ()
+
+
+def _values(record, field):
+    if field == "service_owner":
+        return set([record.security[0]])
+    if field in SECURITY_FIELDS:
+        return set(record.security[SECURITY_FIELDS.index(field)])
+    if field == "zabbix_groups":
+        return set(getattr(record, "zabbix_groups", ()))
+    if field == "services":
+        return set(host for _, endpoint in record.services for host in _endpoints(endpoint))
+    return set([getattr(record, field, None)])
+
+
+class Inventory():
+    """
+    Classified hosts kept as HostRecords, with an inverted index per field from value to hostnames.
+
+    query(owner="team-tools-mysql", platform="prod", datacenter="tuk") intersects the index sets smallest first, so it
+    costs about the size of the smallest matching set rather than a rescan of the fleet. service_owner,
+    authorized_operator and authorized match the host's security roles of that kind only, zabbix_groups any of its
+    zabbix groups, and services any of its service endpoints, so query(services="tuk1ntp1.prod.skytap.com") lists the
+    hosts depending on that node.
+    """
+    FIELDS = SCALAR_FIELDS + ("service_owner",) + SET_FIELDS
+
+    def __init__(self, details_iter=None):
+        """
+        :param details_iter: optional iterable of HostDetails.details to add, like HostDetails.resolve_many
+        """
+        self._records = {}
+        self._index = dict((field, {}) for field in self.FIELDS)
+        if details_iter is not None:
+            for details in details_iter:
+                self.add(details)
+
+    def add(self, details):
+        """
+        Add or replace a host, resolve_many error records are ignored
+        :param details: HostDetails.details or HostRecord
+        :return: True if the host was added
+        """
+        if isinstance(details, dict):
+            if "error" in details:
+                return False
+            details = HostRecord(details)
+        self.remove(details.hostname)
+        self._records[details.hostname] = details
+        for field in self.FIELDS:
+            index = self._index[field]
+            for value in _values(details, field):
+                index.setdefault(value, set()).add(details.hostname)
+        return True
+
+    def remove(self, hostname):
+        """
+        :param hostname: host to drop
+        :return: True if the host was in the inventory
+        """
+        record = self._records.pop(hostname, None)
+        if record is None:
+            return False
+        for field in self.FIELDS:
+            index = self._index[field]
+            for value in _values(record, field):
+                hostnames = index[value]
+                hostnames.discard(hostname)
+                if not hostnames:
+                    del index[value]
+        return True
+
+    def get(self, hostname):
+        """
+        :param hostname: host to look up
+        :return: HostRecord, or None
+        """
+        return self._records.get(hostname)
+
+    def query(self, **criteria):
+        """
+        Hosts matching every criterion, like query(platform="prod", owner="team-tools-mysql", datacenter="tuk")
+        :param criteria: field=value for any of Inventory.FIELDS
+        :return: set of hostnames
+        """
+        unknown = set(criteria) - set(self.FIELDS)
+        if unknown:
+            raise ValueError("Unknown inventory fields: {}".format(", ".join(sorted(unknown))))
+        if not criteria:
+            return set(self._records)
+
+        matches = sorted((self._index[field].get(value, set()) for field, value in criteria.items()), key=len)
+        result = set(matches[0])
+        for hostnames in matches[1:]:
+            if not result:
+                break
+            result.intersection_update(hostnames)
+        return result
+
+    def dependents(self, endpoint, **criteria):
+        """
+        Hosts that resolve a service to endpoint, for impact analysis before maintenance on it
+        :param endpoint: service endpoint fqdn, like tuk1ntp1.prod.skytap.com
+        :param criteria: further field=value criteria, as for query
+        :return: dict of service name to set of hostnames resolving it to endpoint
+        """
+        dependents = {}
+        for hostname in self.query(services=endpoint, **criteria):
+            for service, endpoints in self._records[hostname].services:
+                if endpoint in _endpoints(endpoints):
+                    dependents.setdefault(service, set()).add(hostname)
+        return dependents
+
+    def values(self, field):
+        """
+        :param field: any of Inventory.FIELDS
+        :return: dict of each value of the field to how many hosts have it
+        """
+        return dict((value, len(hostnames)) for value, hostnames in self._index[field].items())
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, hostname):
+        return hostname in self._records
+
+    def __iter__(self):
+        return iter(self._records.values())
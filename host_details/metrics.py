@@ -0,0 +1,268 @@
+"""
+Low overhead instrumentation of the classification stages, exported as a stats dict or Prometheus text
+
+HostDetails times parse, which_owner, load_from_device42, which_security, zabbix_details, services (every
+service_discovery endpoint of a host), map_zabbix_rules and getroletemplate, counts Device42 requests and errors, and
+registers the service, role template and Device42 caches.
+"""
+import time
+import bisect
+import functools
+import threading
+from contextlib import ExitStack
+
+# upper bounds in seconds, classification stages take microseconds and Device42 round trips up to seconds
+BUCKETS = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PREFIX = "host_details"
+
+# report path, or - for stderr, profiles every HostDetails.resolve_many batch when set, see host_details.profiling
+PROFILE_ENV = "HOST_DETAILS_PROFILE"
+
+
+class Histogram():
+    """
+    Fixed bucket latency histogram.
+
+    Each thread observes into its own shard, so recording takes no lock and loses no updates; shards are summed when
+    read.
+    """
+    __slots__ = ("_local", "_shards", "_lock")
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        :param seconds: one latency
+        """
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect.bisect_left(BUCKETS, seconds)] += 1
+        # the last slot holds the sum
+        shard[-1] += seconds
+
+    def _new_shard(self):
+        shard = [0] * (len(BUCKETS) + 1) + [0.0]
+        with self._lock:
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def reset(self):
+        """ Forget every observation """
+        with self._lock:
+            for shard in self._shards:
+                shard[:] = [0] * (len(BUCKETS) + 1) + [0.0]
+
+    def snapshot(self):
+        """
+        :return: (per bucket counts ending with +Inf, sum of observations)
+        """
+        counts = [0] * (len(BUCKETS) + 1)
+        total = 0.0
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            shard = list(shard)
+            for index, count in enumerate(shard[:-1]):
+                counts[index] += count
+            total += shard[-1]
+        return counts, total
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, observations at or below it), ending with +Inf
+        """
+        return _cumulative(self.snapshot()[0])
+
+
+def _cumulative(counts):
+    running = 0
+    buckets = []
+    for bound, count in zip(BUCKETS + (float("inf"),), counts):
+        running += count
+        buckets.append((bound, running))
+    return buckets
+
+
+class Metrics():
+    """
+    Call counts and latency histograms per stage, named counters, and hit ratios of the registered caches.
+
+    Tracers are attached with add_tracer: each one is called with (stage, hostname) around every timed stage and must
+    return a context manager, like an OpenTelemetry tracer's start_as_current_span. Set enabled to False to skip all
+    timing and tracing.
+    """
+    def __init__(self):
+        self.enabled = True
+        self.tracers = []
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self._caches = {}
+
+    def histogram(self, stage):
+        """
+        :param stage: stage name, like which_owner
+        :return: the stage's Histogram, the same one for the life of the process
+        """
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(stage, Histogram())
+        return histogram
+
+    def observe(self, stage, seconds):
+        """
+        :param stage: stage name, like which_owner
+        :param seconds: how long one call took
+        """
+        self.histogram(stage).observe(seconds)
+
+    def count(self, name, amount=1):
+        """
+        :param name: counter name, like d42_requests
+        :param amount: how much to add
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register_cache(self, name, stats):
+        """
+        :param name: cache name, like service
+        :param stats: callable returning a dict with at least hits and misses
+        """
+        self._caches[name] = stats
+
+    def add_tracer(self, tracer):
+        """
+        :param tracer: callable taking (stage, hostname) and returning a context manager
+        """
+        self.tracers.append(tracer)
+
+    def remove_tracer(self, tracer):
+        """
+        :param tracer: a tracer passed to add_tracer
+        """
+        self.tracers.remove(tracer)
+
+    def timer(self, stage, hostname=None):
+        """
+        :param stage: stage name
+        :param hostname: host being classified, passed on to the tracers
+        :return: context manager timing its block as one call of stage
+        """
+        return _Timer(self, stage, hostname)
+
+    def timed(self, stage):
+        """
+        Decorator timing each call of a HostDetails method that takes no arguments as one call of stage
+        :param stage: stage name
+        """
+        histogram = self.histogram(stage)
+
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(instance):
+                if not self.enabled:
+                    return func(instance)
+                if self.tracers:
+                    with _Timer(self, stage, instance.hostname):
+                        return func(instance)
+                start = time.perf_counter()
+                try:
+                    return func(instance)
+                finally:
+                    histogram.observe(time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def reset(self):
+        """ Forget every observation and counter, registered caches and tracers are kept """
+        with self._lock:
+            for histogram in self._stages.values():
+                histogram.reset()
+            self._counters = {}
+
+    def stats(self):
+        """
+        :return: {"stages": {stage: {"count", "sum", "buckets"}}, "counters": {...}, "caches": {name: {..., "hit_ratio"}}}
+        """
+        with self._lock:
+            histograms = dict(self._stages)
+            counters = dict(self._counters)
+        stages = {}
+        for stage, histogram in histograms.items():
+            counts, total = histogram.snapshot()
+            if any(counts):
+                stages[stage] = {"count": sum(counts), "sum": total, "buckets": _cumulative(counts)}
+        caches = {}
+        for name, stats in self._caches.items():
+            cache = dict(stats())
+            lookups = cache["hits"] + cache["misses"]
+            cache["hit_ratio"] = cache["hits"] / lookups if lookups else None
+            caches[name] = cache
+        return {"stages": stages, "counters": counters, "caches": caches}
+
+    def prometheus(self):
+        """
+        :return: every metric in the Prometheus text exposition format
+        """
+        stats = self.stats()
+        lines = []
+        if stats["stages"]:
+            name = "{}_stage_seconds".format(PREFIX)
+            lines += ["# HELP {} Latency of each HostDetails classification stage".format(name), "# TYPE {} histogram".format(name)]
+            for stage in sorted(stats["stages"]):
+                histogram = stats["stages"][stage]
+                for bound, count in histogram["buckets"]:
+                    lines.append('{}_bucket{{stage="{}",le="{}"}} {}'.format(name, stage, "+Inf" if bound == float("inf") else repr(bound), count))
+                lines.append('{}_sum{{stage="{}"}} {!r}'.format(name, stage, histogram["sum"]))
+                lines.append('{}_count{{stage="{}"}} {}'.format(name, stage, histogram["count"]))
+        for counter in sorted(stats["counters"]):
+            name = "{}_{}_total".format(PREFIX, counter)
+            lines += ["# TYPE {} counter".format(name), "{} {}".format(name, stats["counters"][counter])]
+        if stats["caches"]:
+            for field, kind in (("hits", "counter"), ("misses", "counter"), ("hit_ratio", "gauge"), ("size", "gauge")):
+                name = "{}_cache_{}{}".format(PREFIX, field, "_total" if kind == "counter" else "")
+                lines.append("# TYPE {} {}".format(name, kind))
+                for cache in sorted(stats["caches"]):
+                    value = stats["caches"][cache].get(field)
+                    if value is not None:
+                        lines.append('{}{{cache="{}"}} {}'.format(name, cache, value))
+        return "\n".join(lines) + "\n"
+
+
+class _Timer():
+    __slots__ = ("metrics", "stage", "hostname", "start", "spans")
+
+    def __init__(self, metrics, stage, hostname):
+        self.metrics = metrics
+        self.stage = stage
+        self.hostname = hostname
+        self.start = None
+        self.spans = None
+
+    def __enter__(self):
+        if self.metrics.tracers:
+            self.spans = ExitStack()
+            for tracer in self.metrics.tracers:
+                self.spans.enter_context(tracer(self.stage, self.hostname))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.metrics.enabled:
+            self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        if self.spans is not None:
+            return self.spans.__exit__(*exc_info)
+        return False
+
+
+METRICS = Metrics()
@@ -0,0 +1,53 @@
+"""
+Hostname parser, breaks a fqdn into its platform, subplatform and short name components
+"""
+import re
+
+from host_details.excp import InvalidHostname
+
+PLATFORMS = frozenset(["prod", "qa", "test", "corp", "ilo", "integ"])
+SUBPLATFORMS = frozenset(["mgt", "test", "dev"])
+
+
+class HostnameParser():  # pylint: disable=too-few-public-methods
+    """
+    Classifies a short name against ordered shape patterns, the first shape that matches wins.
+
+    Shapes are tried with re.match, so patterns are anchored at the start of the short name whether or not they start
+    with ^. Each compiled pattern's bound match method is kept so parsing a hostname only costs one attribute lookup
+    and call per shape tried.
+    """
+    def __init__(self, component_regexes):
+        """
+        :param component_regexes: ordered short name regexes, with named groups for the components they extract
+        """
+        self.component_regexes = tuple(re.compile(regex) for regex in component_regexes)
+        self._matchers = tuple(regex.match for regex in self.component_regexes)
+
+    def parse(self, hostname, details=None):
+        """
+        :param hostname: fqdn like tuk1r1mysql1.mgt.prod.skytap.com
+        :param details: dict to fill in, like HostDetails.details, defaults to a new one
+        :return: details with shortname, platform and subplatform, plus the short name components, with the whole short
+                 name as the function when no shape matches
+        """
+        host_component = hostname.split(".")
+
+        # This just makes sure there are at least 4 items from a host name split which should be the minimum for any internal skytap hostname
+        if len(host_component) < 4:
+            raise InvalidHostname()
+
+        if details is None:
+            details = {}
+        shortname = host_component[0]
+        details["platform"] = host_component[-3] if host_component[-3] in PLATFORMS else None
+        details["subplatform"] = host_component[-4] if host_component[-4] in SUBPLATFORMS else None
+        details["shortname"] = shortname
+        for match in self._matchers:
+            result = match(shortname)
+            if result:
+                details.update(result.groupdict())
+                break
+        if "function" not in details:
+            details["function"] = shortname
+        return details
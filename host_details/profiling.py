@@ -0,0 +1,234 @@
+"""
+Opt-in profiling of batch classification runs: CPU profile, allocation growth and the slowest hosts by stage
+
+    HOST_DETAILS_PROFILE=/tmp/profile.txt host-details hosts.txt > details.jsonl
+
+or pass a Profiler as HostDetails.resolve_many(hostnames, profile=profiler) and read profiler.report().
+"""
+import os
+import sys
+import time
+import heapq
+import pstats
+import cProfile
+import logging
+import tracemalloc
+
+from host_details.metrics import METRICS, PROFILE_ENV
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Profiler():  # pylint: disable=too-many-instance-attributes
+    """
+    Collects a cProfile profile of the classification of each host, tracemalloc allocation snapshots, and each host's
+    time per stage through a METRICS tracer.
+
+    Only the classification itself is profiled, not whatever the caller does with the details between hosts.
+    """
+    def __init__(self, top=25, slowest=20, memory_interval=10000, frames=1):
+        """
+        :param top: functions and allocation sites to report
+        :param slowest: slowest hosts to report
+        :param memory_interval: hosts between traced memory samples
+        :param frames: traceback frames tracemalloc keeps per allocation, more is slower
+        """
+        self.top = top
+        self.slowest = slowest
+        self.memory_interval = memory_interval
+        self.frames = frames
+        self.hosts = 0
+        self.seconds = 0.0
+        self.memory = []
+        self._profile = cProfile.Profile()
+        self._slowest = []
+        self._stages = None
+        self._hostname = None
+        self._snapshot = None
+        self._allocations = []
+        self._started_tracemalloc = False
+        self._running = False
+
+    def start(self):
+        """ Start tracing allocations and attach the stage tracer """
+        if self._running:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        self._snapshot = tracemalloc.take_snapshot()
+        self.memory.append({"hosts": self.hosts, "bytes": tracemalloc.get_traced_memory()[0]})
+        METRICS.add_tracer(self._trace)
+        self._running = True
+
+    def stop(self):
+        """ Detach the stage tracer and take the final allocation snapshot, the report stays available """
+        if not self._running:
+            return
+        self._running = False
+        METRICS.remove_tracer(self._trace)
+        self._sample_memory()
+        self._allocations = self._top_allocations()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self._snapshot = None
+
+    @property
+    def running(self):
+        """ Whether the profiler is between start and stop """
+        return self._running
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def host(self, hostname):
+        """
+        :param hostname: host about to be classified
+        :return: context manager profiling the classification of one host
+        """
+        return _HostSpan(self, hostname)
+
+    def _trace(self, stage, hostname):
+        return _StageSpan(self, stage, hostname)
+
+    def _finish_host(self, hostname, seconds, stages):
+        self.hosts += 1
+        self.seconds += seconds
+        entry = (seconds, self.hosts, hostname, stages)
+        if len(self._slowest) < self.slowest:
+            heapq.heappush(self._slowest, entry)
+        elif entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+        if self.memory_interval and self.hosts % self.memory_interval == 0:
+            self._sample_memory()
+
+    def _sample_memory(self):
+        if tracemalloc.is_tracing() and (not self.memory or self.memory[-1]["hosts"] != self.hosts):
+            self.memory.append({"hosts": self.hosts, "bytes": tracemalloc.get_traced_memory()[0]})
+
+    def _top_allocations(self):
+        if self._snapshot is None or not tracemalloc.is_tracing():
+            return []
+        stats = tracemalloc.take_snapshot().compare_to(self._snapshot, "lineno")
+        return [{"location": str(stat.traceback), "size_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in stats[:self.top]]
+
+    def report(self):
+        """
+        :return: {"hosts", "seconds", "functions": [...], "memory": [...], "growth_per_10k": bytes,
+                  "allocations": [...], "slowest": [{"hostname", "seconds", "stages"}]}
+        """
+        functions = []
+        stats = pstats.Stats(self._profile) if self.hosts else None
+        if stats is not None:
+            rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)  # pylint: disable=no-member
+            for (filename, line, name), (_, calls, own, cumulative, _) in rows[:self.top]:
+                functions.append({"function": "{}:{}({})".format(filename, line, name), "calls": calls,
+                                  "own": own, "cumulative": cumulative})
+        growth = None
+        if len(self.memory) > 1 and self.memory[-1]["hosts"] > self.memory[0]["hosts"]:
+            growth = ((self.memory[-1]["bytes"] - self.memory[0]["bytes"]) * 10000
+                      // (self.memory[-1]["hosts"] - self.memory[0]["hosts"]))
+        slowest = [{"hostname": hostname, "seconds": seconds, "stages": stages}
+                   for seconds, _, hostname, stages in sorted(self._slowest, reverse=True)]
+        allocations = self._top_allocations() if self._running else self._allocations
+        return {"hosts": self.hosts, "seconds": self.seconds, "functions": functions, "memory": list(self.memory),
+                "growth_per_10k": growth, "allocations": allocations, "slowest": slowest}
+
+    def format_report(self):
+        """
+        :return: report as text
+        """
+        report = self.report()
+        lines = ["# {} hosts in {:.3f}s, pid {}".format(report["hosts"], report["seconds"], os.getpid()), "",
+                 "## top functions by own time", "{:>10} {:>10} {:>10}  function".format("calls", "own s", "cum s")]
+        for function in report["functions"]:
+            lines.append("{calls:>10} {own:>10.4f} {cumulative:>10.4f}  {function}".format(**function))
+        lines += ["", "## traced memory"]
+        for sample in report["memory"]:
+            lines.append("{hosts:>10} hosts {bytes:>14,} bytes".format(**sample))
+        if report["growth_per_10k"] is not None:
+            lines.append("growth per 10k hosts: {:,} bytes".format(report["growth_per_10k"]))
+        lines += ["", "## top allocation growth"]
+        for allocation in report["allocations"]:
+            lines.append("{size_diff:>+14,} bytes {count_diff:>+10} blocks  {location}".format(**allocation))
+        lines += ["", "## slowest hosts"]
+        for host in report["slowest"]:
+            stages = ", ".join("{} {:.6f}".format(stage, seconds)
+                               for stage, seconds in sorted(host["stages"].items(), key=lambda item: -item[1]))
+            lines.append("{:.6f}s {}  {}".format(host["seconds"], host["hostname"], stages))
+        return "\n".join(lines) + "\n"
+
+
+class _HostSpan():
+    __slots__ = ("profiler", "hostname", "start")
+
+    def __init__(self, profiler, hostname):
+        self.profiler = profiler
+        self.hostname = hostname
+        self.start = None
+
+    def __enter__(self):
+        profiler = self.profiler
+        profiler._hostname = self.hostname  # pylint: disable=protected-access
+        profiler._stages = {}  # pylint: disable=protected-access
+        self.start = time.perf_counter()
+        profiler._profile.enable()  # pylint: disable=protected-access
+        return self
+
+    def __exit__(self, *exc_info):
+        profiler = self.profiler
+        profiler._profile.disable()  # pylint: disable=protected-access
+        seconds = time.perf_counter() - self.start
+        stages, profiler._stages = profiler._stages, None  # pylint: disable=protected-access
+        profiler._finish_host(self.hostname, seconds, stages)  # pylint: disable=protected-access
+        return False
+
+
+class _StageSpan():
+    __slots__ = ("profiler", "stage", "hostname", "start")
+
+    def __init__(self, profiler, stage, hostname):
+        self.profiler = profiler
+        self.stage = stage
+        self.hostname = hostname
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stages = self.profiler._stages  # pylint: disable=protected-access
+        # nested stages, like which_owner called from zabbix_details, count towards both
+        if stages is not None and self.hostname == self.profiler._hostname:  # pylint: disable=protected-access
+            stages[self.stage] = stages.get(self.stage, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def profiler_from_env():
+    """
+    :return: a new Profiler when HOST_DETAILS_PROFILE is set, else None
+    """
+    return Profiler() if os.environ.get(PROFILE_ENV) else None
+
+
+def write_report(profiler, path=None):
+    """
+    Append the profiler's report to a file, or write it to stderr
+    :param profiler: stopped Profiler
+    :param path: report file, - for stderr, defaults to HOST_DETAILS_PROFILE
+    """
+    path = path if path is not None else os.environ.get(PROFILE_ENV, "-")
+    text = profiler.format_report()
+    if path == "-":
+        sys.stderr.write(text)
+        return
+    with open(path, "a", encoding="utf-8") as report:
+        report.write(text)
+    LOGGER.info("Wrote profile of %s hosts to %s", profiler.hosts, path)
@@ -0,0 +1,91 @@
+"""
+Compact, read-only representation of a classified host, for holding a whole fleet in memory
+"""
+import sys
+
+from host_details.cache import LRUCache, MISSING
+
+# bounded, so a long running process holding changing fleets doesn't keep every value it ever saw
+_POOL = LRUCache(maxsize=65536)
+
+
+def _pooled(value):
+    """ One shared instance per distinct immutable value, among the recently pooled ones """
+    pooled = _POOL.get(value)
+    if pooled is MISSING:
+        _POOL.set(value, value)
+        return value
+    return pooled
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _freeze(value):
+    return tuple(_intern(item) for item in value) if isinstance(value, list) else _intern(value)
+
+
+def _thaw(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+class HostRecord():
+    """
+    One classified host in __slots__, with short repeated strings interned and the security, services and zabbix groups
+    shared by reference between every host that has the same ones (services repeat per location).
+
+    Keys only some details have (instance, datacenterregion, datacenterfunction, zabbix_groups, d42) are left unset
+    when absent, so reading them raises AttributeError, use getattr(record, field, None).
+
+    to_dict() gives back exactly the HostDetails.details layout it was built from.
+    """
+    __slots__ = ("hostname", "shortname", "platform", "subplatform", "env", "datacenter", "region", "datacenterregion",
+                 "datacenterfunction", "function", "instance", "owner", "security", "services", "zabbix_groups", "d42")
+
+    _FIELDS = ("hostname", "shortname", "platform", "subplatform", "env", "datacenter", "region", "datacenterregion",
+               "datacenterfunction", "function", "instance", "owner")
+
+    def __init__(self, details):
+        """
+        :param details: HostDetails.details
+        """
+        self.hostname = _intern(details["hostname"])
+        for field in self._FIELDS[1:]:
+            if field in details:
+                setattr(self, field, _intern(details[field]))
+        security = details["security"]
+        self.security = _pooled((_intern(security["role.service_owner"]),
+                                 _freeze(security["role.authorized_operator"]),
+                                 _freeze(security["role.authorized"])))
+        self.services = _pooled(tuple((_intern(service), _freeze(endpoint)) for service, endpoint in details["services"].items()))
+        if "zabbix" in details:
+            self.zabbix_groups = _pooled(_freeze(details["zabbix"]["groups"]))
+        if "d42" in details:
+            self.d42 = tuple((key, _freeze(value)) for key, value in details["d42"].items())
+
+    def to_dict(self):
+        """
+        :return: a new dict in the HostDetails.details layout
+        """
+        details = {}
+        for field in self._FIELDS:
+            value = getattr(self, field, MISSING)
+            if value is not MISSING:
+                details[field] = value
+        details["security"] = {
+            "role.service_owner": self.security[0],
+            "role.authorized_operator": list(self.security[1]),
+            "role.authorized": list(self.security[2]),
+        }
+        details["services"] = dict((service, _thaw(endpoint)) for service, endpoint in self.services)
+        zabbix_groups = getattr(self, "zabbix_groups", None)
+        if zabbix_groups is not None:
+            details["zabbix"] = {"groups": list(zabbix_groups)}
+        d42 = getattr(self, "d42", None)
+        if d42 is not None:
+            details["d42"] = dict((key, _thaw(value)) for key, value in d42)
+        return details
+
+    def __repr__(self):
+        return "HostRecord({!r})".format(self.hostname)
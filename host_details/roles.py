@@ -0,0 +1,190 @@
+"""
+Zabbix role templates from static/roles, indexed and parsed once per process
+"""
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+
+LOGGER = logging.getLogger(__name__)
+
+BUNDLE_NAME = "roles.json"
+
+
+def _digest(path):
+    with open(path, "rb") as rolefile:
+        return hashlib.sha256(rolefile.read()).hexdigest()
+
+
+def _load_yaml(path):
+    """
+    :param path: role template
+    :return: (parsed template, sha256 of the file)
+    """
+    import yaml  # pylint: disable=import-outside-toplevel
+    with open(path, "rb") as rolefile:
+        content = rolefile.read()
+    return yaml.safe_load(content), hashlib.sha256(content).hexdigest()
+
+
+def write_bundle(roles_dir, bundle_path):
+    """
+    Parse every role template in roles_dir into a single json bundle, loaded by RoleRegistry instead of the yaml files
+    :param roles_dir: directory holding <role>.yaml templates
+    :param bundle_path: where to write the bundle
+    """
+    roles = {}
+    for filename in sorted(os.listdir(roles_dir)):
+        role, ext = os.path.splitext(filename)
+        if ext != ".yaml":
+            continue
+        path = os.path.join(roles_dir, filename)
+        template, digest = _load_yaml(path)
+        roles[role] = {"sha256": digest, "template": template}
+    with open(bundle_path, "w", encoding="utf-8") as bundle:
+        json.dump({"roles": roles}, bundle, sort_keys=True)
+
+
+class RoleRegistry():  # pylint: disable=too-many-instance-attributes
+    """
+    In memory index of the role templates.
+
+    The roles directory is listed once so missing roles cost a dict lookup, and each template is parsed at most once
+    (or taken from the prebuilt bundle). Every check_interval seconds the directory and file mtimes are checked against
+    the ones seen when each template was loaded, so long running processes pick up edited, added and removed roles. A
+    template whose mtime changed is only parsed again if its content hash changed too, so installing or touching the
+    files doesn't throw away the bundle. Bundled templates whose installed file has different content are ignored when
+    loading, and parsed from the file instead.
+    """
+    def __init__(self, roles_dir=None, bundle_path=None, check_interval=60):
+        """
+        :param roles_dir: directory holding <role>.yaml templates, defaults to host_details/static/roles
+        :param bundle_path: prebuilt bundle from write_bundle, defaults to host_details/static/roles.json if present
+        :param check_interval: seconds between mtime checks, None to never check again
+        """
+        self.roles_dir = roles_dir
+        self.bundle_path = bundle_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = None
+        self._dir_mtime = None
+        self._templates = {}
+        self._mtimes = {}
+        self._digests = {}
+        self._checked = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, role):
+        """
+        Role template for a function, shared between callers so it must not be modified
+        :param role: the server role, like mysql
+        :return: role template dictionary, or None when there is no template for the role
+        """
+        with self._lock:
+            if self._index is None:
+                self._load()
+            elif self.check_interval is not None and time.time() - self._checked >= self.check_interval:
+                self._refresh()
+
+            if role not in self._index or role in self._templates:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if role not in self._index:
+                return None
+            if role not in self._templates:
+                path = self._index[role]
+                LOGGER.debug("Opening rolefile: %s", path)
+                try:
+                    self._mtimes[role] = os.stat(path).st_mtime
+                    self._templates[role], self._digests[role] = _load_yaml(path)
+                except FileNotFoundError:
+                    return None
+            return self._templates[role]
+
+    def clear(self):
+        """ Forget everything, the next lookup re-indexes the roles directory """
+        with self._lock:
+            self._index = None
+            self._templates = {}
+            self._mtimes = {}
+            self._digests = {}
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :return: dict of hits (templates and missing roles answered from memory), misses (template file reads) and size
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._templates)}
+
+    def _scan(self):
+        try:
+            self._dir_mtime = os.stat(self.roles_dir).st_mtime
+            filenames = os.listdir(self.roles_dir)
+        except FileNotFoundError:
+            self._dir_mtime = None
+            filenames = []
+        self._index = {}
+        for filename in filenames:
+            role, ext = os.path.splitext(filename)
+            if ext == ".yaml":
+                self._index[role] = os.path.join(self.roles_dir, filename)
+
+    def _load(self):
+        # package data is located on first use rather than at import
+        if self.roles_dir is None:
+            from host_details.compat import resource_filename  # pylint: disable=import-outside-toplevel
+            self.roles_dir = resource_filename("host_details.static", "roles")
+        if self.bundle_path is None:
+            self.bundle_path = os.path.join(os.path.dirname(self.roles_dir), BUNDLE_NAME)
+        self._scan()
+        self._checked = time.time()
+        if not os.path.exists(self.bundle_path):
+            return
+        with open(self.bundle_path, "r", encoding="utf-8") as bundle:
+            roles = json.load(bundle)["roles"]
+        LOGGER.debug("Loaded %d role templates from %s", len(roles), self.bundle_path)
+        for role, entry in roles.items():
+            path = self._index.setdefault(role, os.path.join(self.roles_dir, "{}.yaml".format(role)))
+            # the installed files' mtimes and content, not the ones the bundle was built from
+            try:
+                mtime = os.stat(path).st_mtime
+                digest = _digest(path)
+            except FileNotFoundError:
+                mtime = digest = None
+            if digest is not None and digest != entry.get("sha256"):
+                LOGGER.debug("Bundled role template is stale, parsing %s instead", path)
+                continue
+            self._templates[role] = entry["template"]
+            self._digests[role] = entry.get("sha256")
+            self._mtimes[role] = mtime
+
+    def _refresh(self):
+        self._checked = time.time()
+        try:
+            dir_mtime = os.stat(self.roles_dir).st_mtime
+        except FileNotFoundError:
+            dir_mtime = None
+        if dir_mtime != self._dir_mtime:
+            self._scan()
+        for role in list(self._templates):
+            try:
+                mtime = os.stat(self._index[role]).st_mtime
+            except (KeyError, FileNotFoundError):
+                mtime = None
+            if mtime == self._mtimes.get(role):
+                continue
+            if mtime is not None and _digest(self._index[role]) == self._digests.get(role):
+                self._mtimes[role] = mtime
+                continue
+            LOGGER.debug("Role template changed: %s", role)
+            del self._templates[role]
+            del self._mtimes[role]
+            self._digests.pop(role, None)
+
+
+ROLE_REGISTRY = RoleRegistry()
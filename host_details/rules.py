@@ -0,0 +1,513 @@
+"""
+Classification rule tables shared by every HostDetails instance
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+from host_details.excp import InvalidRuleFile
+from host_details.parser import HostnameParser
+
+LOGGER = logging.getLogger(__name__)
+
+# env_map, team_ownership_regexes, team_owner_overrides, tas_override and service_discovery are data, loaded from
+# static/rules.json (see load_rule_tables) so they can change without a release
+RULES_FILE_NAME = "rules.json"
+RULES_FILE_VERSION = 1
+# rule file the process wide engine loads instead of the bundled one
+RULES_ENV = "HOST_DETAILS_RULES"
+
+# the which_service keyword arguments a service_discovery entry may set
+SERVICE_SPEC_KEYS = frozenset(["instance", "resource", "management", "shared", "override"])
+# the details fields from hostname parsing that team_owner_overrides may match on
+OVERRIDE_FIELDS = frozenset(["hostname", "shortname", "platform", "subplatform", "function", "datacenter", "datacenterregion",
+                             "datacenterfunction", "env", "region", "instance"])
+
+# module level names the rule tables had before they moved to the rule file
+_TABLE_CONSTANTS = {
+    "ENV_MAP": "env_map",
+    "TEAM_OWNERSHIP_REGEXES": "team_ownership_regexes",
+    "TEAM_OWNER_OVERRIDES": "team_owner_overrides",
+    "TAS_OVERRIDE": "tas_override",
+    "SERVICE_DISCOVERY": "service_discovery",
+}
+
+# '|' is accepted in function names and regions, hostnames using it have always been classified this way
+COMPONENT_REGEXES = [
+    # Stack
+    r"^(?P<datacenterregion>(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<region>[mrx|]\d))(?P<function>[a-z0-9|]+[a-z])(?P<instance>\d+)",
+    # Stack regionless
+    r"^(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<function>[a-z0-9|]+[a-z])(?P<instance>\d+)",
+    # Infra, also every dev host with a location
+    r"^(?P<datacenterfunction>(?P<datacenter>[a-z]{3}\d)(?P<function>[a-z0-9|-]+[a-z]))(?P<instance>\d+)",
+    # Dev no location
+    r"^(?P<function>[a-z0-9|-]+[a-z])(?P<instance>\d+)",
+]
+
+# for chassis and blades in d42, use their role to determine ownership
+CHASSIS_BLADE_REGEX = '^c[0-9]*b[0-9]*'
+
+# zabbix location rules from the function alone, searched anywhere in the function
+HOSTING_NODE_REGEX = r"hn|c.*b"
+NETWORK_FUNCTION_REGEX = r"(?:as|cs|lb|vr|sr|^er|dltr|dlbr|ar|acs|ds)$|nsx"
+ZABBIX_FUNCTION_OVERRIDE = ["packages", "zabbix", "logger"]
+
+
+_LITERAL_BRANCH = re.compile(r"^\^([a-z0-9-]+)\$$")
+# inline global flags, numbered or named group references, conditionals and named groups, which would fail or change
+# meaning once renumbered inside a combined pattern
+_UNCOMBINABLE = re.compile(r"\(\?[aiLmsux]+\)|\\[1-9]|\(\?P[<=]|\(\?\(")
+
+
+def _compiles(regex):
+    try:
+        re.compile(regex)
+    except re.error:
+        return False
+    return True
+
+
+def _split_alternation(regex):
+    """
+    Split a regex on its top level | operators, alternations inside groups and character classes are left alone
+    :param regex: regex source
+    :return: list of branch sources
+    """
+    branches = []
+    current = []
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in regex:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            branches.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    branches.append("".join(current))
+    return branches
+
+
+class OwnerMatcher():  # pylint: disable=too-few-public-methods
+    """
+    Compiled form of the team ownership regexes, keeping their first-match-wins ordering.
+
+    Exact literal branches like ^jira$ resolve with a single dict lookup. Everything else goes through one combined
+    pattern with a named group per team, tried in team order. Regexes whose meaning would change inside the combined
+    pattern, those with inline global flags, group references or named groups, keep their own re.search, tried at their
+    place in team order between the combined runs of the others.
+    """
+    __slots__ = ("_literals", "_segments", "_owners")
+
+    def __init__(self, team_ownership_regexes):
+        """
+        :param team_ownership_regexes: ordered owner to function regex
+        """
+        ordered = [(owner, re.compile(regex)) for owner, regex in team_ownership_regexes.items()]
+        literals = set()
+        groups = []
+        self._owners = {}
+        # (match function, owner), owner is None for a combined pattern whose matching group names the owner
+        self._segments = []
+        for index, (owner, regex) in enumerate(team_ownership_regexes.items()):
+            group = "owner{}".format(index)
+            branches = []
+            for branch in _split_alternation(regex):
+                literal = _LITERAL_BRANCH.match(branch)
+                if literal:
+                    literals.add(literal.group(1))
+                # re.match with a lazy lead-in behaves like re.search, but keeps the groups tried in team order
+                branches.append(branch if branch.startswith("^") else "(?s:.*?)(?:{})".format(branch))
+            combined = "(?P<{}>{})".format(group, "|".join(branches))
+            if _UNCOMBINABLE.search(regex) or not _compiles(combined):
+                self._add_combined(groups)
+                groups = []
+                self._segments.append((re.compile(regex).search, owner))
+                continue
+            self._owners[group] = owner
+            groups.append(combined)
+        self._add_combined(groups)
+
+        # resolve each literal against the full ordered rules, an earlier team's regex may claim it first
+        self._literals = {}
+        for literal in literals:
+            self._literals[literal] = next(owner for owner, regex in ordered if regex.search(literal))
+
+    def _add_combined(self, groups):
+        if groups:
+            self._segments.append((re.compile("|".join(groups)).match, None))
+
+    def match(self, function):
+        """
+        Find the first team whose ownership regex matches the function
+        :param function: host function like mysql
+        :return: the owning team, or None
+        """
+        owner = self._literals.get(function)
+        if owner is not None:
+            return owner
+        for match, owner in self._segments:
+            result = match(function)
+            if result:
+                return owner if owner is not None else self._owners[result.lastgroup]
+        return None
+
+
+class ZabbixFunctionMatcher():  # pylint: disable=too-few-public-methods
+    """
+    Compiled form of the zabbix location rules that only depend on the host function: mysql, mysqlvip, hosting node,
+    network and the function overrides. Functions repeat across a fleet, so each distinct one is only matched once.
+    """
+    __slots__ = ("_hosting_node", "_network", "_overrides", "_maxsize", "_memo")
+
+    def __init__(self, hosting_node_regex, network_function_regex, function_override, maxsize=4096):
+        """
+        :param hosting_node_regex: functions of hosting nodes
+        :param network_function_regex: functions of network devices
+        :param function_override: substrings of the function that are zabbix groups themselves
+        :param maxsize: distinct functions remembered before starting over
+        """
+        self._hosting_node = re.compile(hosting_node_regex)
+        self._network = re.compile(network_function_regex)
+        self._overrides = tuple(function_override)
+        self._maxsize = maxsize
+        self._memo = {}
+
+    def groups(self, function):
+        """
+        :param function: host function like mysql
+        :return: frozenset of zabbix groups
+        """
+        groups = self._memo.get(function)
+        if groups is None:
+            if len(self._memo) >= self._maxsize:
+                self._memo.clear()
+            groups = self._memo[function] = self._match(function)
+        return groups
+
+    def _match(self, function):
+        groups = set(item for item in self._overrides if item in function)
+        # Mysql and mysqlvip are special function cases
+        if "mysql" in function:
+            groups.add("mysqlvip" if "vip" in function else "mysql")
+        if self._hosting_node.search(function):
+            groups.add("hn")
+        if self._network.search(function):
+            groups.add("network")
+        return frozenset(groups)
+
+
+def _freeze(value):
+    """
+    Recursively convert mappings and lists into read-only equivalents
+    :param value: rule table, or a value inside one
+    :return: MappingProxyType for mappings, tuple for lists
+    """
+    if isinstance(value, dict):
+        return MappingProxyType(OrderedDict((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _require(path, condition, reason):
+    if not condition:
+        raise InvalidRuleFile(path, reason)
+
+
+def _is_mapping_of_strings(value):
+    return isinstance(value, dict) and all(isinstance(key, str) and isinstance(item, str) for key, item in value.items())
+
+
+def load_rule_tables(path):
+    """
+    Load and validate a rule file
+    :param path: json rule file, like host_details/static/rules.json
+    :return: (file version, dict of RuleEngine keyword argument to rule table)
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as rulefile:
+            data = json.load(rulefile, object_pairs_hook=OrderedDict)
+    except (OSError, ValueError) as error:
+        raise InvalidRuleFile(path, error) from error
+
+    _require(path, isinstance(data, dict), "not a json object")
+    _require(path, data.get("version") == RULES_FILE_VERSION, "unsupported version {!r}".format(data.get("version")))
+    missing = [table for table in _TABLE_CONSTANTS.values() if table not in data]
+    _require(path, not missing, "missing {}".format(", ".join(missing)))
+
+    env_map = data["env_map"]
+    _require(path, _is_mapping_of_strings(env_map) and all(key.isdigit() for key in env_map), "env_map must map env digits to names")
+
+    team_ownership_regexes = data["team_ownership_regexes"]
+    _require(path, _is_mapping_of_strings(team_ownership_regexes), "team_ownership_regexes must map owners to regexes")
+    for owner, regex in team_ownership_regexes.items():
+        try:
+            re.compile(regex)
+        except re.error as error:
+            raise InvalidRuleFile(path, "team_ownership_regexes {}: {}".format(owner, error)) from error
+
+    team_owner_overrides = data["team_owner_overrides"]
+    _require(path, isinstance(team_owner_overrides, dict) and all(_is_mapping_of_strings(item) for item in team_owner_overrides.values()),
+             "team_owner_overrides must map details fields to {substring: owner}")
+    unknown = sorted(set(team_owner_overrides) - OVERRIDE_FIELDS)
+    _require(path, not unknown, "team_owner_overrides unknown details fields {}".format(", ".join(unknown)))
+
+    tas_override = data["tas_override"]
+    _require(path, isinstance(tas_override, list) and all(isinstance(owner, str) for owner in tas_override),
+             "tas_override must be a list of owners")
+
+    service_discovery = data["service_discovery"]
+    _require(path, isinstance(service_discovery, dict), "service_discovery must map services to which_service arguments")
+    for service, spec in service_discovery.items():
+        _require(path, isinstance(spec, dict) and set(spec) <= SERVICE_SPEC_KEYS,
+                 "service_discovery {} may only set {}".format(service, ", ".join(sorted(SERVICE_SPEC_KEYS))))
+        _require(path, spec.get("override") is None or isinstance(spec["override"], dict),
+                 "service_discovery {} override must map platforms to endpoints".format(service))
+
+    return data["version"], {
+        "env_map": OrderedDict((int(key), item) for key, item in env_map.items()),
+        "team_ownership_regexes": team_ownership_regexes,
+        "team_owner_overrides": team_owner_overrides,
+        "tas_override": tas_override,
+        "service_discovery": service_discovery,
+    }
+
+
+def bundled_rules_path():
+    """
+    :return: path of the rule file shipped in host_details/static
+    """
+    from host_details.compat import resource_filename  # pylint: disable=import-outside-toplevel
+    return resource_filename("host_details.static", RULES_FILE_NAME)
+
+
+_BUNDLED_TABLES = None
+
+
+def _bundled_tables():
+    global _BUNDLED_TABLES  # pylint: disable=global-statement
+    if _BUNDLED_TABLES is None:
+        _BUNDLED_TABLES = load_rule_tables(bundled_rules_path())[1]
+    return _BUNDLED_TABLES
+
+
+def __getattr__(name):
+    """ ENV_MAP, TEAM_OWNERSHIP_REGEXES, etc. are still importable, as the tables of the bundled rule file """
+    if name in _TABLE_CONSTANTS:
+        return _bundled_tables()[_TABLE_CONSTANTS[name]]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+# one attribute per compiled rule table, plus the version and fingerprints
+class RuleEngine():  # pylint: disable=too-many-instance-attributes
+    """
+    Immutable, precompiled set of the rule tables used to classify a host.
+
+    A single engine is shared by reference between every HostDetails instance (see default_rules), each instance keeps
+    the engine it started with even if the rule file is reloaded meanwhile. Pass a custom engine to HostDetails to
+    classify against different rules.
+    """
+    __slots__ = ("env_map", "team_ownership_regexes", "owner_matcher", "team_owner_overrides", "tas_override",
+                 "service_discovery", "hostname_parser", "component_regexes", "chassis_blade_regex", "zabbix_matcher", "version",
+                 "fingerprint", "table_fingerprints", "_frozen")
+
+    def __init__(self, env_map=None, team_ownership_regexes=None, team_owner_overrides=None,  # pylint: disable=too-many-arguments
+                 tas_override=None, service_discovery=None, component_regexes=None, version=None):
+        """
+        Build and compile the rule tables, any table not passed in falls back to the bundled rule file.
+        :param env_map: env digit to zabbix env group
+        :param team_ownership_regexes: ordered owner to function regex, first match wins
+        :param team_owner_overrides: ordered details field to {substring: owner}
+        :param tas_override: owners that get the tools and services security policy
+        :param service_discovery: ordered service name to which_service keyword arguments
+        :param component_regexes: ordered shortname regexes, first match wins
+        :param version: rule file version the tables came from
+        """
+        if None in (env_map, team_ownership_regexes, team_owner_overrides, tas_override, service_discovery):
+            bundled = _bundled_tables()
+            env_map = bundled["env_map"] if env_map is None else env_map
+            team_ownership_regexes = bundled["team_ownership_regexes"] if team_ownership_regexes is None else team_ownership_regexes
+            team_owner_overrides = bundled["team_owner_overrides"] if team_owner_overrides is None else team_owner_overrides
+            tas_override = bundled["tas_override"] if tas_override is None else tas_override
+            service_discovery = bundled["service_discovery"] if service_discovery is None else service_discovery
+        team_ownership_regexes = _freeze(team_ownership_regexes)
+        component_regexes = COMPONENT_REGEXES if component_regexes is None else component_regexes
+
+        self.env_map = _freeze(env_map)
+        self.team_ownership_regexes = team_ownership_regexes
+        self.owner_matcher = OwnerMatcher(team_ownership_regexes)
+        self.team_owner_overrides = _freeze(team_owner_overrides)
+        self.tas_override = frozenset(tas_override)
+        self.service_discovery = _freeze(service_discovery)
+        self.hostname_parser = HostnameParser(component_regexes)
+        self.component_regexes = self.hostname_parser.component_regexes
+        self.chassis_blade_regex = re.compile(CHASSIS_BLADE_REGEX)
+        self.zabbix_matcher = ZabbixFunctionMatcher(HOSTING_NODE_REGEX, NETWORK_FUNCTION_REGEX, ZABBIX_FUNCTION_OVERRIDE)
+        self.version = version
+        self.table_fingerprints = self._table_fingerprints(component_regexes)
+        self.fingerprint = hashlib.sha256("".join(self.table_fingerprints.values()).encode("utf-8")).hexdigest()
+        self._frozen = True
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        :param path: json rule file, see load_rule_tables
+        :return: RuleEngine for the file's tables
+        :raises InvalidRuleFile: when the file doesn't load, or its tables don't compile into an engine
+        """
+        version, tables = load_rule_tables(path)
+        try:
+            return cls(version=version, **tables)
+        except (re.error, KeyError, TypeError, ValueError) as error:
+            raise InvalidRuleFile(path, error) from error
+
+    def _table_fingerprints(self, component_regexes):
+        """
+        :param component_regexes: the uncompiled component regexes
+        :return: ordered dict of table name to a hex digest that changes whenever that table changes, in content or in
+                 order, the hostname grammar also covers the chassis, blade and zabbix function regexes
+        """
+        tables = OrderedDict([
+            ("env_map", self.env_map),
+            ("team_ownership_regexes", self.team_ownership_regexes),
+            ("team_owner_overrides", self.team_owner_overrides),
+            ("tas_override", sorted(self.tas_override)),
+            ("service_discovery", self.service_discovery),
+            ("component_regexes", [list(component_regexes), CHASSIS_BLADE_REGEX, HOSTING_NODE_REGEX, NETWORK_FUNCTION_REGEX,
+                                   ZABBIX_FUNCTION_OVERRIDE]),
+        ])
+        return MappingProxyType(OrderedDict(
+            (name, hashlib.sha256(json.dumps(table, default=dict, separators=(",", ":")).encode("utf-8")).hexdigest())
+            for name, table in tables.items()))
+
+    def __setattr__(self, name, value):
+        # attributes can only be set by __init__, until it freezes the engine
+        if getattr(self, "_frozen", False):
+            raise AttributeError("RuleEngine is immutable, build a new one instead")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError("RuleEngine is immutable, build a new one instead")
+
+
+class RuleFile():
+    """
+    RuleEngine for a rule file, rebuilt when the file changes.
+
+    Every check_interval seconds the file's mtime and size are checked again. A changed file is validated and compiled
+    into a new engine before it replaces the old one in a single assignment, so callers always get a complete engine
+    and one that fails to load leaves the current engine in place. Only one thread reloads at a time, the others keep
+    getting the current engine meanwhile.
+    """
+    def __init__(self, path=None, check_interval=60):
+        """
+        :param path: json rule file, defaults to the HOST_DETAILS_RULES environment variable, or else
+                     host_details/static/rules.json
+        :param check_interval: seconds between mtime checks, None to never check again
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._engine = None
+        self._stat = None
+        self._checked = 0
+
+    def engine(self):
+        """
+        :return: the current RuleEngine
+        """
+        engine = self._engine
+        if engine is not None and (self.check_interval is None or time.monotonic() - self._checked < self.check_interval):
+            return engine
+        # the first load has to wait, reloads don't, which a with block can't express
+        if not self._lock.acquire(blocking=engine is None):  # pylint: disable=consider-using-with
+            return engine
+        try:
+            if self._engine is None or self.check_interval is not None and time.monotonic() - self._checked >= self.check_interval:
+                self._reload()
+            return self._engine
+        finally:
+            self._lock.release()
+
+    def set_path(self, path):
+        """
+        Switch to another rule file, loading it right away
+        :param path: json rule file
+        :raises InvalidRuleFile: when the file doesn't load, the current file and engine stay in use
+        """
+        stat = _file_stat(path)
+        engine = RuleEngine.from_file(path)
+        with self._lock:
+            self.path = path
+            self._engine = engine
+            self._stat = stat
+            self._checked = time.monotonic()
+        LOGGER.info("Loaded rules version %s from %s", engine.version, path)
+
+    def clear(self):
+        """ Drop the current engine, the next engine() call loads the rule file again """
+        with self._lock:
+            self._engine = None
+            self._stat = None
+            self._checked = 0
+
+    def _reload(self):
+        if self.path is None:
+            self.path = os.environ.get(RULES_ENV) or bundled_rules_path()
+        self._checked = time.monotonic()
+        stat = _file_stat(self.path)
+        if self._engine is not None and stat == self._stat:
+            return
+        try:
+            engine = RuleEngine.from_file(self.path)
+        except InvalidRuleFile as error:
+            if self._engine is None:
+                raise
+            LOGGER.error("Keeping rules version %s: %s", self._engine.version, error)
+        else:
+            LOGGER.info("Loaded rules version %s from %s", engine.version, self.path)
+            self._engine = engine
+        # a broken file is only retried once it changes again
+        self._stat = stat
+
+
+def _file_stat(path):
+    """
+    :param path: rule file
+    :return: (mtime in ns, size), or None if it can't be read
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+DEFAULT_RULE_FILE = RuleFile()
+
+
+def default_rules():
+    """
+    Process wide RuleEngine, built on first use and rebuilt when the rule file changes
+    :return: the shared RuleEngine
+    """
+    return DEFAULT_RULE_FILE.engine()
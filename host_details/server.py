@@ -0,0 +1,290 @@
+"""
+Resident resolver, answers host details lookups over HTTP on a Unix socket or localhost, see host_details.client
+
+    GET  /health                              rules version and fingerprint
+    GET  /metrics                             stage latencies, counters and cache hit ratios in Prometheus text
+    GET  /stats                               the same as json
+    GET  /hosts/<hostname>?method=all_details one host's details
+    POST /hosts  {"hostnames": [...], "method": "all_details"}
+                                              {"results": [details, ...]} in the same order
+"""
+import sys
+import json
+import asyncio
+import logging
+import argparse
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from host_details.hostdetails import HostDetails
+from host_details.metrics import METRICS
+from host_details.rules import RULES_ENV, RuleFile, default_rules
+
+LOGGER = logging.getLogger(__name__)
+
+METHODS = ("all_details", "hostsplit_service")
+
+# largest request head and body accepted, a batch of 100k hostnames fits comfortably
+MAX_HEADER_BYTES = 65536
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           422: "Unprocessable Entity", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    """ Request that gets an error response instead of a result """
+    def __init__(self, status, message):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+
+class ResolverServer():
+    """
+    Keeps the compiled rules, role templates and Device42 data of one process warm across lookups.
+
+    Speaks just enough HTTP/1.1 for keep-alive clients: Content-Length bodies, no chunked encoding. Each connection is
+    served in order, lookups of different connections interleave on the event loop with Device42 lookups overlapped.
+    """
+    def __init__(self, rules=None, d42_connector=None, rule_file=None):
+        """
+        :param rules: RuleEngine to classify with, defaults to rule_file's engine
+        :param d42_connector: AsyncD42Connector to look up chassis and blades with, defaults to one around the shared connector
+        :param rule_file: RuleFile to classify with as it is reloaded, defaults to the shared process wide one
+        """
+        self.rules = rules
+        self.rule_file = rule_file
+        self.d42_connector = d42_connector
+        self.server = None
+
+    async def start(self, path=None, host="127.0.0.1", port=0):
+        """
+        :param path: Unix socket to listen on, instead of host and port
+        :param host: address to listen on
+        :param port: port to listen on, 0 picks a free one
+        :return: the asyncio server
+        """
+        if self.d42_connector is None:
+            from host_details.d42_async import AsyncD42Connector  # pylint: disable=import-outside-toplevel
+            self.d42_connector = AsyncD42Connector()
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path=path, limit=MAX_HEADER_BYTES)
+        else:
+            self.server = await asyncio.start_server(self.handle, host=host, port=port, limit=MAX_HEADER_BYTES)
+        LOGGER.info("Listening on %s", self.address)
+        return self.server
+
+    @property
+    def address(self):
+        """ Unix socket path, or (host, port) """
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        """ Stop listening and wait for the listener to close """
+        self.server.close()
+        await self.server.wait_closed()
+        self.d42_connector.close()
+
+    async def handle(self, reader, writer):
+        """
+        Serve one connection until the client closes it or asks to
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        """
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except HttpError as error:
+                    self._write_response(writer, error.status, {"error": error.message}, keep_alive=False)
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+                verb, target, version, headers, body = request
+                keep_alive = self._keep_alive(version, headers)
+                try:
+                    status, result = await self.dispatch(verb, target, body)
+                except HttpError as error:
+                    status, result = error.status, {"error": error.message}
+                except Exception:  # pylint: disable=broad-except
+                    LOGGER.exception("Failed to handle %s %s", verb, target)
+                    status, result = 500, {"error": "Internal error"}
+                self._write_response(writer, status, result, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def dispatch(self, verb, target, body):
+        """
+        :param verb: request method
+        :param target: request target, path and query
+        :param body: request body bytes
+        :return: (status, json serializable result, or text)
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip("/")
+        if path == "/health":
+            self._require_verb(verb, "GET")
+            rules = self._rules()
+            return 200, {"status": "ok", "rules_version": rules.version, "rules_fingerprint": rules.fingerprint}
+
+        if path == "/metrics":
+            self._require_verb(verb, "GET")
+            return 200, METRICS.prometheus()
+
+        if path == "/stats":
+            self._require_verb(verb, "GET")
+            return 200, METRICS.stats()
+
+        if path.startswith("/hosts/"):
+            self._require_verb(verb, "GET")
+            method = parse_qs(url.query).get("method", ["all_details"])[0]
+            details = (await self.resolve([unquote(path[len("/hosts/"):])], method))[0]
+            return (422 if "error" in details else 200), details
+
+        if path == "/hosts":
+            self._require_verb(verb, "POST")
+            try:
+                request = json.loads(body.decode("utf-8"))
+            except ValueError as error:
+                raise HttpError(400, "Invalid json: {}".format(error)) from error
+            hostnames = request.get("hostnames") if isinstance(request, dict) else None
+            if not isinstance(hostnames, list) or not all(isinstance(hostname, str) for hostname in hostnames):
+                raise HttpError(400, "hostnames must be a list of hostnames")
+            return 200, {"results": await self.resolve(hostnames, request.get("method", "all_details"))}
+
+        raise HttpError(404, "No such resource: {}".format(url.path))
+
+    async def resolve(self, hostnames, method):
+        """
+        :param hostnames: list of hostnames
+        :param method: all_details or hostsplit_service
+        :return: list of details, {"hostname": ..., "error": ...} for hosts that can't be classified
+        """
+        if method not in METHODS:
+            raise HttpError(400, "Unknown method: {}".format(method))
+        return await HostDetails.resolve_many_async(hostnames, method=method, rules=self._rules(), d42_connector=self.d42_connector)
+
+    def _rules(self):
+        if self.rules is not None:
+            return self.rules
+        return self.rule_file.engine() if self.rule_file is not None else default_rules()
+
+    @staticmethod
+    def _require_verb(verb, allowed):
+        if verb != allowed:
+            raise HttpError(405, "Use {}".format(allowed))
+
+    @staticmethod
+    async def _read_request(reader):
+        """
+        :return: (verb, target, version, headers, body), or None when the client closed the connection between requests
+        """
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if not error.partial:
+                return None
+            raise
+        except asyncio.LimitOverrunError as error:
+            raise HttpError(413, "Request head too large") from error
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            verb, target, version = lines[0].split(" ")
+        except ValueError as error:
+            raise HttpError(400, "Malformed request line") from error
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", ""):
+            raise HttpError(400, "Chunked requests are not supported")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError as error:
+            raise HttpError(400, "Invalid Content-Length") from error
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return verb, target, version, headers, body
+
+    @staticmethod
+    def _keep_alive(version, headers):
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @staticmethod
+    def _write_response(writer, status, result, keep_alive):
+        if isinstance(result, str):
+            body, content_type = result.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(result).encode("utf-8"), "application/json"
+        writer.write("HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n".format(
+            status, REASONS.get(status, ""), content_type, len(body), "keep-alive" if keep_alive else "close").encode("latin-1"))
+        writer.write(body)
+
+
+def parse_args(argv=None):
+    """
+    :param argv: command line arguments, defaults to sys.argv
+    :return: parsed arguments
+    """
+    parser = argparse.ArgumentParser(prog="host-details-server", description="Resident host details resolver")
+    parser.add_argument("--socket", help="Unix socket to listen on, instead of --host and --port")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8042, help="port to listen on (default 8042)")
+    parser.add_argument("--prefetch", action="store_true", help="bulk load Device42 devices before listening")
+    parser.add_argument("--rules", metavar="RULES",
+                        help="rule file to classify with instead of the bundled one, reloaded when it changes (same as "
+                             "setting {})".format(RULES_ENV))
+    parser.add_argument("-v", "--verbose", action="store_true", help="debug logging")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    """
+    Listen until cancelled
+    :param args: parse_args result
+    """
+    if args.prefetch:
+        from host_details.d42_connector import get_connector  # pylint: disable=import-outside-toplevel
+        get_connector().prefetch()
+    rule_file = None
+    if args.rules:
+        rule_file = RuleFile(args.rules)
+        # an invalid rule file fails before listening
+        rule_file.engine()
+    resolver = ResolverServer(rule_file=rule_file)
+    server = await resolver.start(path=args.socket, host=args.host, port=args.port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    """
+    host-details-server entry point
+    :param argv: command line arguments, defaults to sys.argv
+    :return: exit code
+    """
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Consolidated golden snapshot of expected details, and bulk verification of the current rules against it
+
+    python -m host_details.snapshot write fleet.snapshot hosts.txt
+    python -m host_details.snapshot verify fleet.snapshot
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+from host_details.hostdetails import HostDetails
+from host_details.rules import default_rules
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+_HEADER = "# host_details snapshot {}\n"
+_INDEX = "# index\t"
+_INDEX_OFFSET = "# index_offset\t"
+# the last line, "# index_offset\t<offset>\n", always fits in this many bytes
+_FOOTER_BYTES = 64
+
+
+def write_snapshot(path, details_iter):
+    """
+    Atomically write a snapshot: a header line, one "hostname<TAB>details json" line per host sorted by hostname, then
+    an index of each line's offset and length, and the offset of the index as the last line
+    :param path: snapshot file
+    :param details_iter: iterable of HostDetails.details or resolve_many error records, like HostDetails.resolve_many
+    :return: number of hosts written
+    """
+    lines = dict((details["hostname"], json.dumps(details, sort_keys=True)) for details in details_iter)
+    partial = "{}.tmp".format(path)
+    index = {}
+    try:
+        with open(partial, "wb") as snapshot:
+            snapshot.write(_HEADER.format(SNAPSHOT_VERSION).encode("utf-8"))
+            for hostname in sorted(lines):
+                line = "{}\t{}\n".format(hostname, lines[hostname]).encode("utf-8")
+                index[hostname] = [snapshot.tell(), len(line)]
+                snapshot.write(line)
+            index_offset = snapshot.tell()
+            snapshot.write("{}{}\n".format(_INDEX, json.dumps(index, sort_keys=True)).encode("utf-8"))
+            snapshot.write("{}{}\n".format(_INDEX_OFFSET, index_offset).encode("utf-8"))
+        os.replace(partial, path)
+    except BaseException:
+        # don't leave a partial snapshot behind, the previous one at path is untouched
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return len(index)
+
+
+class Snapshot():
+    """
+    Read side of a snapshot file, opening it only reads the index, each host's details are read and parsed on access
+    """
+    def __init__(self, path):
+        """
+        :param path: snapshot file written by write_snapshot
+        """
+        self.path = path
+        # open for the life of the Snapshot, close() or the context manager closes it
+        self._file = open(path, "rb")  # pylint: disable=consider-using-with
+        try:
+            self._index = self._read_index()
+        except Exception:
+            self._file.close()
+            raise
+
+    def _read_index(self):
+        header = self._file.readline().decode("utf-8")
+        if header != _HEADER.format(SNAPSHOT_VERSION):
+            raise ValueError("Not a version {} host_details snapshot: {}".format(SNAPSHOT_VERSION, self.path))
+        size = self._file.seek(0, os.SEEK_END)
+        self._file.seek(max(0, size - _FOOTER_BYTES))
+        footer = self._file.read().decode("utf-8").rstrip("\n").rsplit("\n", 1)[-1]
+        if not footer.startswith(_INDEX_OFFSET):
+            raise ValueError("Truncated host_details snapshot: {}".format(self.path))
+        self._file.seek(int(footer[len(_INDEX_OFFSET):]))
+        return json.loads(self._file.readline().decode("utf-8")[len(_INDEX):])
+
+    def get(self, hostname):
+        """
+        :param hostname: host to look up
+        :return: the host's expected details, or None if it isn't in the snapshot
+        """
+        entry = self._index.get(hostname)
+        if entry is None:
+            return None
+        offset, length = entry
+        self._file.seek(offset)
+        return json.loads(self._file.read(length).decode("utf-8").split("\t", 1)[1])
+
+    def hostnames(self):
+        """
+        :return: sorted list of the hosts in the snapshot
+        """
+        return sorted(self._index)
+
+    def close(self):
+        """ Close the snapshot file """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, hostname):
+        return hostname in self._index
+
+
+class SnapshotD42Connector():  # pylint: disable=too-few-public-methods
+    """ Answers Device42 lookups with the records stored in a snapshot, so verification never goes to Device42 """
+    def __init__(self, snapshot):
+        """
+        :param snapshot: Snapshot to take the d42 records from
+        """
+        self.snapshot = snapshot
+
+    def get_by_hostname(self, host):
+        """ Device42 record of host as of the snapshot """
+        details = self.snapshot.get(host)
+        if details is None or "d42" not in details:
+            return {'err': 'Device not found in snapshot: {}'.format(host)}
+        return details["d42"]
+
+
+def _flatten(value, prefix, fields):
+    if isinstance(value, dict) and value:
+        for key, item in value.items():
+            _flatten(item, "{}.{}".format(prefix, key) if prefix else key, fields)
+    else:
+        fields[prefix] = value
+    return fields
+
+
+def field_changes(expected, actual):
+    """
+    :param expected: details from the snapshot, or None
+    :param actual: details from the current rules, or None
+    :return: list of {"field": dotted path, like security.role.service_owner, "expected": ..., "actual": ...} for each
+             field that differs, lists are compared whole
+    """
+    if expected == actual:
+        return []
+    expected_fields = _flatten(expected or {}, "", {})
+    actual_fields = _flatten(actual or {}, "", {})
+    changes = []
+    for field in sorted(set(expected_fields) | set(actual_fields)):
+        if expected_fields.get(field) != actual_fields.get(field):
+            changes.append({"field": field, "expected": expected_fields.get(field), "actual": actual_fields.get(field)})
+    return changes
+
+
+def verify(snapshot, hostnames=None, rules=None, resolve=None):
+    """
+    Classify hosts in bulk and compare them with the snapshot
+    :param snapshot: Snapshot of the expected details
+    :param hostnames: hosts to verify, defaults to every host in the snapshot
+    :param rules: RuleEngine to classify with, defaults to the shared process wide engine
+    :param resolve: callable taking a list of hostnames and returning all_details dicts for them in any order, defaults
+                    to HostDetails.resolve_many with rules and the snapshot's Device42 records
+    :return: list of {"hostname", "changes"} for the hosts whose details differ, see field_changes, in hostname order
+    """
+    rules = rules if rules is not None else default_rules()
+    if resolve is None:
+        d42_connector = SnapshotD42Connector(snapshot)
+
+        def resolve(batch):
+            return HostDetails.resolve_many(batch, rules=rules, d42_connector=d42_connector)
+
+    hostnames = snapshot.hostnames() if hostnames is None else list(hostnames)
+    differences = []
+    for details in resolve(hostnames):
+        changes = field_changes(snapshot.get(details["hostname"]), details)
+        if changes:
+            differences.append({"hostname": details["hostname"], "changes": changes})
+    LOGGER.debug("%s of %s hosts differ from %s", len(differences), len(hostnames), snapshot.path)
+    return sorted(differences, key=lambda difference: difference["hostname"])
+
+
+def _read_hostnames(path):
+    from host_details.cli import read_hostnames  # pylint: disable=import-outside-toplevel
+    if path == "-":
+        return list(read_hostnames(sys.stdin))
+    with open(path, "r", encoding="utf-8") as hostfile:
+        return list(read_hostnames(hostfile))
+
+
+def main(argv=None, stdout=None):
+    """
+    Write a snapshot of the current classification, or verify the current rules against one
+    :param argv: command line arguments, defaults to sys.argv
+    :param stdout: stream to write differences to, defaults to sys.stdout
+    :return: exit code, 1 if verify found differences
+    """
+    parser = argparse.ArgumentParser(description="Write or verify a host_details golden snapshot")
+    parser.add_argument("action", choices=["write", "verify"])
+    parser.add_argument("snapshot", help="snapshot file")
+    parser.add_argument("input", nargs="?",
+                        help="file of hostnames, - for stdin, required for write, defaults to every host in the snapshot for verify")
+    parser.add_argument("--prefetch", action="store_true", help="bulk load Device42 devices up front when writing")
+    args = parser.parse_args(argv)
+    stdout = stdout if stdout is not None else sys.stdout
+
+    if args.action == "write":
+        if args.input is None:
+            parser.error("write needs a file of hostnames")
+        count = write_snapshot(args.snapshot, HostDetails.resolve_many(_read_hostnames(args.input), prefetch=args.prefetch))
+        LOGGER.info("Wrote %s hosts to %s", count, args.snapshot)
+        return 0
+
+    with Snapshot(args.snapshot) as snapshot:
+        differences = verify(snapshot, _read_hostnames(args.input) if args.input else None)
+    for difference in differences:
+        stdout.write(json.dumps(difference, sort_keys=True))
+        stdout.write("\n")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,7 +13,24 @@ WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 See the License for the specific language governing permissions and
 limitations under the License."""
 
+import os
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
+
+from host_details import __version__
+
+
+class BuildPyWithRoleBundle(build_py):
+    """ Prebuild host_details/static/roles.json so role templates load without parsing yaml """
+    def run(self):
+        build_py.run(self)
+        try:
+            from host_details.roles import write_bundle
+            write_bundle(os.path.join("host_details", "static", "roles"),
+                         os.path.join(self.build_lib, "host_details", "static", "roles.json"))
+        except ImportError as error:
+            self.announce("Skipping role template bundle: {}".format(error), level=3)
+
 
 test_deps = ["coverage",
              "nose",
@@ -23,18 +40,24 @@ test_deps = ["coverage",
 
 setup(
     name='host_details',
-    version="0.1.0",
+    version=__version__,
     packages=find_packages(),
     include_package_data=True,
+    cmdclass={"build_py": BuildPyWithRoleBundle},
     author="Daniel Myers",
     author_email="dmyers@skytap.com",
     license='proprietary',
     url="https://github.com/skytap/host_details",
+    entry_points={
+        "console_scripts": ["host-details=host_details.cli:main",
+                            "host-details-server=host_details.server:main"],
+    },
     extra_requires={
         "test": test_deps
     },
     install_requires=['pyyaml>=3',
                       'Device42',
+                      'importlib_resources; python_version<"3.9"',
                       ],
     python_requires='>=3.7',
 )
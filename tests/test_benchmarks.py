@@ -0,0 +1,33 @@
+"""Copyright Placeholder"""
+import mock
+
+from .base import BaseTestCase
+from benchmarks.fleet import synthetic_fleet
+from benchmarks.run import STAGES, benchmark, regressions
+
+
+class BenchmarkTests(BaseTestCase):
+
+    def test_synthetic_fleet_repeatable(self):
+        fleet = list(synthetic_fleet(500, seed=3))
+        self.assertEqual(500, len(fleet))
+        self.assertEqual(fleet, list(synthetic_fleet(500, seed=3)))
+        self.assertTrue(all(hostname.endswith(".skytap.com") for hostname in fleet))
+
+    def test_regression_detected(self):
+        results = benchmark({"synthetic": list(synthetic_fleet(200))})
+        self.assertEqual(set(STAGES), set(results["synthetic"]))
+        self.assertEqual([], regressions(results, results, 0.2))
+        faster = {"synthetic": {"init": {"hosts_per_sec": results["synthetic"]["init"]["hosts_per_sec"] * 2}}}
+        self.assertEqual([("synthetic", "init")], [regressed[:2] for regressed in regressions(results, faster, 0.2)])
+
+    def test_every_source_starts_cold(self):
+        with mock.patch("benchmarks.run.run_stages", return_value={}) as run_stages, \
+                mock.patch("benchmarks.run.SERVICE_CACHE") as service_cache, \
+                mock.patch("benchmarks.run.ROLE_REGISTRY") as role_registry, \
+                mock.patch("benchmarks.run.DEFAULT_RULE_FILE") as rule_file:
+            benchmark({"first": ["a"], "second": ["b"]})
+        self.assertEqual(2, run_stages.call_count)
+        self.assertEqual(2, service_cache.clear.call_count)
+        self.assertEqual(2, role_registry.clear.call_count)
+        self.assertEqual(2, rule_file.clear.call_count)
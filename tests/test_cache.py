@@ -0,0 +1,40 @@
+"""Copyright Placeholder"""
+from .base import BaseTestCase
+from host_details.cache import LRUCache, MISSING
+from host_details.hostdetails import HostDetails, SERVICE_CACHE
+
+
+class LRUCacheTests(BaseTestCase):
+
+    def test_eviction_and_counters(self):
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.set("c", 3)
+        self.assertIs(MISSING, cache.get("b"))
+        self.assertEqual({"hits": 1, "misses": 1, "size": 2, "maxsize": 2}, cache.stats())
+        cache.clear()
+        self.assertEqual({"hits": 0, "misses": 0, "size": 0, "maxsize": 2}, cache.stats())
+
+
+class ServiceCacheTests(BaseTestCase):
+
+    def setUp(self):
+        SERVICE_CACHE.clear()
+
+    def test_repeated_location_hits(self):
+        first = HostDetails("tuk1r1foo1.mgt.prod.skytap.com")
+        second = HostDetails("tuk1r1bar2.mgt.prod.skytap.com")
+        first.hostsplit_service()
+        misses = SERVICE_CACHE.misses
+        second.hostsplit_service()
+        self.assertEqual(misses, SERVICE_CACHE.misses)
+        self.assertEqual(first.details["services"], second.details["services"])
+
+    def test_cached_lists_are_copies(self):
+        first = HostDetails("tuk1r1foo1.mgt.prod.skytap.com")
+        ntp = first.which_service("ntp", **first.service_discovery["ntp"])
+        ntp.append("changed")
+        self.assertEqual(["tuk1ntp1.prod.skytap.com", "tuk1ntp2.prod.skytap.com"],
+                         first.which_service("ntp", **first.service_discovery["ntp"]))
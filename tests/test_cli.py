@@ -0,0 +1,71 @@
+"""Copyright Placeholder"""
+import io
+import json
+import os
+import tempfile
+import yaml
+import mock
+from .base import BaseTestCase
+from host_details.cli import main
+from host_details.compat import resource_filename
+from host_details.rules import RuleEngine
+
+HOSTNAMES = "tuk1mysql1.prod.skytap.com\n\n# comment\nnothing.skytap.com\ntuk6m1cm1.mgt.test.skytap.com\n"
+
+
+class CliTests(BaseTestCase):
+
+    def _run(self, *argv):
+        stdout = io.StringIO()
+        self.assertEqual(0, main(list(argv), stdin=io.StringIO(HOSTNAMES), stdout=stdout))
+        return stdout.getvalue()
+
+    def test_json_lines(self):
+        results = [json.loads(line) for line in self._run().splitlines()]
+        self.assertEqual(["tuk1mysql1.prod.skytap.com", "nothing.skytap.com", "tuk6m1cm1.mgt.test.skytap.com"],
+                         [details["hostname"] for details in results])
+        self.assertEqual("Invalid Hostname", results[1]["error"])
+        self.assertIn("zabbix", results[0])
+
+    def test_yaml_hostsplit_service(self):
+        results = list(yaml.safe_load_all(self._run("--format", "yaml", "--method", "hostsplit_service")))
+        self.assertEqual(3, len(results))
+        self.assertNotIn("zabbix", results[0])
+
+    def test_invalid_workers_and_chunk_size(self):
+        for argv in (["--workers", "2", "--chunk-size", "0"], ["--workers", "-1"], ["--chunk-size", "x"]):
+            with mock.patch("sys.stderr", io.StringIO()), self.assertRaises(SystemExit) as raised:
+                main(argv, stdin=io.StringIO(HOSTNAMES), stdout=io.StringIO())
+            self.assertEqual(2, raised.exception.code)
+
+    def test_rules_file(self):
+        with open(resource_filename("host_details.static", "rules.json"), "r", encoding="utf-8") as rulefile:
+            data = json.load(rulefile)
+        data["team_owner_overrides"]["function"]["mysql"] = "team-foo"
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as rulefile:
+            json.dump(data, rulefile)
+        self.addCleanup(os.unlink, rulefile.name)
+        for workers in ["1", "2"]:
+            results = [json.loads(line) for line in self._run("--rules", rulefile.name, "--workers", workers).splitlines()]
+            self.assertEqual(["team-foo"], [details["owner"] for details in results if details["hostname"].startswith("tuk1mysql1")])
+
+        with mock.patch("host_details.cli.RuleEngine.from_file", wraps=RuleEngine.from_file) as from_file:
+            self._run("--rules", rulefile.name)
+        from_file.assert_called_once_with(rulefile.name)
+
+        data["version"] = 2
+        with open(rulefile.name, "w", encoding="utf-8") as broken:
+            json.dump(data, broken)
+        with mock.patch("host_details.cli.LOGGER") as logger:
+            self.assertEqual(2, main(["--rules", rulefile.name], stdin=io.StringIO(HOSTNAMES), stdout=io.StringIO()))
+        logger.error.assert_called_once()
+
+    def test_workers_from_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as hostfile:
+            hostfile.write(HOSTNAMES * 5)
+        try:
+            results = [json.loads(line) for line in self._run(hostfile.name, "--workers", "2", "--chunk-size", "2").splitlines()]
+        finally:
+            os.unlink(hostfile.name)
+        self.assertEqual(15, len(results))
+        self.assertEqual(5, len([details for details in results if "error" in details]))
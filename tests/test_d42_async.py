@@ -0,0 +1,69 @@
+"""Copyright Placeholder"""
+import asyncio
+import threading
+import time
+from .base import BaseTestCase
+from host_details.d42_async import AsyncD42Connector
+from host_details.hostdetails import HostDetails
+
+
+class SlowConnector():
+    """ Blocking stand-in for D42Connector that tracks how many lookups overlap """
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get_by_hostname(self, host):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return {"Role": "hn", "err": []}
+
+
+class AsyncD42ConnectorTests(BaseTestCase):
+
+    def test_bounded_concurrency(self):
+        connector = SlowConnector(0.05)
+        async_connector = AsyncD42Connector(connector, max_concurrency=4)
+        hostnames = ["tuk1c1b{}.mgt.prod.skytap.com".format(index) for index in range(12)]
+        results = asyncio.run(HostDetails.resolve_many_async(hostnames + ["nothing.skytap.com"], d42_connector=async_connector))
+        async_connector.close()
+        self.assertEqual(4, connector.max_in_flight)
+        self.assertEqual(["team-dataplane-compute"] * 12, [details["owner"] for details in results[:12]])
+        self.assertEqual({"hostname": "nothing.skytap.com", "error": "Invalid Hostname"}, results[12])
+        self.assertEqual({"Role": "hn", "err": []}, results[0]["d42"])
+
+    def test_timeout(self):
+        async_connector = AsyncD42Connector(SlowConnector(0.5), timeout=0.01)
+        result = asyncio.run(async_connector.get_by_hostname("tuk1c1b1.mgt.prod.skytap.com"))
+        async_connector.close()
+        self.assertNotIn("Role", result)
+        self.assertTrue(result["err"])
+
+    def test_timed_out_lookups_keep_their_slot(self):
+        connector = SlowConnector(0.2)
+        async_connector = AsyncD42Connector(connector, max_concurrency=1, timeout=0.01)
+
+        async def lookups():
+            first = await async_connector.get_by_hostname("tuk1c1b1.mgt.prod.skytap.com")
+            second = await asyncio.wait_for(async_connector.get_by_hostname("tuk1c1b2.mgt.prod.skytap.com"), 1)
+            return first, second
+
+        first, second = asyncio.run(lookups())
+        async_connector.close()
+        self.assertTrue(first["err"])
+        self.assertTrue(second["err"])
+        self.assertEqual(1, connector.max_in_flight)
+
+    def test_matches_sync(self):
+        hostnames = ["tuk1c1b1.mgt.prod.skytap.com", "tuk1mysql1.prod.skytap.com"]
+        connector = SlowConnector(0)
+        async_connector = AsyncD42Connector(connector)
+        results = asyncio.run(HostDetails.resolve_many_async(hostnames, method="hostsplit_service", d42_connector=async_connector))
+        async_connector.close()
+        self.assertEqual(list(HostDetails.resolve_many(hostnames, method="hostsplit_service", d42_connector=connector)), results)
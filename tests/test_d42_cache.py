@@ -0,0 +1,74 @@
+"""Copyright Placeholder"""
+import os
+import shutil
+import tempfile
+import mock
+import requests
+from .base import BaseTestCase
+from host_details.compat import ConfigParser
+from host_details.d42_cache import D42Cache, cache_from_config
+from host_details.d42_connector import D42Connector
+
+
+class D42CacheTests(BaseTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "cache", "d42.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_ttl_and_persistence(self):
+        cache = D42Cache(self.path, ttl=10, negative_ttl=1, max_stale=10)
+        with mock.patch("host_details.d42_cache.time.time", return_value=1000):
+            cache.set_many({"c1b1": {"Role": "hn", "err": []}, "c1b2": {"err": []}})
+        cache.close()
+
+        cache = D42Cache(self.path, ttl=10, negative_ttl=1, max_stale=10)
+        with mock.patch("host_details.d42_cache.time.time", return_value=1005):
+            self.assertEqual(({"Role": "hn", "err": []}, True), cache.get("c1b1"))
+            self.assertEqual(({"err": []}, False), cache.get("c1b2"))
+        with mock.patch("host_details.d42_cache.time.time", return_value=1030):
+            self.assertIsNone(cache.get("c1b1"))
+        cache.invalidate("c1b2")
+        self.assertIsNone(cache.get("c1b2"))
+
+    def test_from_config(self):
+        config = ConfigParser.ConfigParser()
+        config.read_dict({"d42": {"server": "http://localhost", "cache_path": self.path, "cache_ttl": "60"}})
+        self.assertEqual(60, cache_from_config(config).ttl)
+        config.remove_option("d42", "cache_path")
+        self.assertIsNone(cache_from_config(config))
+
+    @mock.patch("host_details.d42_connector.Devices")
+    def test_connector_serves_stale_and_refreshes(self, devices_mock):
+        devices_mock.return_value.get_device_byname.return_value = {"custom_fields": [{"key": "Role", "value": "hostingnode"}]}
+        config = ConfigParser.ConfigParser()
+        config.read_dict({"d42": {"server": "http://localhost", "user": "user", "password": "password"}})
+        cache = D42Cache(self.path, ttl=10, max_stale=100)
+        connector = D42Connector(config, cache=cache)
+        with mock.patch("host_details.d42_cache.time.time", return_value=1000):
+            cache.set("c1b1", {"Role": "mn", "err": []})
+        with mock.patch("host_details.d42_cache.time.time", return_value=1050):
+            with mock.patch("host_details.d42_connector.threading.Thread") as thread_mock:
+                self.assertEqual({"Role": "mn", "err": []}, connector.get_by_hostname("c1b1"))
+                thread_mock.call_args[1]["target"]()
+            self.assertEqual(({"Role": "hn", "err": []}, True), cache.get("c1b1"))
+        self.assertEqual(1, devices_mock.return_value.get_device_byname.call_count)
+
+    @mock.patch("host_details.d42_connector.Devices")
+    def test_connector_caches_missing_hosts(self, devices_mock):
+        devices_mock.return_value.get_device_byname.side_effect = requests.exceptions.HTTPError("404 Not Found")
+        config = ConfigParser.ConfigParser()
+        config.read_dict({"d42": {"server": "http://localhost", "user": "user", "password": "password"}})
+        cache = D42Cache(self.path, ttl=10, negative_ttl=5, max_stale=0)
+        connector = D42Connector(config, cache=cache)
+        with mock.patch("host_details.d42_cache.time.time", return_value=1000):
+            self.assertEqual("404 Not Found", connector.get_by_hostname("c9b9")["err"])
+        with mock.patch("host_details.d42_cache.time.time", return_value=1004):
+            self.assertEqual("404 Not Found", connector.get_by_hostname("c9b9")["err"])
+        self.assertEqual(1, devices_mock.return_value.get_device_byname.call_count)
+        with mock.patch("host_details.d42_cache.time.time", return_value=1006):
+            connector.get_by_hostname("c9b9")
+        self.assertEqual(2, devices_mock.return_value.get_device_byname.call_count)
@@ -0,0 +1,79 @@
+"""Copyright Placeholder"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlparse, parse_qs
+from .base import BaseTestCase
+from host_details.compat import ConfigParser
+from host_details.d42_connector import D42Connector
+from host_details.hostdetails import HostDetails
+
+DEVICES = [{"name": "tuk1c{}b1.mgt.prod.skytap.com".format(index),
+            "custom_fields": [{"key": "Role", "notes": "", "value": "hostingnode" if index % 2 else "nsxmanagementnode"}]}
+           for index in range(25)]
+
+
+class FakeDevice42Handler(BaseHTTPRequestHandler):
+    """ Stand-in for the device42 devices/all api """
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+    clients_seen = []
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.requests_seen.append(query)
+        self.clients_seen.append(self.client_address)
+        offset, limit = int(query["offset"][0]), int(query["limit"][0])
+        body = json.dumps({"Devices": DEVICES[offset:offset + limit], "total_count": len(DEVICES), "offset": offset, "limit": limit})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class D42ConnectorTests(BaseTestCase):
+
+    def setUp(self):
+        FakeDevice42Handler.requests_seen = []
+        FakeDevice42Handler.clients_seen = []
+        self.server = HTTPServer(("127.0.0.1", 0), FakeDevice42Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        config = ConfigParser.ConfigParser()
+        config.read_dict({"d42": {"server": "http://127.0.0.1:{}".format(self.server.server_port), "user": "user", "password": "password"}})
+        self.connector = D42Connector(config)
+
+    def tearDown(self):
+        self.connector.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_prefetch_paged(self):
+        self.assertEqual(25, self.connector.prefetch(page_size=10))
+        self.assertEqual(["0", "10", "20"], [query["offset"][0] for query in FakeDevice42Handler.requests_seen])
+        self.assertEqual({"Role": "hn", "err": []}, self.connector.get_by_hostname("tuk1c1b1.mgt.prod.skytap.com"))
+        self.assertEqual({"Role": "nsxmanagementnode", "err": []}, self.connector.get_by_hostname("tuk1c2b1.mgt.prod.skytap.com"))
+        self.assertTrue(self.connector.get_by_hostname("tuk1c99b1.mgt.prod.skytap.com")["err"])
+
+    def test_prefetch_reuses_session(self):
+        self.connector.prefetch(page_size=10)
+        self.connector.clear_prefetch()
+        self.connector.prefetch(page_size=10)
+        for device in DEVICES[:5]:
+            self.assertFalse(self.connector.get_by_hostname(device["name"])["err"])
+        # every page of both prefetches came over the one keep-alive connection
+        self.assertEqual(6, len(FakeDevice42Handler.clients_seen))
+        self.assertEqual(1, len(set(FakeDevice42Handler.clients_seen)))
+
+    def test_resolve_many_prefetch(self):
+        hostnames = [device["name"] for device in DEVICES]
+        results = list(HostDetails.resolve_many(hostnames, d42_connector=self.connector, prefetch=True))
+        self.assertEqual(1, len(FakeDevice42Handler.requests_seen))
+        self.assertEqual("team-dataplane-compute", results[1]["owner"])
+        self.assertEqual("team-tools-virtualinfrastructure", results[2]["owner"])
@@ -0,0 +1,88 @@
+"""Copyright Placeholder"""
+import io
+import os
+import json
+import shutil
+import tempfile
+
+import mock
+from .base import BaseTestCase
+from host_details import diff
+from host_details.cli import main
+from host_details.hostdetails import HostDetails
+from host_details.rules import RuleEngine, TEAM_OWNER_OVERRIDES, TEAM_OWNERSHIP_REGEXES, TAS_OVERRIDE
+
+HOSTNAMES = ["tuk1mysql1.prod.skytap.com", "tuk6m1cm1.mgt.test.skytap.com", "nothing.skytap.com"]
+
+
+class DiffTests(BaseTestCase):
+
+    def setUp(self):
+        self.resolved = []
+
+    def _resolve(self, rules=None):
+        def resolve(stale):
+            self.resolved.extend(stale)
+            return HostDetails.resolve_many(stale, rules=rules)
+        return resolve
+
+    def test_only_changed_hosts_reclassified(self):
+        results, changed = diff.incremental({}, HOSTNAMES, resolve=self._resolve())
+        self.assertEqual(HOSTNAMES, self.resolved)
+        self.assertEqual([diff.ADDED] * 3, [change["status"] for change in changed])
+
+        self.resolved = []
+        hostnames = HOSTNAMES[1:] + ["tuk1web1.prod.skytap.com"]
+        results, changed = diff.incremental(results, hostnames, resolve=self._resolve())
+        self.assertEqual(["tuk1web1.prod.skytap.com"], self.resolved)
+        self.assertEqual(set(hostnames), set(results))
+        self.assertEqual([("tuk1web1.prod.skytap.com", diff.ADDED), ("tuk1mysql1.prod.skytap.com", diff.REMOVED)],
+                         [(change["hostname"], change["status"]) for change in changed])
+
+    def test_rule_change(self):
+        results, _ = diff.incremental({}, HOSTNAMES, resolve=self._resolve())
+        overrides = dict(TEAM_OWNER_OVERRIDES)
+        overrides["function"] = {"mysql": "team-foo"}
+        rules = RuleEngine(team_owner_overrides=overrides)
+
+        self.resolved = []
+        _, changed = diff.incremental(results, HOSTNAMES, rules=rules, resolve=self._resolve(rules))
+        # only the host the changed override applies to
+        self.assertEqual(["tuk1mysql1.prod.skytap.com"], self.resolved)
+        self.assertEqual(["tuk1mysql1.prod.skytap.com"], [change["hostname"] for change in changed])
+        self.assertIn({"field": "owner", "old": "team-tools-mysql", "new": "team-foo"}, changed[0]["changes"])
+
+    def test_unrelated_rule_edit(self):
+        results, _ = diff.incremental({}, HOSTNAMES, resolve=self._resolve())
+        regexes = dict(TEAM_OWNERSHIP_REGEXES)
+        regexes["team-new"] = "^newfunction$"
+        rules = RuleEngine(team_ownership_regexes=regexes)
+
+        self.resolved = []
+        _, changed = diff.incremental(results, HOSTNAMES, rules=rules, resolve=self._resolve(rules))
+        self.assertEqual([], self.resolved)
+        self.assertEqual([], changed)
+
+        # a tools and services team only marks its own hosts stale
+        rules = RuleEngine(tas_override=list(TAS_OVERRIDE) + ["team-middle-tier-core"])
+        _, changed = diff.incremental(results, HOSTNAMES, rules=rules, resolve=self._resolve(rules))
+        self.assertEqual(["tuk6m1cm1.mgt.test.skytap.com"], self.resolved)
+
+    def test_version_change(self):
+        results, _ = diff.incremental({}, HOSTNAMES, resolve=self._resolve())
+        self.resolved = []
+        with mock.patch("host_details.diff.__version__", "0.0.0"):
+            diff.incremental(results, HOSTNAMES, resolve=self._resolve())
+        self.assertEqual(HOSTNAMES, self.resolved)
+
+    def test_cli_results_file(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "results.jsonl")
+        for expected in [3, 0]:
+            stdout = io.StringIO()
+            self.assertEqual(0, main(["--diff", path], stdin=io.StringIO("\n".join(HOSTNAMES)), stdout=stdout))
+            self.assertEqual(expected, len(stdout.getvalue().splitlines()))
+        self.assertEqual(set(HOSTNAMES), set(diff.load_results(path)))
+        for line in stdout.getvalue().splitlines():
+            json.loads(line)
@@ -0,0 +1,69 @@
+"""Copyright Placeholder"""
+import csv
+import io
+import unittest
+from .base import BaseTestCase
+from host_details.export import ColumnarTable, default_columns
+from host_details.hostdetails import HostDetails
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+HOSTNAMES = ["tuk1mysql1.prod.skytap.com", "tuk1mysql2.prod.skytap.com", "tuk6m1cm1.mgt.test.skytap.com", "nothing.skytap.com"]
+
+
+class ColumnarTableTests(BaseTestCase):
+
+    def setUp(self):
+        self.table = ColumnarTable.from_details(HostDetails.resolve_many(HOSTNAMES))
+
+    def test_columns(self):
+        columns = default_columns()
+        self.assertIn("services.ntp", columns)
+        self.assertIn("security.role.service_owner", columns)
+        self.assertEqual(4, len(self.table))
+        self.assertEqual(["team-tools-mysql", "team-tools-mysql", "team-middle-tier-core", None], self.table.column("owner"))
+        self.assertEqual(["team-tools-mysql", "team-middle-tier-core"], self.table.dictionaries["owner"])
+        self.assertEqual(["tuk1ntp1.prod.skytap.com", "tuk1ntp2.prod.skytap.com"], self.table.column("services.ntp")[0])
+        self.assertEqual(["tuk1", "team-tools-mysql", "team-tools"], self.table.column("zabbix.groups")[0])
+        self.assertIsInstance(self.table.column("services.cmdb")[0], str)
+        self.assertEqual([None, None, None, "Invalid Hostname"], self.table.column("error"))
+
+    def test_dictionary_encoded_csv(self):
+        output, dictionary_output = io.StringIO(), io.StringIO()
+        self.table.write_csv(output, dictionary_output)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        dictionaries = {}
+        for row in csv.DictReader(io.StringIO(dictionary_output.getvalue())):
+            dictionaries[(row["column"], row["code"])] = row["value"]
+        self.assertEqual(["0", "0", "1", ""], [row["owner"] for row in rows])
+        self.assertEqual("team-middle-tier-core", dictionaries[("owner", "1")])
+
+    def test_plain_csv(self):
+        output = io.StringIO()
+        self.table.write_csv(output)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual("team-middle-tier-core", rows[2]["owner"])
+        self.assertEqual("tuk1;team-tools-mysql;team-tools", rows[0]["zabbix.groups"])
+
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_numpy(self):
+        codes, dictionaries = self.table.to_numpy()
+        self.assertEqual([0, 0, 1, -1], codes["owner"].tolist())
+        self.assertEqual("team-tools-mysql", dictionaries["owner"][0])
+        self.assertEqual(["tuk1", "team-tools-mysql", "team-tools"], dictionaries["zabbix.groups"][codes["zabbix.groups"][0]])
+
+    @unittest.skipUnless(pyarrow, "pyarrow not installed")
+    def test_arrow(self):
+        table = self.table.to_arrow()
+        self.assertEqual(["team-tools-mysql", "team-tools-mysql", "team-middle-tier-core", None], table.column("owner").to_pylist())
+        self.assertTrue(pyarrow.types.is_list(table.schema.field("zabbix.groups").type))
+        self.assertEqual(self.table.column("zabbix.groups"), table.column("zabbix.groups").to_pylist())
+        self.assertEqual(self.table.column("services.ntp"), table.column("services.ntp").to_pylist())
@@ -5,9 +5,10 @@ from parameterized import parameterized
 from .base import BaseTestCase
 from tests.hostnamemap import HOSTNAMEMAP
 from host_details.hostdetails import HostDetails
+from host_details.d42_connector import D42Connector
 from host_details.excp import HostDetailException
 
-import pkg_resources
+from host_details.compat import resource_filename
 
 LOGGER = logging.getLogger(__name__)
 
@@ -27,34 +28,32 @@ class HostDetailsTests(BaseTestCase):
     @parameterized.expand(HOSTNAMEMAP)
     def test_hostdetails(self, hostname):
 
-        with mock.patch('host_details.hostdetails.load_config_files') as cfg_mock:
+        with mock.patch('host_details.d42_connector.Devices') as d42_devices_mock:
+            fixture = self._load_fixture(hostname)
+
+            # setup D42 response based on whats known from the fixture file
+            d42_devices_mock.return_value.get_device_byname.return_value = \
+                {
+                    "custom_fields": [
+                        {
+                            "key": "Role",
+                            "notes": "",
+                            "value": fixture['function']
+                        }
+                    ]
+                }
+
             # provide fake config to the D42 client.
-            cfg_mock.return_value = TestConfig()
-            with mock.patch('host_details.d42_connector.Devices') as d42_devices_mock:
-                fixture = self._load_fixture(hostname)
-
-                # setup D42 response based on whats known from the fixture file
-                d42_devices_mock.return_value.get_device_byname.return_value = \
-                    {
-                        "custom_fields": [
-                            {
-                                "key": "Role",
-                                "notes": "",
-                                "value": fixture['function']
-                            }
-                        ]
-                    }
-
-                hostdetails = HostDetails(hostname)
-                hostdetails.all_details()
-                LOGGER.debug("details: %s", hostdetails.details)
-                LOGGER.debug("fixture: %s", fixture)
-                self.assertEqual(fixture, hostdetails.details)
+            hostdetails = HostDetails(hostname, d42_connector=D42Connector(TestConfig()))
+            hostdetails.all_details()
+            LOGGER.debug("details: %s", hostdetails.details)
+            LOGGER.debug("fixture: %s", fixture)
+            self.assertEqual(fixture, hostdetails.details)
 
     def _load_fixture(self, hostname):
-        fixes_dir = pkg_resources.resource_filename('tests.fixtures', 'hostdetails')
+        fixes_dir = resource_filename('tests.fixtures', 'hostdetails')
         with open("{}/{}.yaml".format(fixes_dir, hostname), "r") as fixraw:
-            fixture = yaml.load(fixraw)
+            fixture = yaml.load(fixraw, Loader=yaml.FullLoader)
         return fixture
 
     def test_autogroup_regex_match_nothing(self):
@@ -99,3 +98,68 @@ class HostDetailsTests(BaseTestCase):
         }
         self.assertDictEqual(data, HostDetails("tuk1r1knode1.mgt.prod.skytap.com").getroletemplate())
 
+
+    def test_resolve_many(self):
+        hostnames = (host for host in ["tuk1mysql1.prod.skytap.com", "nothing.skytap.com", "tuk6m1cm1.mgt.test.skytap.com"])
+        results = list(HostDetails.resolve_many(hostnames))
+        self.assertEqual(3, len(results))
+        self.assertEqual("team-tools-mysql", results[0]["owner"])
+        self.assertIn("zabbix", results[0])
+        self.assertEqual({"hostname": "nothing.skytap.com", "error": "Invalid Hostname"}, results[1])
+        self.assertEqual("team-middle-tier-core", results[2]["owner"])
+
+    def test_resolve_many_hostsplit_service(self):
+        results = list(HostDetails.resolve_many(["tuk1mysql1.prod.skytap.com"], method="hostsplit_service"))
+        self.assertNotIn("zabbix", results[0])
+        self.assertEqual(["tuk1ntp1.prod.skytap.com", "tuk1ntp2.prod.skytap.com"], results[0]["services"]["ntp"])
+
+    def test_resolve_many_shares_d42_connector(self):
+        connector = mock.Mock()
+        connector.get_by_hostname.return_value = {"Role": "hn", "err": []}
+        results = list(HostDetails.resolve_many(["tuk1c1b1.mgt.prod.skytap.com", "tuk1c1b2.mgt.prod.skytap.com"], d42_connector=connector))
+        self.assertEqual(2, connector.get_by_hostname.call_count)
+        self.assertEqual(["team-dataplane-compute"] * 2, [details["owner"] for details in results])
+
+    def test_lazy_fields(self):
+        expected = HostDetails("tuk1mysql1.prod.skytap.com")
+        expected.all_details()
+        hostdetails = HostDetails("tuk1mysql1.prod.skytap.com")
+        with mock.patch.object(HostDetails, "which_service", wraps=hostdetails.which_service) as which_service:
+            self.assertEqual("team-tools-mysql", hostdetails.get("owner"))
+            self.assertEqual(expected.details["security"], hostdetails.get("security"))
+            self.assertEqual(0, which_service.call_count)
+            self.assertEqual(["tuk1ntp1.prod.skytap.com", "tuk1ntp2.prod.skytap.com"], hostdetails.service("ntp"))
+            self.assertEqual(1, which_service.call_count)
+            hostdetails.all_details()
+            self.assertEqual(len(expected.details["services"]), which_service.call_count)
+        self.assertEqual(expected.details, hostdetails.details)
+        self.assertEqual(list(expected.details["services"]), list(hostdetails.details["services"]))
+        self.assertIsNone(hostdetails.get("d42"))
+
+    def test_lazy_fields_device42(self):
+        connector = mock.Mock()
+        connector.get_by_hostname.return_value = {"Role": "hn", "err": []}
+        hostdetails = HostDetails("tuk1c1b1.mgt.prod.skytap.com", d42_connector=connector)
+        hostdetails.get("services")
+        self.assertEqual(0, connector.get_by_hostname.call_count)
+        self.assertEqual("hn", hostdetails.get("function"))
+        hostdetails.get("security")
+        hostdetails.all_details()
+        self.assertEqual(1, connector.get_by_hostname.call_count)
+        self.assertEqual("team-dataplane-compute", hostdetails.details["owner"])
+        self.assertEqual(["team-dataplane-compute"], hostdetails.details["zabbix"]["groups"][1:])
+        with self.assertRaises(HostDetailException):
+            hostdetails.service("nothing")
+
+    def test_zabbix_host_groups(self):
+        hostnames = ["tuk1mysql1.prod.skytap.com", "tuk1r1knode1.mgt.prod.skytap.com", "nothing.skytap.com", "foo1.dev.test.skytap.com"]
+        groups = HostDetails.zabbix_host_groups(hostnames)
+        for hostname in ["tuk1mysql1.prod.skytap.com", "tuk1r1knode1.mgt.prod.skytap.com"]:
+            hostdetails = HostDetails(hostname)
+            hostdetails.zabbix_details()
+            expected = set(hostdetails.details["zabbix"]["groups"]) | set(hostdetails.map_zabbix_rules())
+            self.assertEqual(expected, set(group for group, members in groups.items() if hostname in members))
+        self.assertEqual(["tuk1mysql1.prod.skytap.com"], groups["mysql"])
+        self.assertEqual(["tuk1r1knode1.mgt.prod.skytap.com"], groups["services.yaml - kubernetes"])
+        self.assertIn("foo1.dev.test.skytap.com", groups["team-unclassified"])
+        self.assertNotIn("nothing.skytap.com", set(host for members in groups.values() for host in members))
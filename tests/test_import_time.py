@@ -0,0 +1,37 @@
+"""Copyright Placeholder"""
+import os
+import subprocess
+import sys
+from .base import BaseTestCase
+
+# host_details.hostdetails measured ~20ms cumulative (mostly logging), leave headroom for slow CI machines
+IMPORT_BUDGET_US = 100000
+
+# only loaded once a chassis/blade, role template or async batch actually needs them
+LAZY_MODULES = ["Device42", "requests", "yaml", "pkg_resources", "asyncio", "sqlite3", "configparser"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ImportTimeTests(BaseTestCase):
+
+    def _python(self, *args):
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        return subprocess.run([sys.executable] + list(args), env=env, cwd=ROOT, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    def test_import_budget(self):
+        # best of a few runs, the first can pay for writing .pyc files
+        cumulative = []
+        for _ in range(3):
+            result = self._python("-X", "importtime", "-c", "import host_details.hostdetails")
+            for line in result.stderr.splitlines():
+                fields = [field.strip() for field in line.split("|")]
+                if fields[-1] == "host_details.hostdetails":
+                    cumulative.append(int(fields[1]))
+        self.assertLess(min(cumulative), IMPORT_BUDGET_US)
+
+    def test_heavy_modules_lazy(self):
+        result = self._python("-c", "import sys, host_details.hostdetails; print(' '.join(sorted(sys.modules)))")
+        loaded = set(result.stdout.split())
+        self.assertEqual([], [module for module in LAZY_MODULES if module in loaded])
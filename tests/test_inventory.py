@@ -0,0 +1,82 @@
+"""Copyright Placeholder"""
+import yaml
+from .base import BaseTestCase
+from tests.hostnamemap import HOSTNAMEMAP
+from host_details.compat import resource_filename
+from host_details.inventory import Inventory
+
+
+def _fixture(hostname):
+    with open(resource_filename("tests.fixtures", "hostdetails/{}.yaml".format(hostname)), "r") as fixraw:
+        return yaml.load(fixraw, Loader=yaml.FullLoader)
+
+
+class InventoryTests(BaseTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fixtures = [_fixture(hostname) for hostname in HOSTNAMEMAP]
+
+    def _scan(self, owner=None, platform=None, zabbix_group=None):
+        return set(details["hostname"] for details in self.fixtures
+                   if (owner is None or details["owner"] == owner) and
+                   (platform is None or details["platform"] == platform) and
+                   (zabbix_group is None or zabbix_group in details.get("zabbix", {}).get("groups", [])))
+
+    def test_query_matches_scan(self):
+        inventory = Inventory(self.fixtures)
+        self.assertEqual(len(HOSTNAMEMAP), len(inventory))
+        for owner in inventory.values("owner"):
+            for platform in inventory.values("platform"):
+                self.assertEqual(self._scan(owner=owner, platform=platform), inventory.query(owner=owner, platform=platform))
+        for group in inventory.values("zabbix_groups"):
+            self.assertEqual(self._scan(zabbix_group=group), inventory.query(zabbix_groups=group))
+        self.assertEqual(set(), inventory.query(owner="nobody", platform="prod"))
+        self.assertEqual(set(HOSTNAMEMAP), inventory.query())
+
+    def test_add_remove(self):
+        inventory = Inventory(self.fixtures[:2])
+        hostname = self.fixtures[0]["hostname"]
+        owner = self.fixtures[0]["owner"]
+        self.assertIn(hostname, inventory.query(owner=owner))
+        self.assertTrue(inventory.remove(hostname))
+        self.assertFalse(inventory.remove(hostname))
+        self.assertNotIn(hostname, inventory)
+        self.assertNotIn(hostname, inventory.query(owner=owner))
+        self.assertFalse(inventory.add({"hostname": "bad", "error": "unparsable"}))
+        self.assertTrue(inventory.add(self.fixtures[0]))
+        self.assertEqual(self.fixtures[0], inventory.get(hostname).to_dict())
+
+    def test_security_kinds_kept_apart(self):
+        inventory = Inventory(self.fixtures)
+        for role, field in [("role.service_owner", "service_owner"), ("role.authorized_operator", "authorized_operator"),
+                            ("role.authorized", "authorized")]:
+            hosts = dict((details["hostname"], details["security"][role]) for details in self.fixtures)
+            for value in inventory.values(field):
+                expected = set(hostname for hostname, roles in hosts.items() if value in (roles if isinstance(roles, list) else [roles]))
+                self.assertEqual(expected, inventory.query(**{field: value}))
+        # "prod" is both a service owner and an authorized role, on different hosts
+        self.assertNotEqual(inventory.query(service_owner="prod"), inventory.query(authorized="prod"))
+        self.assertEqual(set(), inventory.query(service_owner="team-toolsandservices-prod"))
+        self.assertTrue(inventory.query(authorized_operator="team-toolsandservices-prod"))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            Inventory().query(colour="blue")
+
+    def test_dependents_match_scan(self):
+        inventory = Inventory(self.fixtures)
+        expected = {}
+        for details in self.fixtures:
+            for service, endpoint in details["services"].items():
+                for host in (endpoint if isinstance(endpoint, list) else [endpoint] if endpoint else []):
+                    expected.setdefault(host, {}).setdefault(service, set()).add(details["hostname"])
+        self.assertEqual(set(expected), set(inventory.values("services")))
+        for endpoint, services in expected.items():
+            self.assertEqual(services, inventory.dependents(endpoint))
+            self.assertEqual(set().union(*services.values()), inventory.query(services=endpoint))
+        ntp = expected["tuk1ntp1.prod.skytap.com"]["ntp"]
+        platform = self.fixtures[0]["platform"]
+        self.assertEqual(set(hostname for hostname in ntp if inventory.get(hostname).platform == platform),
+                         inventory.dependents("tuk1ntp1.prod.skytap.com", platform=platform).get("ntp", set()))
+        self.assertEqual({}, inventory.dependents("nothing.skytap.com"))
@@ -0,0 +1,124 @@
+"""Copyright Placeholder"""
+import os
+import shutil
+import tempfile
+import contextlib
+from .base import BaseTestCase
+from host_details.hostdetails import HostDetails
+from host_details.metrics import Histogram, Metrics, METRICS, BUCKETS
+from host_details.roles import RoleRegistry
+
+
+class FakeD42Connector():
+    """ Offline stand-in for D42Connector """
+    @staticmethod
+    def get_by_hostname(host):  # pylint: disable=unused-argument
+        return {"Role": "hn", "err": []}
+
+
+class HistogramTests(BaseTestCase):
+
+    def test_observe(self):
+        histogram = Histogram()
+        histogram.observe(0.000003)
+        histogram.observe(0.000003)
+        histogram.observe(100)
+        counts, total = histogram.snapshot()
+        self.assertEqual(3, sum(counts))
+        self.assertAlmostEqual(100.000006, total)
+        buckets = histogram.cumulative()
+        self.assertEqual((BUCKETS[0], 0), buckets[0])
+        self.assertEqual((0.000005, 2), buckets[BUCKETS.index(0.000005)])
+        self.assertEqual((float("inf"), 3), buckets[-1])
+        histogram.reset()
+        self.assertEqual(0, sum(histogram.snapshot()[0]))
+
+
+class MetricsTests(BaseTestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_stats(self):
+        self.metrics.observe("which_owner", 0.0001)
+        self.metrics.count("d42_requests")
+        self.metrics.count("d42_requests", 2)
+        self.metrics.register_cache("service", lambda: {"hits": 3, "misses": 1, "size": 4})
+        stats = self.metrics.stats()
+        self.assertEqual(1, stats["stages"]["which_owner"]["count"])
+        self.assertEqual({"d42_requests": 3}, stats["counters"])
+        self.assertEqual(0.75, stats["caches"]["service"]["hit_ratio"])
+        self.metrics.reset()
+        self.assertEqual({}, self.metrics.stats()["stages"])
+        self.assertEqual({}, self.metrics.stats()["counters"])
+
+    def test_prometheus(self):
+        self.metrics.observe("parse", 0.00002)
+        self.metrics.count("d42_errors")
+        self.metrics.register_cache("role_template", lambda: {"hits": 0, "misses": 0})
+        text = self.metrics.prometheus()
+        self.assertIn("# TYPE host_details_stage_seconds histogram\n", text)
+        self.assertIn('host_details_stage_seconds_bucket{stage="parse",le="2.5e-05"} 1\n', text)
+        self.assertIn('host_details_stage_seconds_bucket{stage="parse",le="+Inf"} 1\n', text)
+        self.assertIn('host_details_stage_seconds_count{stage="parse"} 1\n', text)
+        self.assertIn("host_details_d42_errors_total 1\n", text)
+        self.assertIn('host_details_cache_misses_total{cache="role_template"} 0\n', text)
+        self.assertNotIn('host_details_cache_hit_ratio{cache="role_template"}', text)
+
+    def test_timed_and_tracers(self):
+        spans = []
+
+        @contextlib.contextmanager
+        def tracer(stage, hostname):
+            spans.append((stage, hostname))
+            yield
+
+        class Host():
+            hostname = "tuk1mysql1.prod.skytap.com"
+
+            @self.metrics.timed("lookup")
+            def lookup(self):
+                return "found"
+
+        self.assertEqual("found", Host().lookup())
+        self.metrics.add_tracer(tracer)
+        self.assertEqual("found", Host().lookup())
+        with self.metrics.timer("parse", "tuk1mysql1.prod.skytap.com"):
+            pass
+        self.metrics.remove_tracer(tracer)
+        self.assertEqual([("lookup", Host.hostname), ("parse", Host.hostname)], spans)
+        self.assertEqual(2, self.metrics.stats()["stages"]["lookup"]["count"])
+
+        self.metrics.enabled = False
+        self.assertEqual("found", Host().lookup())
+        self.assertEqual(2, self.metrics.stats()["stages"]["lookup"]["count"])
+
+
+class HostDetailsMetricsTests(BaseTestCase):
+
+    def tearDown(self):
+        METRICS.reset()
+
+    def test_stages(self):
+        METRICS.reset()
+        for hostname in ("tuk1mysql1.prod.skytap.com", "tuk1c1b1.mgt.prod.skytap.com"):
+            HostDetails(hostname, d42_connector=FakeD42Connector()).all_details()
+        stages = METRICS.stats()["stages"]
+        for stage in ("parse", "which_owner", "which_security", "zabbix_details", "services"):
+            self.assertEqual(2, stages[stage]["count"], stage)
+        self.assertEqual(1, stages["load_from_device42"]["count"])
+        self.assertNotIn("map_zabbix_rules", stages)
+        self.assertIn("service", METRICS.stats()["caches"])
+
+    def test_role_registry_stats(self):
+        roles_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, roles_dir)
+        with open(os.path.join(roles_dir, "mysql.yaml"), "w") as template:
+            template.write("zabbix:\n  host_groups: [mysql]\n")
+        registry = RoleRegistry(roles_dir=roles_dir, bundle_path=os.path.join(roles_dir, "roles.json"))
+        registry.get("mysql")
+        registry.get("mysql")
+        self.assertEqual(1, registry.stats()["hits"])
+        self.assertEqual(1, registry.stats()["misses"])
+        registry.clear()
+        self.assertEqual({"hits": 0, "misses": 0, "size": 0}, registry.stats())
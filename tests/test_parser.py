@@ -0,0 +1,70 @@
+"""Copyright Placeholder"""
+import re
+import random
+import string
+from .base import BaseTestCase
+from tests.hostnamemap import HOSTNAMEMAP
+from benchmarks.fleet import synthetic_fleet
+from host_details.excp import InvalidHostname
+from host_details.parser import HostnameParser
+from host_details.rules import COMPONENT_REGEXES
+
+# the component regexes and hostname split HostnameParser replaced, kept to prove it parses identically
+LEGACY_COMPONENT_REGEXES = [re.compile(regex) for regex in [
+    r"^(?P<datacenterregion>(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<region>[r|m|x]\d))(?P<function>[a-z|0-9]+[a-z])(?P<instance>\d+)",
+    r"^(?P<datacenter>[a-z]{3})(?P<env>\d)(?P<function>[a-z|0-9]+[a-z])(?P<instance>\d+)",
+    r"^(?P<datacenterfunction>(?P<datacenter>[a-z]{3}\d)(?P<function>[0-9|a-z|-]+[a-z]))(?P<instance>\d+)",
+    r"^(?P<datacenter>[a-z]{3}\d)(?P<function>[a-z|0-9|-]+[a-z])(?P<instance>\d+)",
+    r"^(?P<function>[a-z|0-9|-]+[a-z])(?P<instance>\d+)",
+]]
+
+
+def legacy_parse(hostname):
+    host_component = hostname.split(".")
+    details = {"platform": None, "subplatform": None, "shortname": host_component[0]}
+    if host_component[-3] in ['prod', 'qa', 'test', 'corp', 'ilo', 'integ']:
+        details["platform"] = host_component[-3]
+    if host_component[-4] in ['mgt', 'test', 'dev']:
+        details["subplatform"] = host_component[-4]
+    for regex in LEGACY_COMPONENT_REGEXES:
+        result = regex.search(host_component[0])
+        if result:
+            details.update(result.groupdict())
+            break
+    if "function" not in details:
+        details["function"] = host_component[0]
+    return details
+
+
+def fuzzed_hostnames(count, seed=0):
+    rand = random.Random(seed)
+    alphabet = string.ascii_lowercase + string.digits + "|-_A٣"
+    for _ in range(count):
+        shortname = "".join(rand.choice(alphabet) for _ in range(rand.randint(1, 16)))
+        if rand.random() < 0.5:
+            shortname = rand.choice(["tuk", "sea", "ash"]) + rand.choice("16|x") + rand.choice(["", "r1", "m2", "x", "|3"]) + shortname
+        yield "{}.{}.{}.skytap.com".format(shortname, rand.choice(["mgt", "test", "dev", "foo"]), rand.choice(["prod", "qa", "ilo", "bar"]))
+
+
+class HostnameParserTests(BaseTestCase):
+
+    def setUp(self):
+        self.parser = HostnameParser(COMPONENT_REGEXES)
+
+    def test_fixture_hosts(self):
+        for hostname in HOSTNAMEMAP:
+            self.assertEqual(legacy_parse(hostname), self.parser.parse(hostname), hostname)
+
+    def test_fuzzed_hosts(self):
+        for hostname in list(fuzzed_hostnames(50000)) + list(synthetic_fleet(10000)):
+            self.assertEqual(legacy_parse(hostname), self.parser.parse(hostname), hostname)
+
+    def test_shapes(self):
+        self.assertEqual({"platform": "prod", "subplatform": "mgt", "shortname": "tuk1r1mysql1", "datacenterregion": "tuk1r1",
+                          "datacenter": "tuk", "env": "1", "region": "r1", "function": "mysql", "instance": "1"},
+                         self.parser.parse("tuk1r1mysql1.mgt.prod.skytap.com"))
+        self.assertEqual({"platform": "test", "subplatform": "dev", "shortname": "foo12", "function": "foo", "instance": "12"},
+                         self.parser.parse("foo12.dev.test.skytap.com"))
+        self.assertEqual("nonumbers", self.parser.parse("nonumbers.dev.test.skytap.com")["function"])
+        with self.assertRaises(InvalidHostname):
+            self.parser.parse("nothing.skytap.com")
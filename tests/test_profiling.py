@@ -0,0 +1,66 @@
+"""Copyright Placeholder"""
+import io
+import os
+import tempfile
+import mock
+from .base import BaseTestCase
+from host_details.cli import main
+from host_details.hostdetails import HostDetails
+from host_details.metrics import METRICS, PROFILE_ENV
+from host_details.profiling import Profiler
+
+HOSTNAMES = ["tuk1mysql1.prod.skytap.com", "tuk6m1cm1.mgt.test.skytap.com", "nothing.skytap.com"]
+
+
+class ProfilerTests(BaseTestCase):
+
+    def test_report(self):
+        profiler = Profiler(slowest=2, memory_interval=1)
+        results = list(HostDetails.resolve_many(HOSTNAMES, profile=profiler))
+        self.assertEqual("Invalid Hostname", results[2]["error"])
+        self.assertEqual([], METRICS.tracers)
+
+        report = profiler.report()
+        self.assertEqual(3, report["hosts"])
+        self.assertEqual([0, 1, 2, 3], [sample["hosts"] for sample in report["memory"]])
+        self.assertIsNotNone(report["growth_per_10k"])
+        self.assertTrue(any("which_owner" in function["function"] for function in report["functions"]))
+        self.assertEqual(2, len(report["slowest"]))
+        self.assertGreaterEqual(report["slowest"][0]["seconds"], report["slowest"][1]["seconds"])
+        for host in report["slowest"]:
+            if host["hostname"] != "nothing.skytap.com":
+                self.assertIn("which_owner", host["stages"])
+        self.assertIn("## slowest hosts", profiler.format_report())
+
+    def test_environment(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as report:
+            pass
+        self.addCleanup(os.unlink, report.name)
+        with mock.patch.dict(os.environ, {PROFILE_ENV: report.name}):
+            list(HostDetails.resolve_many(HOSTNAMES))
+        with open(report.name) as report_file:
+            text = report_file.read()
+        self.assertTrue(text.startswith("# 3 hosts in "))
+        self.assertIn("## top functions by own time", text)
+        self.assertEqual([], METRICS.tracers)
+
+    def test_cli(self):
+        stderr = io.StringIO()
+        with mock.patch.dict(os.environ), mock.patch("sys.stderr", stderr):
+            self.assertEqual(0, main(["--profile", "-"], stdin=io.StringIO("\n".join(HOSTNAMES)), stdout=io.StringIO()))
+        self.assertIn("# 3 hosts in ", stderr.getvalue())
+        self.assertNotIn(PROFILE_ENV, os.environ)
+
+    def test_cli_one_report_per_worker(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as report:
+            pass
+        self.addCleanup(os.unlink, report.name)
+        with mock.patch.dict(os.environ, {PROFILE_ENV: "-"}):
+            self.assertEqual(0, main(["--profile", report.name, "--workers", "2", "--chunk-size", "1"],
+                                     stdin=io.StringIO("\n".join(HOSTNAMES * 2)), stdout=io.StringIO()))
+            self.assertEqual("-", os.environ[PROFILE_ENV])
+        with open(report.name, encoding="utf-8") as report_file:
+            hosts = [int(line.split()[1]) for line in report_file if line.startswith("# ") and " hosts in " in line]
+        # six single host chunks, reported once per worker process rather than once per chunk
+        self.assertLessEqual(len(hosts), 2)
+        self.assertEqual(6, sum(hosts))
@@ -0,0 +1,54 @@
+"""Copyright Placeholder"""
+import mock
+import yaml
+from parameterized import parameterized
+from .base import BaseTestCase
+from tests.hostnamemap import HOSTNAMEMAP
+from host_details.compat import resource_filename
+from host_details.hostdetails import HostDetails
+from host_details.cache import LRUCache
+from host_details.record import HostRecord
+
+
+class HostRecordTests(BaseTestCase):
+
+    @parameterized.expand(HOSTNAMEMAP[::10])
+    def test_fixture_round_trip(self, hostname):
+        with open(resource_filename("tests.fixtures", "hostdetails/{}.yaml".format(hostname)), "r") as fixraw:
+            fixture = yaml.load(fixraw, Loader=yaml.FullLoader)
+        self.assertEqual(fixture, HostRecord(fixture).to_dict())
+
+    def test_shared_by_location(self):
+        records = []
+        for hostname in ["tuk1r1foo1.mgt.prod.skytap.com", "tuk1r1bar2.mgt.prod.skytap.com"]:
+            hostdetails = HostDetails(hostname)
+            hostdetails.all_details()
+            records.append(hostdetails.record())
+        self.assertIs(records[0].services, records[1].services)
+        self.assertIs(records[0].security, records[1].security)
+        self.assertFalse(hasattr(records[0], "__dict__"))
+
+    def test_to_dict_is_a_copy(self):
+        hostdetails = HostDetails("tuk1r1foo1.mgt.prod.skytap.com")
+        hostdetails.all_details()
+        record = hostdetails.record()
+        record.to_dict()["services"]["ntp"].append("changed")
+        self.assertEqual(hostdetails.details, record.to_dict())
+
+    def test_absent_keys_unset(self):
+        hostdetails = HostDetails("tuk1r1foo1.mgt.prod.skytap.com")
+        hostdetails.which_owner()
+        record = hostdetails.record()
+        self.assertFalse(hasattr(record, "zabbix_groups"))
+        self.assertFalse(hasattr(record, "d42"))
+        self.assertIsNone(getattr(record, "datacenterfunction", None))
+        self.assertEqual(hostdetails.details, record.to_dict())
+
+    def test_pool_bounded(self):
+        pool = LRUCache(maxsize=4)
+        with mock.patch("host_details.record._POOL", pool):
+            for number in range(10):
+                HostRecord({"hostname": "tuk1foo{}.prod.skytap.com".format(number), "services": {},
+                            "security": {"role.service_owner": "team-{}".format(number), "role.authorized_operator": [],
+                                         "role.authorized": []}})
+        self.assertEqual(4, len(pool))
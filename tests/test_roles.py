@@ -0,0 +1,74 @@
+"""Copyright Placeholder"""
+import os
+import shutil
+import tempfile
+
+import mock
+from .base import BaseTestCase
+from host_details.roles import RoleRegistry, write_bundle
+
+
+class RoleRegistryTests(BaseTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.roles_dir = os.path.join(self.tmpdir, "roles")
+        os.mkdir(self.roles_dir)
+        self._write_role("mysql", "mysqlgroup")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write_role(self, role, group, mtime=None):
+        path = os.path.join(self.roles_dir, "{}.yaml".format(role))
+        with open(path, "w") as rolefile:
+            rolefile.write("zabbix:\n  host_groups:\n  - {}\n".format(group))
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+    def test_missing_and_cached(self):
+        registry = RoleRegistry(self.roles_dir, check_interval=None)
+        self.assertIsNone(registry.get("nothing"))
+        template = registry.get("mysql")
+        self.assertEqual({"zabbix": {"host_groups": ["mysqlgroup"]}}, template)
+        self.assertIs(template, registry.get("mysql"))
+
+    def test_mtime_invalidation(self):
+        registry = RoleRegistry(self.roles_dir, check_interval=0)
+        self.assertEqual(["mysqlgroup"], registry.get("mysql")["zabbix"]["host_groups"])
+        self._write_role("mysql", "changed", mtime=1)
+        self._write_role("knode", "kube")
+        os.utime(self.roles_dir, (2, 2))
+        self.assertEqual(["changed"], registry.get("mysql")["zabbix"]["host_groups"])
+        self.assertEqual(["kube"], registry.get("knode")["zabbix"]["host_groups"])
+
+    def test_bundle(self):
+        bundle_path = os.path.join(self.tmpdir, "roles.json")
+        write_bundle(self.roles_dir, bundle_path)
+        registry = RoleRegistry(self.roles_dir, bundle_path=bundle_path, check_interval=None)
+        with mock.patch("host_details.roles._load_yaml") as load_yaml:
+            self.assertEqual({"zabbix": {"host_groups": ["mysqlgroup"]}}, registry.get("mysql"))
+        load_yaml.assert_not_called()
+
+    def test_bundle_survives_install(self):
+        bundle_path = os.path.join(self.tmpdir, "roles.json")
+        write_bundle(self.roles_dir, bundle_path)
+        # installed copies get new mtimes, the bundle is still good while their content matches
+        self._write_role("mysql", "mysqlgroup", mtime=1)
+        os.utime(self.roles_dir, (2, 2))
+        registry = RoleRegistry(self.roles_dir, bundle_path=bundle_path, check_interval=0)
+        template = registry.get("mysql")
+        self._write_role("mysql", "mysqlgroup", mtime=3)
+        self.assertIs(template, registry.get("mysql"))
+        self.assertEqual(0, registry.stats()["misses"])
+        self._write_role("mysql", "changed", mtime=4)
+        self.assertEqual(["changed"], registry.get("mysql")["zabbix"]["host_groups"])
+
+    def test_stale_bundle_ignored(self):
+        bundle_path = os.path.join(self.tmpdir, "roles.json")
+        write_bundle(self.roles_dir, bundle_path)
+        # edited after the bundle was built, before the registry ever loaded it
+        self._write_role("mysql", "changed", mtime=1)
+        registry = RoleRegistry(self.roles_dir, bundle_path=bundle_path, check_interval=None)
+        self.assertEqual(["changed"], registry.get("mysql")["zabbix"]["host_groups"])
+        self.assertEqual(1, registry.stats()["misses"])
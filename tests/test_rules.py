@@ -0,0 +1,205 @@
+"""Copyright Placeholder"""
+import os
+import re
+import json
+import shutil
+import tempfile
+import mock
+from parameterized import parameterized
+from .base import BaseTestCase
+from host_details.hostdetails import HostDetails
+from host_details.excp import InvalidRuleFile
+from host_details.rules import (RuleEngine, RuleFile, OwnerMatcher, ZabbixFunctionMatcher, RULES_ENV, TEAM_OWNERSHIP_REGEXES,
+                                bundled_rules_path, default_rules)
+
+
+class RuleEngineTests(BaseTestCase):
+
+    def test_default_rules_shared(self):
+        first = HostDetails("tuk1mysql1.prod.skytap.com")
+        second = HostDetails("tuk6m1cm1.mgt.test.skytap.com")
+        self.assertIs(default_rules(), first.rules)
+        self.assertIs(first.rules, second.rules)
+        self.assertIs(first.service_discovery, second.service_discovery)
+
+    def test_rules_immutable(self):
+        rules = default_rules()
+        with self.assertRaises(AttributeError):
+            rules.env_map = {}
+        with self.assertRaises(TypeError):
+            rules.service_discovery["ntp"] = {}
+        with self.assertRaises(TypeError):
+            rules.team_owner_overrides["function"]["foo"] = "team-foo"
+
+    def test_custom_rules(self):
+        rules = RuleEngine(team_ownership_regexes={"team-foo": "^foo$"})
+        hostdetails = HostDetails("tuk1foo1.prod.skytap.com", rules=rules)
+        hostdetails.which_owner()
+        self.assertEqual("team-foo", hostdetails.details["owner"])
+        self.assertIs(rules, hostdetails.rules)
+
+    def test_override_on_missing_field(self):
+        rules = RuleEngine(team_owner_overrides={"region": {"r1": "team-foo"}})
+        regionless = HostDetails("tuk1mysql1.prod.skytap.com", rules=rules)
+        regionless.which_owner()
+        self.assertEqual("team-tools-mysql", regionless.details["owner"])
+        regional = HostDetails("tuk1r1mysql1.prod.skytap.com", rules=rules)
+        regional.which_owner()
+        self.assertEqual("team-foo", regional.details["owner"])
+
+
+class OwnerMatcherTests(BaseTestCase):
+
+    @parameterized.expand([
+        ("ss",), ("sn",), ("jira",), ("bs5spare",), ("nsxold2",), ("zabbixproxy",), ("zabbixmysql",), ("c12oa",), ("xc1oa",),
+        ("c4b",), ("linjump",), ("opspuppetca",), ("elasticdata",), ("elasticdatawfe",), ("charonx",), ("ldapmanage",), ("lbfoo",),
+        ("foo",), ("",), ("ss\n",), ("a\njump",),
+    ])
+    def test_matches_ordered_search(self, function):
+        expected = None
+        for owner, teamregex in TEAM_OWNERSHIP_REGEXES.items():
+            if re.search(teamregex, function):
+                expected = owner
+                break
+        self.assertEqual(expected, OwnerMatcher(TEAM_OWNERSHIP_REGEXES).match(function))
+
+    def test_literal_claimed_by_earlier_regex(self):
+        matcher = OwnerMatcher({"team-first": "^foo.*", "team-second": "^foobar$"})
+        self.assertEqual("team-first", matcher.match("foobar"))
+
+    @parameterized.expand([
+        ("NPM",), ("npm",), ("aa",), ("ab",), ("xx",), ("xy",), ("foo",), ("jira",), ("",),
+    ])
+    def test_flags_and_backreferences_keep_search_order(self, function):
+        regexes = {"team-first": "^foo", "team-flagged": "(?i)^npm$", "team-backref": r"^(a)\1$", "team-between": "^a|^jira$",
+                   "team-named": r"^(?P<letter>x)(?P=letter)$", "team-last": "x"}
+        expected = next((owner for owner, regex in regexes.items() if re.search(regex, function)), None)
+        self.assertEqual(expected, OwnerMatcher(regexes).match(function))
+
+
+class ZabbixFunctionMatcherTests(BaseTestCase):
+
+    @parameterized.expand([
+        ("mysql",), ("mysqlvip",), ("vipmysql2",), ("hn",), ("vsnhn",), ("c4b",), ("xcb",), ("c\nb",), ("as",), ("cas",),
+        ("lb",), ("lbfoo",), ("er",), ("ser",), ("er\n",), ("dlbr",), ("nsxold",), ("packages",), ("zabbixlogger",), ("foo",), ("",),
+    ])
+    def test_matches_legacy_rules(self, function):
+        expected = set(item for item in ["packages", "zabbix", "logger"] if item in function)
+        if "mysql" in function and "vip" in function:
+            expected.add("mysqlvip")
+        elif "mysql" in function:
+            expected.add("mysql")
+        if "hn" in function or re.search(".*c.*b", function):
+            expected.add("hn")
+        if any(re.search(network, function) for network in [".*as$", ".*cs$", ".*lb$", ".*vr$", ".*sr$", "^er$", ".*dltr$",
+                                                           ".*dlbr$", ".*ar$", ".*acs$", ".*ds$", ".*nsx.*"]):
+            expected.add("network")
+        self.assertEqual(expected, default_rules().zabbix_matcher.groups(function))
+
+    def test_memo_bounded(self):
+        matcher = ZabbixFunctionMatcher("hn", "lb$", [], maxsize=2)
+        for function in ["hn", "lb", "foo", "hn"]:
+            matcher.groups(function)
+        self.assertEqual(frozenset(["network"]), matcher.groups("lb"))
+        self.assertLessEqual(len(matcher._memo), 2)  # pylint: disable=protected-access
+
+
+class RuleFileTests(BaseTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "rules.json")
+        with open(bundled_rules_path(), "r") as rulefile:
+            self.data = json.load(rulefile)
+        self._write(self.data)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _write(self, data, mtime=None):
+        with open(self.path, "w") as rulefile:
+            json.dump(data, rulefile)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_bundled_file_is_default(self):
+        self.assertEqual(1, default_rules().version)
+        self.assertEqual(RuleEngine().fingerprint, RuleEngine.from_file(bundled_rules_path()).fingerprint)
+
+    def test_reload_swaps_engine(self):
+        rule_file = RuleFile(self.path, check_interval=0)
+        first = rule_file.engine()
+        hostdetails = HostDetails("tuk1mysql1.prod.skytap.com", rules=first)
+        self.assertIs(first, rule_file.engine())
+
+        self.data["team_owner_overrides"]["function"]["mysql"] = "team-foo"
+        self._write(self.data, mtime=1)
+        second = rule_file.engine()
+        self.assertIsNot(first, second)
+        self.assertNotEqual(first.fingerprint, second.fingerprint)
+
+        # an instance keeps the rules it started with
+        hostdetails.which_owner()
+        self.assertEqual("team-tools-mysql", hostdetails.details["owner"])
+        hostdetails = HostDetails("tuk1mysql1.prod.skytap.com", rules=rule_file.engine())
+        hostdetails.which_owner()
+        self.assertEqual("team-foo", hostdetails.details["owner"])
+
+    def test_invalid_file_keeps_engine(self):
+        rule_file = RuleFile(self.path, check_interval=0)
+        first = rule_file.engine()
+        self.data["team_ownership_regexes"]["team-foo"] = "^foo("
+        self._write(self.data, mtime=1)
+        self.assertIs(first, rule_file.engine())
+
+    def test_engine_errors_keep_engine(self):
+        rule_file = RuleFile(self.path, check_interval=0)
+        first = rule_file.engine()
+        self.data["team_ownership_regexes"]["team-foo"] = "(?i)^npm$|^(a)\\1$"
+        self._write(self.data, mtime=1)
+        with mock.patch("host_details.rules.OwnerMatcher", side_effect=re.error("boom")):
+            self.assertIs(first, rule_file.engine())
+            with self.assertRaises(InvalidRuleFile):
+                RuleEngine.from_file(self.path)
+        # the regexes themselves build an engine, once the file changes again
+        self._write(self.data, mtime=2)
+        self.assertEqual("team-foo", rule_file.engine().owner_matcher.match("aa"))
+
+    def test_path_from_environment(self):
+        self.data["team_owner_overrides"]["function"]["mysql"] = "team-foo"
+        self._write(self.data)
+        with mock.patch.dict(os.environ, {RULES_ENV: self.path}):
+            rule_file = RuleFile()
+            engine = rule_file.engine()
+        self.assertEqual(self.path, rule_file.path)
+        self.assertEqual("team-foo", engine.team_owner_overrides["function"]["mysql"])
+
+    def test_set_path(self):
+        rule_file = RuleFile(check_interval=None)
+        bundled = rule_file.engine()
+        self.data["team_ownership_regexes"]["team-foo"] = "^foo("
+        self._write(self.data)
+        with self.assertRaises(InvalidRuleFile):
+            rule_file.set_path(self.path)
+        self.assertIs(bundled, rule_file.engine())
+
+        del self.data["team_ownership_regexes"]["team-foo"]
+        self._write(self.data)
+        rule_file.set_path(self.path)
+        self.assertEqual(self.path, rule_file.path)
+        self.assertIsNot(bundled, rule_file.engine())
+
+    @parameterized.expand([
+        ("version", 2),
+        ("tas_override", "team-foo"),
+        ("env_map", {"prod": "1"}),
+        ("service_discovery", {"ntp": {"instances": ["1"]}}),
+        ("team_ownership_regexes", {"team-foo": "^foo("}),
+        ("team_owner_overrides", {"functon": {"mysql": "team-foo"}}),
+        ("service_discovery", {"ntp": {"override": "ntp.prod.skytap.com"}}),
+    ])
+    def test_validation(self, table, value):
+        self.data[table] = value
+        self._write(self.data)
+        with self.assertRaises(InvalidRuleFile):
+            RuleEngine.from_file(self.path)
@@ -0,0 +1,121 @@
+"""Copyright Placeholder"""
+import io
+import os
+import json
+import shutil
+import socket
+import asyncio
+import tempfile
+import threading
+
+import mock
+from .base import BaseTestCase
+from host_details import client as client_module
+from host_details.client import ResolverClient
+from host_details.d42_async import AsyncD42Connector
+from host_details.excp import ResolverError
+from host_details.hostdetails import HostDetails
+from host_details.rules import RuleFile, bundled_rules_path, default_rules
+from host_details.server import ResolverServer
+
+
+class FakeD42Connector():
+    """ Offline stand-in for D42Connector """
+    @staticmethod
+    def get_by_hostname(host):  # pylint: disable=unused-argument
+        return {"Role": "hn", "err": []}
+
+
+class ResolverServerTests(BaseTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmpdir, "resolver.sock")
+        self.loop = asyncio.new_event_loop()
+        self.resolver = ResolverServer(d42_connector=AsyncD42Connector(FakeD42Connector()))
+        self.loop.run_until_complete(self.resolver.start(path=self.socket_path))
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.client = ResolverClient(socket_path=self.socket_path)
+
+    def tearDown(self):
+        self.client.close()
+        asyncio.run_coroutine_threadsafe(self.resolver.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        shutil.rmtree(self.tmpdir)
+
+    def _expected(self, hostname):
+        hostdetails = HostDetails(hostname, d42_connector=FakeD42Connector())
+        hostdetails.all_details()
+        return json.loads(json.dumps(hostdetails.details))
+
+    def test_single_and_batch(self):
+        hostnames = ["tuk1mysql1.prod.skytap.com", "tuk1c1b1.mgt.prod.skytap.com", "nothing.skytap.com"]
+        self.assertEqual(self._expected(hostnames[0]), self.client.resolve(hostnames[0]))
+        self.assertEqual({"hostname": "nothing.skytap.com", "error": "Invalid Hostname"}, self.client.resolve(hostnames[2]))
+        results = self.client.resolve_many(hostnames)
+        self.assertEqual([self._expected(hostname) for hostname in hostnames[:2]], results[:2])
+        self.assertEqual("Invalid Hostname", results[2]["error"])
+        self.assertNotIn("zabbix", self.client.resolve(hostnames[0], method="hostsplit_service"))
+
+    def test_rule_file(self):
+        with open(bundled_rules_path(), "r", encoding="utf-8") as rulefile:
+            data = json.load(rulefile)
+        data["team_owner_overrides"]["function"]["mysql"] = "team-foo"
+        path = os.path.join(self.tmpdir, "rules.json")
+        with open(path, "w", encoding="utf-8") as rulefile:
+            json.dump(data, rulefile)
+        self.resolver.rule_file = RuleFile(path)
+        self.assertEqual(self.resolver.rule_file.engine().fingerprint, self.client.health()["rules_fingerprint"])
+        self.assertEqual("team-foo", self.client.resolve("tuk1mysql1.prod.skytap.com")["owner"])
+
+    def test_keep_alive(self):
+        for _ in range(50):
+            self.client.resolve("tuk1mysql1.prod.skytap.com")
+        sock = self.client._connection.sock  # pylint: disable=protected-access
+        self.client.health()
+        self.assertIs(sock, self.client._connection.sock)  # pylint: disable=protected-access
+
+    def test_errors(self):
+        self.assertEqual(default_rules().fingerprint, self.client.health()["rules_fingerprint"])
+        self.assertEqual(404, self.client.request("GET", "/nothing")[0])
+        self.assertEqual(405, self.client.request("POST", "/health", {})[0])
+        self.assertEqual(400, self.client.request("POST", "/hosts", {"hostnames": "tuk1mysql1.prod.skytap.com"})[0])
+        with self.assertRaises(ResolverError):
+            self.client.resolve("tuk1mysql1.prod.skytap.com", method="nothing")
+        self.assertEqual("ok", self.client.health()["status"])
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+            raw.connect(self.socket_path)
+            raw.sendall(b"POST /hosts HTTP/1.1\r\nContent-Length: -1\r\n\r\n")
+            self.assertTrue(raw.recv(1024).startswith(b"HTTP/1.1 400"))
+
+    def test_non_object_error_responses(self):
+        for response, reason in [((502, "Bad Gateway\n"), "Bad Gateway\n"), ((500, ["failed"]), "['failed']")]:
+            with mock.patch.object(self.client, "request", return_value=response), self.assertRaises(ResolverError) as raised:
+                self.client.health()
+            self.assertEqual(response[0], raised.exception.status)
+            self.assertIn(reason, str(raised.exception))
+
+    def test_localhost_tcp(self):
+        resolver = ResolverServer(d42_connector=AsyncD42Connector(FakeD42Connector()))
+        asyncio.run_coroutine_threadsafe(resolver.start(port=0), self.loop).result()
+        try:
+            with ResolverClient(port=resolver.address[1]) as tcp_client:
+                self.assertEqual(self._expected("tuk1mysql1.prod.skytap.com"), tcp_client.resolve("tuk1mysql1.prod.skytap.com"))
+        finally:
+            asyncio.run_coroutine_threadsafe(resolver.close(), self.loop).result()
+
+    def test_client_main(self):
+        stdout = io.StringIO()
+        self.assertEqual(1, client_module.main(["--socket", self.socket_path, "tuk1mysql1.prod.skytap.com", "nothing.skytap.com"],
+                                               stdout=stdout))
+        self.assertEqual(["tuk1mysql1.prod.skytap.com", "nothing.skytap.com"],
+                         [json.loads(line)["hostname"] for line in stdout.getvalue().splitlines()])
+
+    def test_metrics(self):
+        self.client.resolve("tuk1mysql1.prod.skytap.com")
+        self.assertIn('host_details_stage_seconds_count{stage="which_owner"}', self.client.metrics())
+        self.assertGreater(self.client.stats()["stages"]["which_owner"]["count"], 0)
@@ -0,0 +1,87 @@
+"""Copyright Placeholder"""
+import io
+import os
+import shutil
+import tempfile
+
+import mock
+from .base import BaseTestCase
+from tests.hostnamemap import HOSTNAMEMAP
+from host_details.compat import resource_filename
+from host_details.hostdetails import HostDetails
+from host_details.rules import RuleEngine, TEAM_OWNER_OVERRIDES
+from host_details import snapshot as snapshot_module
+from host_details.snapshot import Snapshot, field_changes, verify, write_snapshot
+
+
+class SnapshotTests(BaseTestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "fleet.snapshot")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_fixture_fleet(self):
+        # the consolidated form of the per host yaml fixtures, classified and compared in one pass
+        with Snapshot(resource_filename("tests.fixtures", "hostdetails.snapshot")) as snapshot:
+            self.assertEqual(sorted(HOSTNAMEMAP), snapshot.hostnames())
+            self.assertEqual([], verify(snapshot))
+
+    def test_random_access(self):
+        hostnames = ["tuk1mysql1.prod.skytap.com", "nothing.skytap.com", "tuk6m1cm1.mgt.test.skytap.com"]
+        results = list(HostDetails.resolve_many(hostnames))
+        self.assertEqual(3, write_snapshot(self.path, results))
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(3, len(snapshot))
+            self.assertIn("nothing.skytap.com", snapshot)
+            self.assertEqual(results[2], snapshot.get(hostnames[2]))
+            self.assertEqual(results[1], snapshot.get(hostnames[1]))
+            self.assertIsNone(snapshot.get("other.prod.skytap.com"))
+
+        with open(self.path, "rb+") as truncated:
+            truncated.truncate(os.path.getsize(self.path) - 20)
+        with self.assertRaises(ValueError):
+            Snapshot(self.path)
+
+    def test_failed_write_cleaned_up(self):
+        results = list(HostDetails.resolve_many(["tuk1mysql1.prod.skytap.com"]))
+        write_snapshot(self.path, results)
+        with mock.patch("host_details.snapshot.os.replace", side_effect=OSError("disk full")), self.assertRaises(OSError):
+            write_snapshot(self.path, results + list(HostDetails.resolve_many(["tuk6m1cm1.mgt.test.skytap.com"])))
+        self.assertEqual(["fleet.snapshot"], os.listdir(self.tmpdir))
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(1, len(snapshot))
+
+    def test_rule_change(self):
+        hostnames = ["tuk1mysql1.prod.skytap.com", "tuk1r1knode1.mgt.prod.skytap.com", "nothing.skytap.com"]
+        write_snapshot(self.path, HostDetails.resolve_many(hostnames))
+        overrides = dict(TEAM_OWNER_OVERRIDES)
+        overrides["function"] = {"mysql": "team-foo"}
+        with Snapshot(self.path) as snapshot:
+            differences = verify(snapshot, rules=RuleEngine(team_owner_overrides=overrides))
+            self.assertEqual(["tuk1mysql1.prod.skytap.com"], [difference["hostname"] for difference in differences])
+            changes = differences[0]["changes"]
+            self.assertIn({"field": "owner", "expected": "team-tools-mysql", "actual": "team-foo"}, changes)
+            self.assertIn({"field": "security.role.service_owner", "expected": "team-tools-mysql-prod", "actual": "prod"}, changes)
+            self.assertEqual(["tuk1web1.prod.skytap.com"],
+                             [difference["hostname"] for difference in verify(snapshot, ["tuk1web1.prod.skytap.com"])])
+
+    def test_field_changes(self):
+        self.assertEqual([], field_changes({"services": {"ntp": ["a", "b"]}}, {"services": {"ntp": ["a", "b"]}}))
+        self.assertEqual([{"field": "services.ntp", "expected": ["a", "b"], "actual": ["a"]},
+                          {"field": "zabbix.groups", "expected": None, "actual": ["tuk1"]}],
+                         field_changes({"services": {"ntp": ["a", "b"]}}, {"services": {"ntp": ["a"]}, "zabbix": {"groups": ["tuk1"]}}))
+
+    def test_main(self):
+        hostfile = os.path.join(self.tmpdir, "hosts.txt")
+        with open(hostfile, "w") as hosts:
+            hosts.write("tuk1mysql1.prod.skytap.com\ntuk1web1.prod.skytap.com\n")
+        self.assertEqual(0, snapshot_module.main(["write", self.path, hostfile]))
+        self.assertEqual(0, snapshot_module.main(["verify", self.path], stdout=io.StringIO()))
+        with open(hostfile, "a") as hosts:
+            hosts.write("tuk1c1b1.mgt.prod.skytap.com\n")
+        stdout = io.StringIO()
+        self.assertEqual(1, snapshot_module.main(["verify", self.path, hostfile], stdout=stdout))
+        self.assertIn("tuk1c1b1.mgt.prod.skytap.com", stdout.getvalue())